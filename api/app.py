@@ -12,19 +12,54 @@ Funcionalidades:
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 from datetime import datetime
 import asyncio
 import logging
 import json
+import time
+import uuid
 import cv2
 import numpy as np
-from core.camera_manager import CameraManager
+from core.camera_manager import CameraManager, opciones_listener
+from core.capture import opciones_captura, id_camara_url, normalizar_url
+from core.codec import REDUCCIONES
+from core.ingest import SesionIngesta, SESIONES
+from core import ingest
+from core.instrumentation import instrumentacion, MUESTREO_PERFIL_DEFECTO, TOP_PERFIL
+from core.metrics import metricas, exponer, memoria_proceso, PREFIJO
+from core.tracing import trazador, UMBRAL_LENTO_MS
+from core.detection import estadisticas_tracks, crear_registro_con_factura, contadores_ocr
+from core.detection import registrar_salida as encolar_salida_detectada
+from core import detection
+from core.event_bus import EventBus, iniciar_consumidor
+from core.billing import ExitMatcher
+from core.reports import ReportEngine
+from database import SessionLocal, engine, Base
+import models
+import crud
 import os
+import sys
+import sqlite3
 os.makedirs("static", exist_ok=True)
 
-# Nota: Se ha eliminado la dependencia de base de datos. El sistema acepta
-# URLs de cámara o frames locales enviados por el frontend.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from detección_yolo.exportar_db import exportar_bloques, columnas_tabla, FORMATOS, TABLAS
+
+# Base de datos SQLite escrita por el pipeline de detección (detección_yolo/main.py)
+DETECCIONES_DB_PATH = os.environ.get("DETECCIONES_DB_PATH", "estacionamiento.db")
+
+# Segundos entre el arranque de una cámara activa y la siguiente al iniciar:
+# reparte las conexiones RTSP y el primer frame por el modelo
+ESCALONAMIENTO_CAMARAS_S = 2.0
+
+# Retención automática de los pipelines: un hilo de fondo que borra
+# evidencias y archiva filas viejas (RETENCION_AUTOMATICA=0 la desactiva)
+RETENCION_AUTOMATICA = os.environ.get("RETENCION_AUTOMATICA", "1") != "0"
+
+# Nota: El sistema acepta URLs de cámara o frames locales enviados por el
+# frontend. La base de datos SQLAlchemy solo se usa para facturación.
 
 app = FastAPI(
     title="Sistema de Detección de Placas",
@@ -44,8 +79,17 @@ app.add_middleware(
 # Servir archivos estáticos (imágenes detectadas)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Bus de eventos del pipeline (placas confirmadas y cruces de línea)
+event_bus = EventBus()
+
 # Instancia global del administrador de cámaras
-camera_manager = CameraManager()
+camera_manager = CameraManager(event_bus)
+
+# Emparejador de salidas con facturas abiertas
+exit_matcher = ExitMatcher(SessionLocal)
+
+# Reportes de ingresos (cacheados hasta que cierre una nueva factura)
+report_engine = ReportEngine(SessionLocal)
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -72,8 +116,29 @@ async def websocket_camara_directa(websocket: WebSocket):
     
     El frontend envía:
     1. Primero: {"type": "camera_url", "url": "rtsp://mi-camara"}
+       Opciones del handshake:
+       - "modo": "video" (JPEG anotado, por defecto) o "metadatos" (JSON por
+         frame con track_id, bbox, placa, conf y dirección; sin video salvo
+         que se pida "video_fps": n para recibirlo limitado a n fps)
+       - "overlay": "cliente" para recibir el JPEG sin anotar, precedido del
+         JSON de detecciones del frame, y dibujar las cajas en el navegador
+       - "eventos": true para recibir también los eventos del bus como JSON texto
+       - "perfil" ("alto"|"medio"|"bajo") o "ancho"/"calidad", "max_fps" y
+         "adaptativo": el perfil baja solo si los envíos se vuelven lentos
+       - "protocolo": "trama" para recibir cada frame en el sobre binario
+       - "captura": {"backend": "opencv"|"ffmpeg"|"pyav", "cada_n", "ancho",
+         "solo_keyframes", "substream_url", "tiempo_real"}; la usa quien
+         inicia la cámara
     2. O: {"type": "camera_local"} para usar cámara del dispositivo
-    3. Luego: frames en base64 si es cámara local
+    3. Luego: frames JPEG binarios si es cámara local
+       (opcional "reduccion": 2/4/8 en el handshake para decodificarlos reducidos).
+       Cada respuesta es {"type": "frame", "seq": n, "descartados": k} + el
+       JPEG procesado del n-ésimo frame enviado; si el cliente envía más rápido
+       de lo que se procesa, los frames viejos se descartan
+    
+    Con "protocolo": "trama" (ambos casos) los mensajes binarios van en el
+    sobre de core/protocolo.py: seq, ts de captura, cámara, tipo de payload y
+    detecciones opcionales en un solo mensaje (ver core/protocolo.py)
     
     Casos de uso:
     - Cámara IP sin registrar: Enviar URL directamente
@@ -85,6 +150,7 @@ async def websocket_camara_directa(websocket: WebSocket):
     cam_id = None
     camera_task = None
     config = None
+    camara_tomada = False
     
     try:
         # Esperar configuración inicial (JSON texto)
@@ -100,22 +166,39 @@ async def websocket_camara_directa(websocket: WebSocket):
                 await websocket.close()
                 return
             
-            # Usar hash de URL como cam_id temporal
-            cam_id = f"url_{hash(camera_url) % 1000000}"
+            try:
+                opciones = opciones_listener(config)
+                captura = opciones_captura(config.get("captura"))
+            except (TypeError, ValueError) as e:
+                await websocket.send_text(json.dumps({"error": str(e)}))
+                await websocket.close()
+                return
+            
+            # Id estable: el de la cámara registrada con esa URL o, si no está
+            # registrada, el digest de la URL normalizada. Todos los visores de
+            # la misma cámara comparten una sola captura y pipeline
+            cam_id = await en_db(_id_camara_para_url, camera_url)
             logger.info(f"🎥 Cámara URL: {camera_url} (ID: {cam_id})")
             
-            # Registrar websocket como listener PRIMERO
-            await camera_manager.register_listener(cam_id, websocket)
+            # Registrar websocket como listener PRIMERO (falla si la cámara
+            # ya tiene el máximo de listeners: el cliente recibe el error)
+            try:
+                await camera_manager.register_listener(cam_id, websocket, opciones)
+            except RuntimeError as e:
+                await websocket.send_text(json.dumps({"error": str(e)}))
+                await websocket.close(code=1013)
+                return
             
             # LUEGO iniciar el loop de procesamiento
-            await camera_manager.start_camera(cam_id, camera_url)
+            await camera_manager.start_camera(cam_id, camera_url, captura=captura)
+            camara_tomada = True
             
             # Mantener conexión viva (el CameraManager enviará frames)
             while True:
                 try:
                     # Esperar a que el cliente cierre o envíe algo
                     msg = await websocket.receive_text()
-                    logger.debug(f"Ping recibido: {msg}")
+                    logger.debug("Ping recibido: %s", msg)
                 except WebSocketDisconnect:
                     logger.info(f"🔌 Cliente desconectado de {cam_id}")
                     break
@@ -125,47 +208,38 @@ async def websocket_camara_directa(websocket: WebSocket):
         
         elif config.get("type") == "camera_local":
             # Cámara local - el frontend enviará frames
-            cam_id = "local_" + str(abs(hash(str(websocket))))
+            try:
+                opciones = opciones_listener(config, calidad_defecto=80)
+                # Decodificar a 1/2, 1/4 u 1/8 cuando el cliente solo quiere la inferencia
+                reduccion = int(config.get("reduccion", 1))
+                if reduccion not in REDUCCIONES:
+                    raise ValueError(f"Reducción inválida: {reduccion} (válidas: {REDUCCIONES})")
+            except (TypeError, ValueError) as e:
+                await websocket.send_text(json.dumps({"error": str(e)}))
+                await websocket.close()
+                return
+            # Id único por sesión (hash() de un objeto no es estable ni único)
+            cam_id = "local_" + uuid.uuid4().hex[:12]
             logger.info(f"📱 Cámara LOCAL (ID: {cam_id}) - Iniciando detección en tiempo real")
+            ingesta = SesionIngesta(websocket, cam_id, opciones, reduccion).iniciar()
             
-            # Para cámara local, recibir y procesar frames del frontend
-            while True:
-                try:
-                    data = await websocket.receive_bytes()
+            # Para cámara local, solo recibir: el pipeline de la sesión procesa
+            # en el pool de hilos y responde cada frame con su seq
+            try:
+                while True:
+                    mensaje = await websocket.receive()
+                    if mensaje["type"] == "websocket.disconnect":
+                        raise WebSocketDisconnect(mensaje.get("code", 1000))
+                    data = mensaje.get("bytes")
+                    if data is None:  # texto (pings): se ignora
+                        continue
                     if len(data) > 1000:  # Solo log frames válidos
-                        logger.debug(f"📸 Frame recibido para {cam_id} ({len(data)} bytes)")
-                    
-                    # Procesar frame recibido
-                    import numpy as np
-                    nparr = np.frombuffer(data, np.uint8)
-                    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                    
-                    if frame is not None:
-                        # Procesar con detección simple
-                        try:
-                            import sys
-                            import os
-                            sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'detección_yolo'))
-                            from simple_detection import detectar_frame
-                            frame_proc = detectar_frame(frame, 0)
-                            logger.debug(f"✅ Frame procesado con detección")
-                        except Exception as e:
-                            logger.error(f"Error en detección: {e}")
-                            # Fallback: frame con información
-                            frame_proc = frame.copy()
-                            cv2.putText(frame_proc, f"Sistema Activo - {cam_id}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                            cv2.putText(frame_proc, "Buscando vehiculos...", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                        
-                        # Enviar frame procesado
-                        ok, buf = cv2.imencode('.jpg', frame_proc, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
-                        if ok:
-                            await websocket.send_bytes(buf.tobytes())
-                except WebSocketDisconnect:
-                    logger.info(f"🔌 Cliente local desconectado: {cam_id}")
-                    break
-                except Exception as e:
-                    logger.error(f"❌ Error procesando frame local: {e}")
-                    await asyncio.sleep(0.1)
+                        logger.debug("📸 Frame recibido para %s (%d bytes)", cam_id, len(data))
+                    ingesta.recibir(data)
+            except WebSocketDisconnect:
+                logger.info(f"🔌 Cliente local desconectado: {cam_id}")
+            finally:
+                await ingesta.cerrar()
         
     except WebSocketDisconnect:
         logger.info("🔌 Cliente desconectado")
@@ -177,43 +251,179 @@ async def websocket_camara_directa(websocket: WebSocket):
             if cam_id:
                 if config and config.get("type") == "camera_url":
                     await camera_manager.unregister_listener(cam_id, websocket)
-                    await camera_manager.stop_camera(cam_id)
-                    logger.info(f"🛑 Cámara URL {cam_id} detenida")
+                    if camara_tomada:
+                        # La captura sigue viva mientras otros la usen (o durante el linger)
+                        await camera_manager.release_camera(cam_id)
+                    logger.info(f"🛑 Listener de cámara URL {cam_id} liberado")
                 else:
                     logger.info(f"🛑 Cámara LOCAL {cam_id} detenida")
         except Exception as e:
             logger.error(f"Error en cleanup: {e}")
 
-# ==================== ENDPOINTS DE FACTURACIÓN ====================
-
-# Funcionalidades relacionadas con facturación y registros han sido removidas
-# para simplificar el backend a un servicio de procesamiento de cámaras sin DB.
-
 @app.get("/")
 async def root():
     """Endpoint de prueba"""
     return {
-        "message": "Sistema de Detección de Placas - Backend Activo (sin DB)",
+        "message": "Sistema de Detección de Placas - Backend Activo",
         "camaras_activas": len(camera_manager.active_tasks),
         "endpoints": {
             "websocket_directo": "/ws/camara-directa"
         }
     }
 
+# ==================== SUSCRIPTORES DE EVENTOS ====================
+
+def _guardar_placa_confirmada(evento: dict):
+    """Crea registro + factura de una entrada confirmada (corre en el pool de hilos)"""
+    camara_id = evento.get("camara_id")
+    db = SessionLocal()
+    try:
+        crear_registro_con_factura(
+            db,
+            camara_id if isinstance(camara_id, int) else None,
+            evento["placa"],
+            evento.get("tipo_vehiculo") or "car",
+            matcher=exit_matcher,
+            confianza=evento.get("confianza", 0.8),
+            ruta_imagen=evento.get("url_imagen"),
+        )
+    finally:
+        db.close()
+
+async def escritor_db(evento: dict):
+    """Persiste las placas confirmadas que no son salidas"""
+    if evento.get("direccion") == "salida":
+        return
+    t0 = time.perf_counter()
+    await asyncio.get_running_loop().run_in_executor(None, _guardar_placa_confirmada, evento)
+    metricas.camara(evento.get("camara_id")).observar("escritura_db", time.perf_counter() - t0)
+
+async def facturacion_salidas(evento: dict):
+    """Encola el cierre de factura cuando un vehículo con placa conocida sale"""
+    placa = evento.get("placa")
+    if evento["tipo"] == "vehicle_exited":
+        encolar_salida_detectada(exit_matcher, placa, "salida")
+    else:
+        encolar_salida_detectada(exit_matcher, placa, evento.get("direccion"))
+
+async def push_websocket(evento: dict):
+    """
+    Pasa el evento (JSON) al loop de su cámara, que lo envía a los listeners
+    que lo pidieron entre un frame y el siguiente
+    """
+    cam_id = evento.get("camara_id")
+    if not any(camera_manager.listener_opts.get(ws, {}).get("eventos")
+               for ws in list(camera_manager.listeners.get(cam_id, []))):
+        return
+    camera_manager.encolar_evento(cam_id, json.dumps({"type": "evento", **evento}))
+
+# ==================== REGISTRO DE CÁMARAS ====================
+
+async def en_db(fn, *args):
+    """Ejecuta fn(db, *args) con una sesión propia en el pool de hilos"""
+    def _ejecutar():
+        db = SessionLocal()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+    return await asyncio.get_running_loop().run_in_executor(None, _ejecutar)
+
+def tipo_camara(url: str):
+    """'local' para cámaras del navegador (envían frames por WebSocket), 'ip' para el resto"""
+    return "local" if url.startswith("local://") else "ip"
+
+def _camara_a_dict(camara):
+    return {
+        "id": camara.id,
+        "nombre": camara.nombre,
+        "url": camara.url,
+        "tipo": tipo_camara(camara.url),
+        "activa": bool(camara.activa),
+        "creado": camara.fecha_registro.isoformat() if camara.fecha_registro else None,
+    }
+
+def _estado_camara(camara: dict):
+    """Agrega el estado de procesamiento en vivo a una cámara registrada"""
+    cam_id = camara["id"]
+    salud = camera_manager.salud.get(cam_id)
+    return {
+        **camara,
+        "procesando": cam_id in camera_manager.active_tasks,
+        "listeners": len(camera_manager.listeners.get(cam_id, set())),
+        "salud": salud.estado if salud else None,
+    }
+
+def _id_camara_para_url(db, url: str):
+    normalizada = normalizar_url(url)
+    for camara in crud.obtener_camaras(db):
+        if normalizar_url(camara.url) == normalizada:
+            return camara.id
+    return id_camara_url(url)
+
+async def iniciar_camara_registrada(camara: dict):
+    """Inicia el procesamiento 24/7 de una cámara registrada (sin depender de visores)"""
+    if camara["tipo"] == "local":
+        return
+    try:
+        await camera_manager.start_camera(camara["id"], camara["url"])
+    except RuntimeError as e:
+        logger.error(f"❌ No se pudo iniciar cámara {camara['id']}: {e}")
+
+async def iniciar_camaras_activas():
+    """Arranca en segundo plano las cámaras activas, escalonadas"""
+    camaras = await en_db(lambda db: [_camara_a_dict(c) for c in crud.obtener_camaras_activas(db)])
+    logger.info(f"🎬 Iniciando {len(camaras)} cámaras activas registradas")
+    for i, camara in enumerate(camaras):
+        if i:
+            await asyncio.sleep(ESCALONAMIENTO_CAMARAS_S)
+        await iniciar_camara_registrada(camara)
+
+@app.on_event("startup")
+async def startup_event():
+    """Crea tablas, carga el índice de facturas abiertas y arranca el cierre por lotes y los suscriptores"""
+    Base.metadata.create_all(bind=engine)
+    loop = asyncio.get_running_loop()
+    event_bus.bind_loop(loop)
+    await loop.run_in_executor(None, exit_matcher.cargar_indice)
+    app.state.exit_matcher_task = loop.create_task(exit_matcher.run())
+    app.state.arranque_camaras = loop.create_task(iniciar_camaras_activas())
+    app.state.consumidores_eventos = [
+        iniciar_consumidor(event_bus.subscribe("db", ["plate_confirmed"]), escritor_db),
+        iniciar_consumidor(event_bus.subscribe("facturacion", ["plate_confirmed", "vehicle_exited"]), facturacion_salidas),
+        iniciar_consumidor(event_bus.subscribe("websocket"), push_websocket),
+    ]
+    if RETENCION_AUTOMATICA:
+        detection.iniciar_retencion()
+        ingest.iniciar_retencion()
+        logger.info("🧹 Retención automática de evidencias y registros iniciada")
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Limpieza al cerrar la aplicación"""
+    arranque = getattr(app.state, "arranque_camaras", None)
+    if arranque:
+        arranque.cancel()
     await camera_manager.stop_all_cameras()
+    task = getattr(app.state, "exit_matcher_task", None)
+    if task:
+        task.cancel()
+    for consumidor in getattr(app.state, "consumidores_eventos", []):
+        consumidor.cancel()
+    detection.detener_retencion()
+    ingest.detener_retencion()
+    # Cerrar todas las salidas que quedaron en cola (puede ser más de un lote)
+    await asyncio.get_running_loop().run_in_executor(None, exit_matcher.vaciar)
     logger.info("Backend cerrado - todas las cámaras detenidas")
 
 
 # ==================== MODELOS PYDANTIC ====================
 
 class CameraRequest(BaseModel):
-    """Modelo para crear/actualizar cámara"""
+    """Modelo para crear/actualizar cámara (el tipo se deduce de la URL)"""
     nombre: str
     url: str = "local://camera"  # URL por defecto para cámaras locales
-    tipo: str = "ip"  # "ip" o "local"
+    activa: bool = True  # procesar 24/7 desde el arranque
 
 class RegistroRequest(BaseModel):
     """Modelo para crear registro"""
@@ -222,12 +432,27 @@ class RegistroRequest(BaseModel):
     imagen_url: str = None
     estado: str = "activo"
 
+class SalidaRequest(BaseModel):
+    """Modelo para reportar la salida de un vehículo"""
+    placa: str
+    hora_salida: datetime = None
+
+class InstrumentacionRequest(BaseModel):
+    """Encender/apagar la instrumentación de una cámara"""
+    activa: bool = True
+    perfilar: bool = False  # cProfile sobre 1 de cada `muestreo` frames
+    muestreo: int = MUESTREO_PERFIL_DEFECTO
+
+class TrazasRequest(BaseModel):
+    """Encender/apagar las trazas por frame de una cámara"""
+    activa: bool = True
+    umbral_ms: float = UMBRAL_LENTO_MS  # solo se guardan los frames más lentos que esto
+
 # ==================== ALMACENAMIENTO EN MEMORIA ====================
 
-# Diccionarios para almacenar datos (en producción usar base de datos)
-cameras_db = {}  # {camera_id: {"nombre": str, "url": str, "tipo": str, "creado": datetime}}
+# Las cámaras se guardan en la tabla camaras (models.Camara); los registros
+# manuales siguen en memoria
 registros_db = {}  # {registro_id: {"placa": str, "timestamp": str, "estado": str, ...}}
-camera_counter = 0
 registro_counter = 0
 
 # ==================== ENDPOINTS REST PARA CÁMARAS ====================
@@ -235,57 +460,63 @@ registro_counter = 0
 @app.get("/api/camaras")
 async def get_camaras():
     """Obtener lista de cámaras registradas"""
+    camaras = await en_db(lambda db: [_camara_a_dict(c) for c in crud.obtener_camaras(db)])
     return {
-        "camaras": list(cameras_db.values()),
-        "total": len(cameras_db),
+        "camaras": [_estado_camara(c) for c in camaras],
+        "total": len(camaras),
         "activas": len(camera_manager.active_tasks)
     }
 
 @app.post("/api/camaras")
 async def create_camera(camera: CameraRequest):
-    """Crear nueva cámara"""
-    global camera_counter
-    camera_counter += 1
-    camera_id = camera_counter
-    
-    cameras_db[camera_id] = {
-        "id": camera_id,
-        "nombre": camera.nombre,
-        "url": camera.url,
-        "tipo": camera.tipo,
-        "creado": datetime.now().isoformat(),
-        "estado": "inactivo"
-    }
+    """Crear nueva cámara (si está activa, empieza a procesarse de inmediato)"""
+    camara = await en_db(lambda db: _camara_a_dict(crud.crear_camara(db, camera)))
+    if camara["activa"]:
+        await iniciar_camara_registrada(camara)
     
-    logger.info(f"Cámara creada: {camera.nombre} (ID: {camera_id})")
+    logger.info(f"Cámara creada: {camera.nombre} (ID: {camara['id']})")
     return {
         "success": True,
-        "camera_id": camera_id,
+        "camera_id": camara["id"],
         "message": "Cámara creada exitosamente"
     }
 
+@app.get("/api/salud/camaras")
+async def salud_camaras():
+    """Estado de conexión de cada cámara: activa, reconectando o caida, con backoff y último error"""
+    salud = camera_manager.estado_salud()
+    return {
+        "camaras": salud,
+        "caidas": [cam_id for cam_id, s in salud.items() if s["estado"] == "caida"],
+        "timestamp": datetime.now().isoformat()
+    }
+
+def _obtener_camara_dict(db, camera_id: int):
+    camara = crud.obtener_camara_por_id(db, camera_id)
+    return _camara_a_dict(camara) if camara else None
+
 @app.get("/api/camaras/{camera_id}")
 async def get_camera(camera_id: int):
     """Obtener detalles de cámara específica"""
-    if camera_id not in cameras_db:
+    camara = await en_db(_obtener_camara_dict, camera_id)
+    if camara is None:
         raise HTTPException(status_code=404, detail="Cámara no encontrada")
-    
-    camera = cameras_db[camera_id]
-    camera["activa"] = camera_id in camera_manager.active_tasks
-    camera["listeners"] = len(camera_manager.listeners.get(camera_id, set()))
-    return camera
+    return _estado_camara(camara)
 
 @app.put("/api/camaras/{camera_id}")
 async def update_camera(camera_id: int, camera: CameraRequest):
-    """Actualizar cámara"""
-    if camera_id not in cameras_db:
+    """Actualizar cámara (reinicia el procesamiento si cambió la URL o el estado)"""
+    anterior = await en_db(_obtener_camara_dict, camera_id)
+    if anterior is None:
         raise HTTPException(status_code=404, detail="Cámara no encontrada")
     
-    cameras_db[camera_id].update({
-        "nombre": camera.nombre,
-        "url": camera.url,
-        "tipo": camera.tipo
-    })
+    camara = await en_db(lambda db: _camara_a_dict(
+        crud.actualizar_camara(db, camera_id, camera.nombre, camera.url, camera.activa)
+    ))
+    if (anterior["url"], anterior["activa"]) != (camara["url"], camara["activa"]):
+        await camera_manager.stop_camera(camera_id)
+        if camara["activa"]:
+            await iniciar_camara_registrada(camara)
     
     logger.info(f"Cámara actualizada: {camera.nombre} (ID: {camera_id})")
     return {"success": True, "message": "Cámara actualizada"}
@@ -293,14 +524,13 @@ async def update_camera(camera_id: int, camera: CameraRequest):
 @app.delete("/api/camaras/{camera_id}")
 async def delete_camera(camera_id: int):
     """Eliminar cámara"""
-    if camera_id not in cameras_db:
+    if not await en_db(crud.eliminar_camara, camera_id):
         raise HTTPException(status_code=404, detail="Cámara no encontrada")
     
     # Detener procesamiento si está activo
     if camera_id in camera_manager.active_tasks:
         await camera_manager.stop_camera(camera_id)
     
-    del cameras_db[camera_id]
     logger.info(f"Cámara eliminada (ID: {camera_id})")
     return {"success": True, "message": "Cámara eliminada"}
 
@@ -383,18 +613,192 @@ async def delete_registro(registro_id: int):
     logger.info(f"Registro eliminado (ID: {registro_id})")
     return {"success": True, "message": "Registro eliminado"}
 
+# ==================== ENDPOINTS DE FACTURACIÓN ====================
+
+@app.post("/api/salidas")
+async def registrar_salida(salida: SalidaRequest):
+    """Emparejar una salida con su factura abierta (se cierra en el próximo lote)"""
+    factura_id = exit_matcher.encolar_salida(salida.placa, salida.hora_salida)
+    if factura_id is None:
+        raise HTTPException(status_code=404, detail="No hay factura abierta para la placa")
+    
+    return {
+        "success": True,
+        "factura_id": factura_id,
+        "pendientes": len(exit_matcher.pendientes)
+    }
+
+@app.get("/api/reportes/ingresos")
+async def reporte_ingresos(agrupacion: str = "dia", desde: datetime = None, hasta: datetime = None):
+    """Ingresos agregados por hora, dia, mes, camara o tipo_vehiculo"""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            None, report_engine.reporte_ingresos, agrupacion, desde, hasta
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ==================== EXPORTACIÓN DE HISTORIAL ====================
+
+@app.get("/api/exportar/{tabla}")
+async def exportar_tabla(tabla: str, formato: str = "csv"):
+    """Exportar registros o detecciones_raw en streaming (csv, ndjson o parquet)"""
+    if tabla not in TABLAS:
+        raise HTTPException(status_code=404, detail="Tabla no exportable")
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {formato}")
+    if not os.path.exists(DETECCIONES_DB_PATH):
+        raise HTTPException(status_code=404, detail="Base de datos de detecciones no encontrada")
+    
+    try:
+        with sqlite3.connect(DETECCIONES_DB_PATH) as conn:
+            columnas_tabla(conn, tabla)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    filename = f"{tabla}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    return StreamingResponse(
+        exportar_bloques(DETECCIONES_DB_PATH, tabla, formato),
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # ==================== ENDPOINTS DE ESTADÍSTICAS ====================
 
 @app.get("/api/stats")
 async def get_stats():
     """Obtener estadísticas del sistema"""
     return {
-        "camaras_total": len(cameras_db),
+        "camaras_total": await en_db(lambda db: db.query(models.Camara).count()),
         "camaras_activas": len(camera_manager.active_tasks),
         "registros_total": len(registros_db),
         "registros_activos": len([r for r in registros_db.values() if r.get("estado") == "activo"]),
         "conexiones_simultaneas": sum(len(listeners) for listeners in camera_manager.listeners.values()),
+        "tracks": estadisticas_tracks(),
+        "eventos": event_bus.estadisticas(),
         "timestamp": datetime.now().isoformat()
     }
-    await camera_manager.stop_all_cameras()
-    logger.info("Aplicación cerrada - todas las cámaras detenidas")
\ No newline at end of file
+
+# ==================== ADMINISTRACIÓN: INSTRUMENTACIÓN ====================
+
+def _clave_camara(cam_id: str):
+    """Las cámaras registradas usan el id entero; las de URL y locales, texto"""
+    return int(cam_id) if cam_id.isdigit() else cam_id
+
+@app.get("/api/admin/instrumentacion")
+async def estado_instrumentacion():
+    """Contadores e histogramas por etapa de las cámaras instrumentadas"""
+    return {
+        "instrumentadas": instrumentacion.estado(),
+        # False: las cámaras solo reciben el texto de _dibujar_sin_pipeline (sin YOLO)
+        "pipeline": detection.pipeline is not None,
+        "camaras": [str(cam_id) for cam_id in camera_manager.active_tasks],
+        "sesiones_locales": list(SESIONES),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.put("/api/admin/instrumentacion/{cam_id}")
+async def configurar_instrumentacion(cam_id: str, peticion: InstrumentacionRequest):
+    """Enciende (reiniciando contadores) o apaga la instrumentación de una cámara en caliente"""
+    clave = _clave_camara(cam_id)
+    if not peticion.activa:
+        if instrumentacion.desactivar(clave) is None:
+            raise HTTPException(status_code=404, detail="La cámara no está instrumentada")
+        return {"success": True, "activa": False}
+    if peticion.muestreo < 1:
+        raise HTTPException(status_code=400, detail="muestreo debe ser >= 1")
+    instrumentos = instrumentacion.activar(clave, peticion.perfilar, peticion.muestreo)
+    return {"success": True, "activa": True, "instrumentacion": instrumentos.a_dict()}
+
+@app.get("/api/admin/instrumentacion/{cam_id}/perfil", response_class=PlainTextResponse)
+async def perfil_instrumentacion(cam_id: str, top: int = TOP_PERFIL, orden: str = "cumulative"):
+    """Funciones más costosas de los frames perfilados (pstats)"""
+    instrumentos = instrumentacion.para(_clave_camara(cam_id))
+    if instrumentos is None:
+        raise HTTPException(status_code=404, detail="La cámara no está instrumentada")
+    if orden not in ("cumulative", "tottime", "calls"):
+        raise HTTPException(status_code=400, detail="orden debe ser cumulative, tottime o calls")
+    return instrumentos.perfil_texto(top, orden)
+
+# ==================== ADMINISTRACIÓN: TRAZAS POR FRAME ====================
+
+@app.get("/api/admin/trazas")
+async def frames_lentos(cam_id: str = None, limite: int = 50):
+    """Últimos frames lentos (más recientes primero) con el desglose por etapa"""
+    return {
+        "trazadas": trazador.camaras(),
+        "frames_trazados": trazador.trazados,
+        "lentos": trazador.frames_lentos(cam_id, limite),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/api/admin/trazas/chrome")
+async def exportar_trazas_chrome(cam_id: str = None):
+    """Frames lentos en formato Chrome trace-event (chrome://tracing o Perfetto)"""
+    nombre = f"trazas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    return JSONResponse(
+        trazador.exportar_chrome(cam_id),
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'}
+    )
+
+@app.put("/api/admin/trazas/{cam_id}")
+async def configurar_trazas(cam_id: str, peticion: TrazasRequest):
+    """Enciende (con su umbral) o apaga las trazas por frame de una cámara en caliente"""
+    clave = _clave_camara(cam_id)
+    if not peticion.activa:
+        if not trazador.desactivar(clave):
+            raise HTTPException(status_code=404, detail="La cámara no está trazada")
+        return {"success": True, "activa": False}
+    if peticion.umbral_ms < 0:
+        raise HTTPException(status_code=400, detail="umbral_ms debe ser >= 0")
+    trazador.activar(clave, peticion.umbral_ms)
+    return {"success": True, "activa": True, "umbral_ms": peticion.umbral_ms}
+
+@app.delete("/api/admin/trazas")
+async def limpiar_trazas():
+    """Vacía el buffer de frames lentos"""
+    trazador.limpiar()
+    return {"success": True}
+
+# ==================== MÉTRICAS (PROMETHEUS) ====================
+
+def _familias_sistema():
+    """Colas, descartes, listeners, salud, OCR y memoria (lo que no es por frame)"""
+    eventos = event_bus.estadisticas()
+    profundidad, descartes = [], []
+    for nombre, sub in eventos["suscriptores"].items():
+        profundidad.append(({"cola": f"evento:{nombre}"}, sub["en_cola"]))
+        descartes.append(({"cola": f"evento:{nombre}"}, sub["descartados"]))
+    for cam_id, sesion in list(SESIONES.items()):
+        profundidad.append(({"cola": f"ingesta:{cam_id}"}, sesion.queue.qsize()))
+        descartes.append(({"cola": f"ingesta:{cam_id}"}, sesion.descartados))
+    
+    listeners = [({"camara": str(cam_id)}, len(ws)) for cam_id, ws in list(camera_manager.listeners.items())]
+    estados = [({"camara": str(cam_id), "estado": s["estado"]}, 1)
+               for cam_id, s in camera_manager.estado_salud().items()]
+    
+    ocr = contadores_ocr()
+    omitidos, procesados = ocr.get("omitidos", 0), ocr.get("procesados", 0)
+    total_ocr = omitidos + procesados
+    return [
+        (f"{PREFIJO}_cola_profundidad", "gauge", "Elementos en espera por cola (bus de eventos e ingesta local)", profundidad),
+        (f"{PREFIJO}_cola_descartes_total", "counter", "Elementos descartados por cola llena o viejos", descartes),
+        (f"{PREFIJO}_eventos_publicados_total", "counter", "Eventos publicados en el bus", [({}, eventos["publicados"])]),
+        (f"{PREFIJO}_camaras_activas", "gauge", "Cámaras con loop de procesamiento", [({}, len(camera_manager.active_tasks))]),
+        (f"{PREFIJO}_listeners", "gauge", "WebSockets conectados por cámara", listeners),
+        (f"{PREFIJO}_camara_estado", "gauge", "Estado de conexión de cada cámara (1 = estado actual)", estados),
+        (f"{PREFIJO}_ocr_tracks_total", "counter", "Tracks por frame que saltaron el OCR (placa confirmada) o lo usaron",
+         [({"resultado": "omitido"}, omitidos), ({"resultado": "procesado"}, procesados)]),
+        (f"{PREFIJO}_ocr_omision_ratio", "gauge", "Fracción de tracks que no necesitaron OCR",
+         [({}, round(omitidos / total_ocr, 4) if total_ocr else 0)]),
+        ("process_resident_memory_bytes", "gauge", "Memoria residente del proceso", [({}, memoria_proceso())]),
+    ]
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas del pipeline en formato de exposición de Prometheus"""
+    return PlainTextResponse(
+        exponer(metricas.familias() + _familias_sistema()),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
\ No newline at end of file
@@ -0,0 +1,159 @@
+# api/core/billing.py
+"""
+Emparejamiento automático de salidas con facturas abiertas
+
+- indice: placa normalizada -> factura abierta (búsqueda O(1) por hash)
+- pendientes: salidas ya emparejadas, esperando cierre
+- Los cierres se agrupan en lotes y se confirman en una sola transacción,
+  así una ráfaga de salidas (cambio de turno) no hace un COMMIT por vehículo.
+"""
+import asyncio
+import logging
+import re
+import threading
+from collections import deque
+from datetime import datetime
+
+import crud
+
+logger = logging.getLogger(__name__)
+
+MAX_LOTE_CIERRES = 200       # máximo de facturas cerradas por transacción
+INTERVALO_LOTE = 0.5         # segundos entre vaciados de la cola de salidas
+
+
+def normalizar_placa(placa: str):
+    """Clave del índice: mayúsculas y solo caracteres alfanuméricos."""
+    if not placa:
+        return ""
+    return re.sub(r'[^A-Z0-9]', '', placa.upper())
+
+
+class ExitMatcher:
+    """
+    Empareja detecciones de salida con la factura abierta de la misma placa
+    y las cierra en lotes.
+    """
+
+    def __init__(self, session_factory, tamano_lote: int = MAX_LOTE_CIERRES,
+                 intervalo: float = INTERVALO_LOTE):
+        self._session_factory = session_factory
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.indice = {}          # placa -> (factura_id, hora_entrada, tarifa)
+        self.pendientes = deque()  # (factura_id, placa, hora_entrada, tarifa, hora_salida)
+        self._lock = threading.Lock()
+
+    def cargar_indice(self):
+        """Reconstruye el índice con las facturas activas de la base de datos."""
+        db = self._session_factory()
+        try:
+            filas = crud.obtener_facturas_abiertas_con_placa(db)
+        finally:
+            db.close()
+
+        indice = {}
+        # Ordenadas por hora de entrada: si hay duplicados gana la más reciente
+        for factura_id, placa, hora_entrada, tarifa in filas:
+            clave = normalizar_placa(placa)
+            if clave:
+                indice[clave] = (factura_id, hora_entrada, tarifa)
+
+        with self._lock:
+            self.indice = indice
+        logger.info(f"💳 Índice de facturas abiertas cargado ({len(indice)} placas)")
+        return len(indice)
+
+    def registrar_entrada(self, placa: str, factura_id: int, hora_entrada: datetime,
+                          tarifa_por_hora: float = 3000.0):
+        """Añade al índice una factura recién creada."""
+        clave = normalizar_placa(placa)
+        if not clave:
+            return
+        with self._lock:
+            self.indice[clave] = (factura_id, hora_entrada, tarifa_por_hora)
+
+    def encolar_salida(self, placa: str, hora_salida: datetime = None):
+        """
+        Empareja una salida con su factura abierta y la deja lista para cierre.
+        Retorna el id de la factura o None si la placa no tiene factura abierta.
+        """
+        clave = normalizar_placa(placa)
+        if hora_salida is None:
+            hora_salida = datetime.utcnow()
+
+        with self._lock:
+            # pop: lecturas repetidas de la misma salida no cierran dos veces
+            abierta = self.indice.pop(clave, None)
+            if abierta is None:
+                return None
+            factura_id, hora_entrada, tarifa = abierta
+            self.pendientes.append((factura_id, clave, hora_entrada, tarifa, hora_salida))
+
+        return factura_id
+
+    def procesar_lote(self):
+        """
+        Calcula el cobro de las salidas pendientes y las cierra en una sola
+        transacción. Las que ya no estaban activas (cerradas a mano) se
+        descartan. Retorna la lista de cierres aplicados.
+        """
+        with self._lock:
+            n = min(len(self.pendientes), self.tamano_lote)
+            lote = [self.pendientes.popleft() for _ in range(n)]
+
+        if not lote:
+            return []
+
+        cierres = []
+        for factura_id, _, hora_entrada, tarifa, hora_salida in lote:
+            valor, _ = crud.calcular_valor_factura(hora_entrada, hora_salida, tarifa)
+            cierres.append({"id": factura_id, "hora_salida": hora_salida, "valor_pagado": valor})
+
+        db = self._session_factory()
+        try:
+            cerradas = crud.cerrar_facturas_lote(db, cierres)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ Error cerrando lote de {len(lote)} facturas: {e}")
+            # Devolver el lote a la cola para reintentar en el siguiente ciclo
+            with self._lock:
+                self.pendientes.extendleft(reversed(lote))
+            return []
+        finally:
+            db.close()
+
+        if len(cerradas) < len(cierres):
+            with self._lock:
+                for factura_id, clave, _, _, _ in lote:
+                    # Solo si el índice aún apunta a esa factura (no a una entrada nueva)
+                    if factura_id not in cerradas and self.indice.get(clave, (None,))[0] == factura_id:
+                        del self.indice[clave]
+            logger.info(f"💳 {len(cierres) - len(cerradas)} facturas del lote ya estaban cerradas")
+        cierres = [c for c in cierres if c["id"] in cerradas]
+        logger.info(f"💳 {len(cierres)} facturas cerradas en lote")
+        return cierres
+
+    def vaciar(self):
+        """
+        Procesa lotes hasta vaciar la cola (o hasta que un lote falle).
+        Retorna el total de facturas cerradas.
+        """
+        total = 0
+        while self.pendientes:
+            antes = len(self.pendientes)
+            total += len(self.procesar_lote())
+            if len(self.pendientes) >= antes:  # el lote volvió a la cola: error de BD
+                break
+        return total
+
+    async def run(self):
+        """Vacía la cola de salidas periódicamente sin bloquear el event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if self.pendientes:
+                    await loop.run_in_executor(None, self.vaciar)
+            except Exception as e:
+                logger.error(f"❌ Error en ciclo de cierre de facturas: {e}")
+            await asyncio.sleep(self.intervalo)
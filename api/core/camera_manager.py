@@ -2,17 +2,79 @@
 import asyncio
 import cv2
 import base64
+import json
+import os
+import time
 import traceback
 import logging
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 
-from .detection import procesar_frame
+from .detection import (procesar_frame, drenar_eventos, obtener_detecciones, dibujar_detecciones,
+                        tiempos_etapas, trazar_pipeline, drenar_spans, liberar_camara)
+from .perfiles import perfil_desde_config, estado_adaptacion, perfil_efectivo, registrar_latencia
+from .codec import codificar, redimensionar, BufferPool
+from .capture import opciones_captura
+from .protocolo import protocolo_desde_config, empaquetar, TIPO_JPEG, TIPO_DETECCIONES
+from . import supervisor
+from .supervisor import SaludCamara
+from .instrumentation import instrumentacion
+from .metrics import metricas
+from .tracing import trazador
 
 logger = logging.getLogger(__name__)
 
-# Límites para prevenir fugas de memoria
-MAX_LISTENERS_PER_CAMERA = 50
+# Límites para prevenir fugas de memoria (el de listeners se puede subir
+# por entorno para pruebas de carga: MAX_LISTENERS_POR_CAMARA)
+MAX_LISTENERS_PER_CAMERA = int(os.environ.get("MAX_LISTENERS_POR_CAMARA", 50))
 MAX_ACTIVE_CAMERAS = 20
+MAX_EVENTOS_PENDIENTES = 200  # por cámara, mientras el loop no los envía
+
+# Segundos que una cámara sin usuarios sigue abierta (y con el pipeline
+# caliente) antes de liberarse; un dashboard que reconecta la reutiliza
+LINGER_CAMARA_S = 30.0
+
+MODOS_LISTENER = ("video", "metadatos")
+MODOS_OVERLAY = ("servidor", "cliente")
+
+
+def opciones_listener(config: dict, calidad_defecto: int = 70):
+    """
+    Normaliza las opciones del handshake de un listener:
+    - modo "video" (por defecto): JPEG anotado en cada frame
+    - modo "metadatos": JSON compacto con las detecciones de cada frame y,
+      solo si se pide con "video_fps" > 0, video limitado a esa tasa
+    - "overlay": "servidor" (por defecto) recibe el JPEG con las cajas
+      dibujadas; "cliente" recibe el JPEG sin anotar precedido del JSON de
+      detecciones de ese frame para dibujarlas en el navegador
+    - "eventos": true agrega los eventos del bus (placas confirmadas, cruces)
+    - Perfil de video: "perfil" (alto/medio/bajo), "ancho", "calidad",
+      "max_fps" y "adaptativo" (por defecto true: baja de perfil si los
+      envíos a este listener se vuelven lentos)
+    - "protocolo": "jpeg" (por defecto, JPEG crudo) o "trama": cada mensaje
+      binario va en el sobre de core/protocolo.py (seq, ts de captura,
+      cámara y, con overlay en el cliente, las detecciones del frame)
+    """
+    modo = config.get("modo", "video")
+    if modo not in MODOS_LISTENER:
+        raise ValueError(f"Modo inválido: {modo} (válidos: {', '.join(MODOS_LISTENER)})")
+    overlay = config.get("overlay", "servidor")
+    if overlay not in MODOS_OVERLAY:
+        raise ValueError(f"Overlay inválido: {overlay} (válidos: {', '.join(MODOS_OVERLAY)})")
+    metadatos = modo == "metadatos"
+    video_fps = config.get("max_fps", config.get("video_fps", 0 if metadatos else None))
+    perfil = perfil_desde_config(config, calidad_defecto)
+    return {
+        **estado_adaptacion(perfil, bool(config.get("adaptativo", True))),
+        "modo": modo,
+        "metadatos": metadatos,
+        "overlay": overlay,
+        "eventos": bool(config.get("eventos")),
+        "protocolo": protocolo_desde_config(config),
+        # None = todos los frames, 0 = sin video
+        "video_intervalo": None if video_fps is None else (1.0 / float(video_fps) if float(video_fps) > 0 else 0),
+        "ultimo_video": 0.0,
+    }
 
 class CameraManager:
     """
@@ -20,32 +82,102 @@ class CameraManager:
     - active_tasks: tarea asyncio por camara (processing loop)
     - listeners: set de websockets por camara para broadcast
     - Protecciones contra fugas de memoria
+    - Publica los eventos del pipeline en el bus (si hay uno)
+    - Sesiones de captura con conteo de referencias: start_camera toma una
+      referencia y release_camera la suelta; sin referencias, la cámara se
+      detiene tras LINGER_CAMARA_S si nadie la vuelve a pedir
     """
 
-    def __init__(self):
+    def __init__(self, event_bus=None):
         self.active_tasks = {}       # cam_id -> asyncio.Task
         self.listeners = defaultdict(set)  # cam_id -> set(websocket)
+        self.listener_opts = {}      # websocket -> opciones del handshake
+        self.salud = {}              # cam_id -> SaludCamara (se conserva tras detenerla)
         self._stopping = set()
+        self.referencias = defaultdict(int)  # cam_id -> usuarios de la sesión de captura
+        self._linger = {}            # cam_id -> tarea que la liberará si sigue sin uso
+        self.event_bus = event_bus
+        # cam_id -> eventos (JSON) pendientes para los listeners que los pidieron.
+        # Solo el loop de la cámara escribe en sus websockets, así un evento
+        # nunca queda entre una cabecera JSON y su JPEG
+        self._eventos_ws = defaultdict(lambda: deque(maxlen=MAX_EVENTOS_PENDIENTES))
 
-    async def start_camera(self, cam_id: int, url: str, websocket=None, db=None):
+    def publicar_eventos(self, cam_id):
+        """Pasa al bus los eventos generados por el último frame (no bloquea)."""
+        if self.event_bus is None:
+            return
+        for evento in drenar_eventos():
+            if evento.get("camara_id") is None:
+                evento["camara_id"] = cam_id
+            self.event_bus.publish(evento)
+
+    def encolar_evento(self, cam_id, mensaje: str):
+        """Deja un evento para que el loop de la cámara lo envíe entre frames."""
+        if cam_id in self.active_tasks:
+            self._eventos_ws[cam_id].append(mensaje)
+
+    async def _enviar_eventos(self, cam_id, listeners, dead_websockets):
+        pendientes = self._eventos_ws.get(cam_id)
+        if not pendientes:
+            return
+        destinos = [ws for ws in listeners if self.listener_opts.get(ws, {}).get("eventos")]
+        while pendientes:
+            mensaje = pendientes.popleft()
+            if destinos:
+                await self._enviar(destinos, mensaje, dead_websockets)
+
+    async def start_camera(self, cam_id: int, url: str, websocket=None, db=None, captura: dict = None):
         """
-        Inicia la tarea de procesamiento si no existe.
+        Toma una referencia a la cámara e inicia la tarea de procesamiento si
+        no existe. Si la cámara seguía abierta (en linger) se reutiliza.
+        captura: resultado de opciones_captura() (backend, cada_n, ancho, ...)
         """
-        # Validar límite de cámaras activas
-        if len(self.active_tasks) >= MAX_ACTIVE_CAMERAS:
-            logger.warning(f"Límite de cámaras activas alcanzado: {MAX_ACTIVE_CAMERAS}")
-            raise RuntimeError(f"Máximo de {MAX_ACTIVE_CAMERAS} cámaras activas alcanzado")
+        pendiente = self._linger.pop(cam_id, None)
+        if pendiente:
+            pendiente.cancel()
         
-        if cam_id not in self.active_tasks:
+        task = self.active_tasks.get(cam_id)
+        if task is None or task.done():
+            # Validar límite de cámaras activas
+            if len(self.active_tasks) >= MAX_ACTIVE_CAMERAS and task is None:
+                logger.warning(f"Límite de cámaras activas alcanzado: {MAX_ACTIVE_CAMERAS}")
+                raise RuntimeError(f"Máximo de {MAX_ACTIVE_CAMERAS} cámaras activas alcanzado")
             loop = asyncio.get_event_loop()
-            task = loop.create_task(self._process_loop(cam_id, url))
+            task = loop.create_task(self._process_loop(cam_id, url, captura or opciones_captura()))
             self.active_tasks[cam_id] = task
             logger.info(f"🎬 Cámara {cam_id} iniciada desde URL: {url}")
+        else:
+            logger.info(f"♻️ Cámara {cam_id} reutilizada ({self.referencias[cam_id] + 1} referencias)")
+        self.referencias[cam_id] += 1
+
+    async def release_camera(self, cam_id):
+        """
+        Suelta una referencia. Sin referencias, la cámara se detiene tras
+        LINGER_CAMARA_S salvo que alguien la vuelva a pedir antes.
+        """
+        if self.referencias.get(cam_id, 0) <= 0:
+            return
+        self.referencias[cam_id] -= 1
+        if self.referencias[cam_id] == 0 and cam_id in self.active_tasks and cam_id not in self._linger:
+            logger.info(f"⏳ Cámara {cam_id} sin usuarios, se libera en {LINGER_CAMARA_S:.0f} s")
+            self._linger[cam_id] = asyncio.get_running_loop().create_task(self._liberar_sin_uso(cam_id))
+
+    async def _liberar_sin_uso(self, cam_id):
+        await asyncio.sleep(LINGER_CAMARA_S)
+        # Si alguien la tomó mientras tanto, start_camera ya canceló esta tarea
+        self._linger.pop(cam_id, None)
+        if self.referencias.get(cam_id, 0) == 0:
+            await self.stop_camera(cam_id)
 
     async def stop_camera(self, cam_id: int):
         """
-        Marca la tarea para detenerse y cierra listeners.
+        Marca la tarea para detenerse y cierra listeners (sin importar las
+        referencias: es la detención forzada).
         """
+        pendiente = self._linger.pop(cam_id, None)
+        if pendiente and pendiente is not asyncio.current_task():
+            pendiente.cancel()
+        self.referencias.pop(cam_id, None)
         if cam_id in self.active_tasks:
             self._stopping.add(cam_id)
             try:
@@ -56,18 +188,25 @@ class CameraManager:
                 self.active_tasks.pop(cam_id, None)
                 self._stopping.discard(cam_id)
         # cerrar listeners (se espera que los websockets manejen desconexión del lado cliente)
-        self.listeners.pop(cam_id, None)
+        for ws in self.listeners.pop(cam_id, set()):
+            self.listener_opts.pop(ws, None)
+        self._eventos_ws.pop(cam_id, None)
         logger.info(f"Cámara {cam_id} detenida")
 
+    def estado_salud(self):
+        """Salud de cada cámara supervisada (activa, reconectando, caida, ...)."""
+        return {cam_id: salud.a_dict() for cam_id, salud in self.salud.items()}
+
     async def stop_all_cameras(self):
         keys = list(self.active_tasks.keys())
         for cam_id in keys:
             await self.stop_camera(cam_id)
         logger.info("Todas las cámaras detenidas")
 
-    async def register_listener(self, cam_id: int, websocket):
+    async def register_listener(self, cam_id: int, websocket, opciones: dict = None):
         """
         Añade websocket listener con validación de límite.
+        opciones: resultado de opciones_listener() (por defecto, modo video)
         """
         listener_count = len(self.listeners.get(cam_id, set()))
         
@@ -76,6 +215,7 @@ class CameraManager:
             raise RuntimeError(f"Máximo de {MAX_LISTENERS_PER_CAMERA} listeners por cámara alcanzado")
         
         self.listeners[cam_id].add(websocket)
+        self.listener_opts[websocket] = opciones or opciones_listener({})
         logger.info(f"Listener registrado para cámara {cam_id} ({listener_count + 1} total)")
 
     async def unregister_listener(self, cam_id: int, websocket):
@@ -85,23 +225,148 @@ class CameraManager:
         s = self.listeners.get(cam_id)
         if s and websocket in s:
             s.remove(websocket)
+            self.listener_opts.pop(websocket, None)
             logger.debug(f"Listener desregistrado de cámara {cam_id} ({len(s)} restantes)")
 
-    async def _process_loop(self, cam_id: int, url: str):
+    def _destinatarios(self, listeners, ahora: float):
+        """
+        Separa los listeners de este frame en: video anotado por el servidor,
+        video sin anotar (overlay en el cliente) y metadatos.
+        """
+        anotado, crudo, meta = [], [], []
+        for ws in listeners:
+            op = self.listener_opts.get(ws)
+            if op is None:
+                anotado.append(ws)
+                continue
+            if op["metadatos"]:
+                meta.append(ws)
+            intervalo = op["video_intervalo"]
+            if intervalo is None or (intervalo > 0 and ahora - op["ultimo_video"] >= intervalo):
+                op["ultimo_video"] = ahora
+                (crudo if op["overlay"] == "cliente" else anotado).append(ws)
+        return anotado, crudo, meta
+
+    async def _enviar(self, destinos, data, dead_websockets):
+        """Envía texto o bytes a cada destino y anota los que fallan."""
+        for ws in destinos:
+            try:
+                if isinstance(data, str):
+                    await ws.send_text(data)
+                else:
+                    await ws.send_bytes(data)
+            except Exception as e:
+                logger.debug("⚠️ No se pudo enviar a un listener: %s", e)
+                dead_websockets.append(ws)
+
+    def _usa_trama(self, ws):
+        op = self.listener_opts.get(ws)
+        return op is not None and op["protocolo"] == "trama"
+
+    async def _enviar_video(self, frame, destinos, frame_n, dead_websockets, pool=None,
+                            cam_id=None, ts=None, detecciones=None, inst=None, traza=None):
+        """
+        Agrupa los destinos por perfil efectivo, codifica una vez por perfil
+        (y redimensiona una vez por ancho) y mide la latencia de cada envío
+        para adaptar el perfil del listener. Los listeners con protocolo
+        "trama" reciben el JPEG en el sobre (armado una vez por perfil) con
+        seq, ts de captura y, si se pasan, las detecciones.
+        Con inst (instrumentación encendida) se miden codificación y envíos;
+        con traza (trazas encendidas) se agregan como spans del frame.
+        Retorna los frames enviados.
+        """
+        grupos = defaultdict(list)
+        for ws in destinos:
+            op = self.listener_opts.get(ws)
+            if op is None:
+                op = self.listener_opts[ws] = opciones_listener({})
+            grupos[perfil_efectivo(op)].append((ws, op))
+
+        escalados = {}
+        enviados = 0
+        for perfil, grupo in grupos.items():
+            t0 = time.perf_counter()
+            if perfil.ancho not in escalados:
+                escalados[perfil.ancho] = redimensionar(frame, perfil.ancho, pool)
+            data = codificar(escalados[perfil.ancho], perfil.calidad)
+            duracion = time.perf_counter() - t0
+            metricas.camara(cam_id).observar("codificacion", duracion)
+            if inst is not None:
+                inst.observar("codificacion", duracion)
+            if traza is not None:
+                traza.agregar("codificar", t0, t0 + duracion)
+            if data is None:
+                logger.debug("Error codificando frame %s con perfil %s", frame_n, perfil)
+                continue
+            sobre = None
+            for ws, op in grupo:
+                if op["protocolo"] == "trama":
+                    if sobre is None:
+                        sobre = empaquetar(data, frame_n, ts, cam_id, TIPO_JPEG, detecciones)
+                    mensaje = sobre
+                else:
+                    mensaje = data
+                t0 = time.perf_counter()
+                try:
+                    await ws.send_bytes(mensaje)
+                except Exception as e:
+                    logger.debug("⚠️ No se pudo enviar a un listener: %s", e)
+                    dead_websockets.append(ws)
+                    if inst is not None:
+                        inst.contar("envios_fallidos")
+                    continue
+                duracion = time.perf_counter() - t0
+                registrar_latencia(op, duracion)
+                if inst is not None:
+                    inst.observar("envio", duracion)
+                if traza is not None:
+                    traza.agregar("envio", t0, t0 + duracion)
+                enviados += 1
+        if inst is not None:
+            inst.contar("envios", enviados)
+        return enviados
+
+    def _inferir(self, frame, frame_n, cam_id, inst, traza):
+        """
+        procesar_frame con instrumentación y trazas. Corre en el hilo propio de
+        la cámara: YOLO, OCR, escrituras y subidas de evidencias no bloquean el
+        event loop (ni a las demás cámaras, listeners o timers del supervisor).
+        """
+        if traza is not None:
+            trazar_pipeline(True)
+            t_proc = time.perf_counter()
+        if inst is None:
+            frame_proc = procesar_frame(frame, frame_n, camara_id=cam_id, dibujar=False)
+        else:
+            perfilando = inst.iniciar_muestra()
+            t0 = time.perf_counter()
+            frame_proc = procesar_frame(frame, frame_n, camara_id=cam_id, dibujar=False)
+            inst.medir_pipeline(time.perf_counter() - t0, tiempos_etapas(cam_id))
+            if perfilando:
+                inst.terminar_muestra()
+        if traza is not None:
+            traza.agregar("procesar_frame", t_proc)
+            traza.extender(drenar_spans())
+            trazar_pipeline(False)
+        return frame_proc
+
+    async def _process_loop(self, cam_id: int, url: str, captura: dict):
         """
         Loop que abre la cámara y va procesando frames, enviando a todos los listeners.
         """
-        logger.info(f"[_process_loop] 🎥 Iniciando loop cámara {cam_id} -> {url}")
-        cap = cv2.VideoCapture(url)
-        
-        # Verificar que la cámara se abrió correctamente
-        if not cap.isOpened():
-            logger.error(f"[_process_loop] ❌ NO se pudo abrir la cámara: {url}")
-            return
-        
-        logger.info(f"[_process_loop] ✅ Cámara abierta: {url}")
+        logger.info(f"[_process_loop] 🎥 Iniciando loop cámara {cam_id} -> {url} ({captura['backend']})")
+        salud = self.salud[cam_id] = SaludCamara(url, captura["backend"])
+        m = metricas.camara(cam_id)
+        detener = lambda: cam_id in self._stopping
+        cap = None
         frame_n = 0
         frame_sent = 0
+        pool = BufferPool()     # destinos de redimensionado reutilizados por este loop
+        # Un solo hilo por cámara: sus frames se procesan en orden y el estado
+        # del pipeline de la cámara (tracker, tracks) nunca se toca en paralelo
+        inferencia = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"cam-inferir-{cam_id}")
+        loop = asyncio.get_running_loop()
+        proximo = time.monotonic()  # ritmo de reproducción para archivos
         
         try:
             while True:
@@ -109,47 +374,105 @@ class CameraManager:
                     logger.info(f"[_process_loop] 🛑 Stop solicitado para {cam_id}")
                     break
                 
-                ret, frame = cap.read()
+                # (Re)conexión supervisada: apertura con timeout en su propio
+                # pool de hilos y backoff exponencial con jitter entre intentos
+                if cap is None:
+                    cap = await supervisor.abrir(url, captura, salud)
+                    if cap is None:
+                        espera = salud.fallo(salud.ultimo_error)
+                        logger.warning(f"[_process_loop] ⚠️ Cámara {cam_id}: {salud.ultimo_error}, reintento en {espera:.1f} s")
+                        await supervisor.esperar(espera, detener)
+                        continue
+                    salud.conectada()
+                    logger.info(f"[_process_loop] ✅ Cámara abierta: {url}")
                 
-                if not ret:
-                    logger.warning(f"[_process_loop] ⚠️ Error leyendo frame de {cam_id}, reintentando...")
-                    await asyncio.sleep(1.0)
-                    cap.release()
-                    cap = cv2.VideoCapture(url)
-                    if not cap.isOpened():
-                        logger.error(f"[_process_loop] ❌ No se pudo reconectar a {url}")
-                        break
-                    continue
+                # None si la instrumentación de esta cámara está apagada: sin costo extra
+                inst = instrumentacion.para(cam_id)
+                # Ídem para las trazas por frame (solo se guardan los lentos)
+                traza = trazador.para(cam_id)
+                if inst is not None or traza is not None:
+                    t0 = time.perf_counter()
+                frame = await supervisor.leer(cap)
                 
-                frame_n += 1
-                
-                # procesar frame (anotaciones y DB si corresponde)
-                frame_proc = procesar_frame(frame, frame_n)
-                
-                # codificar jpeg
-                ok, buf = cv2.imencode('.jpg', frame_proc, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
-                if not ok:
-                    logger.debug(f"Error codificando frame {frame_n}")
+                if frame is None:
+                    if inst is not None:
+                        inst.contar("errores_lectura")
+                    error = "timeout de lectura" if getattr(cap, "lectura_colgada", False) else "error leyendo frame"
+                    supervisor.liberar(cap)
+                    cap = None
+                    espera = salud.fallo(error)
+                    logger.warning(f"[_process_loop] ⚠️ Error leyendo frame de {cam_id}, reintento en {espera:.1f} s")
+                    await supervisor.esperar(espera, detener)
                     continue
                 
-                data = buf.tobytes()
+                ts_captura = time.time()
+                salud.frame()
+                frame_n += 1
+                m.contar("capturados")
+                if inst is not None:
+                    inst.observar("captura", time.perf_counter() - t0)
+                    inst.contar("frames")
+                if traza is not None:
+                    traza.agregar("captura", t0)
+                    traza.frame_n = frame_n
                 
                 # broadcast a listeners
                 listeners = list(self.listeners.get(cam_id, []))
+                anotado, crudo, meta = self._destinatarios(listeners, time.monotonic())
+                
+                # procesar frame (DB si corresponde) fuera del event loop; las cajas
+                # se dibujan después, en sitio, y solo si algún listener pide el video anotado
+                frame_proc = await loop.run_in_executor(inferencia, self._inferir, frame, frame_n,
+                                                        cam_id, inst, traza)
+                m.contar("inferidos")
+                m.observar_pipeline(tiempos_etapas(cam_id))
+                self.publicar_eventos(cam_id)
                 
                 if listeners:
-                    frame_sent += 1
-                    if frame_sent % 30 == 0:  # Log cada 30 frames
-                        logger.debug(f"📤 Enviando frame #{frame_n} a {len(listeners)} listeners ({len(data)} bytes)")
-                    
-                    # enviar como bytes (WebSocket soporta send_bytes)
                     dead_websockets = []
-                    for ws in listeners:
-                        try:
-                            await ws.send_bytes(data)
-                        except Exception as e:
-                            logger.debug(f"⚠️ No se pudo enviar a un listener: {e}")
-                            dead_websockets.append(ws)
+                    
+                    # eventos del bus pendientes, antes de cualquier cabecera del frame
+                    await self._enviar_eventos(cam_id, listeners, dead_websockets)
+                    
+                    # metadatos: JSON compacto a tasa completa, sin codificar JPEG.
+                    # Los listeners con overlay en el cliente lo reciben antes de
+                    # cada JPEG (con protocolo "trama" va dentro del sobre del JPEG)
+                    detecciones = obtener_detecciones(cam_id) if (meta or crudo) else None
+                    destinos_json = [ws for ws in meta + [w for w in crudo if w not in meta]
+                                     if not self._usa_trama(ws)]
+                    if destinos_json:
+                        mensaje = json.dumps(
+                            {"type": "detecciones", "cam": cam_id, "frame": frame_n, "ts": ts_captura,
+                             "detecciones": detecciones},
+                            separators=(",", ":"),
+                        )
+                        await self._enviar(destinos_json, mensaje, dead_websockets)
+                    destinos_trama = [ws for ws in meta if self._usa_trama(ws)]
+                    if destinos_trama:
+                        sobre = empaquetar(b"", frame_n, ts_captura, cam_id, TIPO_DETECCIONES, detecciones)
+                        await self._enviar(destinos_trama, sobre, dead_websockets)
+                    
+                    # video sin anotar (antes de dibujar sobre el frame)
+                    if crudo:
+                        await self._enviar_video(frame_proc, crudo, frame_n, dead_websockets, pool,
+                                                 cam_id, ts_captura, detecciones, inst, traza)
+                    
+                    # video anotado: se dibuja sobre el mismo frame solo en las cajas
+                    if anotado:
+                        frame_sent += 1
+                        if frame_sent % 30 == 0:  # Log cada 30 frames
+                            logger.debug("📤 Enviando frame #%d a %d listeners", frame_n, len(anotado))
+                        if traza is not None:
+                            t0 = time.perf_counter()
+                        dibujar_detecciones(frame_proc, cam_id, frame_n)
+                        if traza is not None:
+                            traza.agregar("dibujar", t0)
+                        await self._enviar_video(frame_proc, anotado, frame_n, dead_websockets, pool,
+                                                 cam_id, ts_captura, None, inst, traza)
+                    if crudo or anotado:
+                        m.contar("enviados")
+                        if inst is not None:
+                            inst.contar("frames_enviados")
                     
                     # Limpiar listeners muertos
                     for ws in dead_websockets:
@@ -159,18 +482,29 @@ class CameraManager:
                             pass
                 else:
                     if frame_n % 100 == 0:
-                        logger.warning(f"[_process_loop] ⚠️ Cámara {cam_id} sin listeners (frame #{frame_n})")
+                        logger.warning("[_process_loop] ⚠️ Cámara %s sin listeners (frame #%d)", cam_id, frame_n)
+                if traza is not None:
+                    trazador.terminar(traza)
                 
-                # pequeña pausa para no bloquear la loop del event loop
-                await asyncio.sleep(0)  # cede control
+                # pequeña pausa para no bloquear la loop del event loop; los
+                # archivos se reproducen a su FPS en vez de a la velocidad del decoder
+                if cap.intervalo:
+                    proximo = max(proximo + cap.intervalo, time.monotonic() - cap.intervalo)
+                    await asyncio.sleep(max(0.0, proximo - time.monotonic()))
+                else:
+                    await asyncio.sleep(0)  # cede control
                 
         except Exception as e:
             logger.error(f"[_process_loop] ❌ Error en loop: {e}")
             import traceback
             traceback.print_exc()
         finally:
+            salud.detenida()
+            # Detrás del frame que siga en curso (si la tarea se canceló esperándolo)
+            inferencia.submit(liberar_camara, cam_id)
+            inferencia.shutdown(wait=False)
             try:
-                cap.release()
+                supervisor.liberar(cap)
                 logger.info(f"[_process_loop] 🛑 Liberada cámara {cam_id}")
             except Exception:
                 pass
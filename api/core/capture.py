@@ -0,0 +1,299 @@
+# api/core/capture.py
+"""
+Backends de captura de video por cámara
+
+Todas las capturas exponen la interfaz de cv2.VideoCapture (isOpened, read,
+release) para que el loop de CameraManager no dependa del backend:
+
+- opencv: cv2.VideoCapture con decodificación por hardware si está disponible
+  (VIDEO_ACCELERATION_ANY). Con cada_n > 1 los frames intermedios solo se
+  grab()-ean: no se convierten a BGR ni se copian a Python
+- ffmpeg: proceso ffmpeg que entrega BGR crudo por un pipe, ya escalado
+  (filtro scale) y filtrado (select cada N / -skip_frame nokey), así el CPU
+  de Python nunca ve frames de resolución completa
+- pyav: lector PyAV con skip_frame del decodificador y escalado en la
+  conversión a ndarray
+
+Opciones por cámara (opciones_captura): backend, cada_n, solo_keyframes,
+ancho (px de salida, 0 = original), substream_url (p.ej. el sub-stream de
+baja resolución de la cámara) y tiempo_real (ritmo de reproducción para
+archivos de video).
+
+ffmpeg/ffprobe y PyAV son opcionales: si faltan, se usa opencv.
+"""
+import os
+import shutil
+import hashlib
+import subprocess
+import logging
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import cv2
+import numpy as np
+
+from .codec import redimensionar
+
+try:
+    import av
+except ImportError:
+    av = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS_CAPTURA = ("opencv", "ffmpeg", "pyav")
+CAPTURA_BACKEND = os.environ.get("CAPTURA_BACKEND", "opencv")
+PREFIJOS_STREAM = ("rtsp://", "rtmp://", "http://", "https://", "udp://", "tcp://")
+PUERTOS_DEFECTO = {"rtsp": 554, "rtmp": 1935, "http": 80, "https": 443}
+FPS_ARCHIVO_DEFECTO = 25.0
+TIMEOUT_FFPROBE = 10.0
+TIMEOUT_OPENCV_MS = 10000    # timeouts nativos de apertura/lectura del backend FFmpeg de OpenCV
+
+
+def es_stream(url: str):
+    """True si la fuente es un stream de red (no un archivo ni un índice de webcam)."""
+    return str(url).lower().startswith(PREFIJOS_STREAM)
+
+
+def normalizar_url(url: str):
+    """
+    Forma canónica de una URL de cámara: esquema y host en minúsculas, sin
+    puerto por defecto, sin "/" final y con los parámetros ordenados.
+    Rutas locales e índices de webcam se retornan sin cambios (sin espacios).
+    """
+    url = str(url).strip()
+    if not es_stream(url):
+        return url
+    partes = urlsplit(url)
+    esquema = partes.scheme.lower()
+    host = (partes.hostname or "").lower()
+    if partes.port and partes.port != PUERTOS_DEFECTO.get(esquema):
+        host = f"{host}:{partes.port}"
+    if partes.username:
+        credenciales = partes.username + (f":{partes.password}" if partes.password else "")
+        host = f"{credenciales}@{host}"
+    query = urlencode(sorted(parse_qsl(partes.query, keep_blank_values=True)))
+    return urlunsplit((esquema, host, partes.path.rstrip("/"), query, ""))
+
+
+def id_camara_url(url: str):
+    """Identificador estable (entre procesos y reinicios) de una cámara por su URL."""
+    return "url_" + hashlib.sha1(normalizar_url(url).encode("utf-8")).hexdigest()[:12]
+
+
+def opciones_captura(config: dict = None):
+    """
+    Normaliza las opciones de captura de una cámara. Lanza ValueError si son
+    inválidas. config puede venir del handshake ("captura": {...}).
+    """
+    config = config or {}
+    backend = config.get("backend", CAPTURA_BACKEND)
+    if backend not in BACKENDS_CAPTURA:
+        raise ValueError(f"Backend de captura inválido: {backend} (válidos: {', '.join(BACKENDS_CAPTURA)})")
+    cada_n = int(config.get("cada_n", 1))
+    ancho = int(config.get("ancho", 0))
+    if cada_n < 1 or ancho < 0:
+        raise ValueError("cada_n debe ser >= 1 y ancho >= 0")
+    return {
+        "backend": backend,
+        "cada_n": cada_n,
+        "solo_keyframes": bool(config.get("solo_keyframes", False)),
+        "ancho": ancho,
+        "substream_url": config.get("substream_url"),
+        "tiempo_real": config.get("tiempo_real"),   # None = automático (solo archivos)
+    }
+
+
+class CapturaOpenCV:
+    """cv2.VideoCapture con hw-accel, salto de frames por grab() y escalado."""
+
+    def __init__(self, url, cada_n=1, ancho=0, solo_keyframes=False):
+        self.cada_n = cada_n
+        self.ancho = ancho
+        if solo_keyframes:
+            logger.warning("⚠️ opencv no soporta solo_keyframes; use ffmpeg o pyav")
+        self.cap = cv2.VideoCapture(url, cv2.CAP_ANY, [
+            cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, TIMEOUT_OPENCV_MS,
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, TIMEOUT_OPENCV_MS,
+        ])
+        if not self.cap.isOpened():
+            # Algunos backends rechazan los parámetros de apertura
+            self.cap = cv2.VideoCapture(url)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def fps(self):
+        """FPS entregados (la tasa de la fuente dividida por cada_n)."""
+        return (self.cap.get(cv2.CAP_PROP_FPS) or 0.0) / self.cada_n
+
+    def read(self):
+        for _ in range(self.cada_n - 1):
+            if not self.cap.grab():
+                return False, None
+        ok, frame = self.cap.read()
+        if not ok:
+            return False, None
+        return True, redimensionar(frame, self.ancho)
+
+    def release(self):
+        self.cap.release()
+
+
+def _probar_stream(url):
+    """(ancho, alto, fps) del primer stream de video según ffprobe."""
+    salida = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "stream=width,height,avg_frame_rate", "-of", "csv=p=0", url],
+        capture_output=True, text=True, timeout=TIMEOUT_FFPROBE,
+    ).stdout.strip().split("\n")[0]
+    ancho, alto, tasa = salida.split(",")[:3]
+    num, _, den = tasa.partition("/")
+    fps = float(num) / float(den) if den and float(den) else float(num or 0)
+    return int(ancho), int(alto), fps
+
+
+class CapturaFFmpeg:
+    """
+    Frames BGR crudos desde un proceso ffmpeg. El escalado y la selección de
+    frames ocurren dentro de ffmpeg; con solo_keyframes el decodificador
+    descarta los frames P/B sin decodificarlos.
+    """
+
+    def __init__(self, url, cada_n=1, ancho=0, solo_keyframes=False):
+        self.proc = None
+        self._fps = 0.0
+        if not (shutil.which("ffmpeg") and shutil.which("ffprobe")):
+            logger.error("❌ ffmpeg/ffprobe no están instalados")
+            return
+        try:
+            w, h, self._fps = _probar_stream(url)
+        except Exception as e:
+            logger.error(f"❌ ffprobe no pudo abrir {url}: {e}")
+            return
+
+        if ancho and w > ancho:
+            w, h = ancho, max(2, round(h * ancho / w / 2) * 2)
+        self.forma = (h, w, 3)
+        self.tam_frame = w * h * 3
+
+        filtros = []
+        if cada_n > 1:
+            filtros.append(f"select=not(mod(n\\,{cada_n}))")
+            self._fps /= cada_n
+        filtros.append(f"scale={w}:{h}")
+
+        cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-hwaccel", "auto"]
+        if url.lower().startswith("rtsp://"):
+            cmd += ["-rtsp_transport", "tcp"]
+        if solo_keyframes:
+            cmd += ["-skip_frame", "nokey"]
+        cmd += ["-i", url, "-an", "-vf", ",".join(filtros), "-vsync", "passthrough",
+                "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=self.tam_frame)
+
+    def isOpened(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def fps(self):
+        return self._fps
+
+    def read(self):
+        if self.proc is None:
+            return False, None
+        frame = np.empty(self.forma, np.uint8)
+        vista = memoryview(frame).cast("B")
+        leidos = 0
+        while leidos < self.tam_frame:
+            n = self.proc.stdout.readinto(vista[leidos:])
+            if not n:
+                return False, None
+            leidos += n
+        return True, frame
+
+    def release(self):
+        if self.proc is not None:
+            self.proc.kill()
+            self.proc.wait()
+            self.proc = None
+
+
+class CapturaPyAV:
+    """Decodificación con PyAV: skip_frame en el códec y escalado en la conversión."""
+
+    def __init__(self, url, cada_n=1, ancho=0, solo_keyframes=False):
+        self.cada_n = cada_n
+        self.ancho = ancho
+        self.contenedor = None
+        self._frames = None
+        if av is None:
+            logger.error("❌ PyAV no está instalado")
+            return
+        opciones = {"rtsp_transport": "tcp"} if url.lower().startswith("rtsp://") else {}
+        try:
+            self.contenedor = av.open(url, options=opciones)
+        except Exception as e:
+            logger.error(f"❌ PyAV no pudo abrir {url}: {e}")
+            return
+        self.stream = self.contenedor.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        if solo_keyframes:
+            self.stream.codec_context.skip_frame = "NONKEY"
+        self._frames = self.contenedor.decode(self.stream)
+
+    def isOpened(self):
+        return self._frames is not None
+
+    def fps(self):
+        tasa = self.stream.average_rate if self._frames is not None else None
+        return float(tasa) / self.cada_n if tasa else 0.0
+
+    def read(self):
+        if self._frames is None:
+            return False, None
+        try:
+            for _ in range(self.cada_n - 1):
+                next(self._frames)
+            frame = next(self._frames)
+        except (StopIteration, av.error.FFmpegError):
+            return False, None
+        if self.ancho and frame.width > self.ancho:
+            alto = max(2, round(frame.height * self.ancho / frame.width / 2) * 2)
+            return True, frame.to_ndarray(format="bgr24", width=self.ancho, height=alto)
+        return True, frame.to_ndarray(format="bgr24")
+
+    def release(self):
+        if self.contenedor is not None:
+            self.contenedor.close()
+            self.contenedor = None
+            self._frames = None
+
+
+_CLASES = {"opencv": CapturaOpenCV, "ffmpeg": CapturaFFmpeg, "pyav": CapturaPyAV}
+
+
+def abrir_captura(url: str, opciones: dict = None):
+    """
+    Abre la fuente con el backend pedido (o opencv si el backend no está
+    disponible). Si hay substream_url se usa en lugar de la URL principal.
+    Retorna la captura; el llamador debe revisar isOpened().
+    """
+    opciones = opciones or opciones_captura()
+    fuente = opciones.get("substream_url") or url
+    backend = opciones["backend"]
+    if backend == "ffmpeg" and not shutil.which("ffmpeg"):
+        logger.warning("⚠️ ffmpeg no disponible, usando opencv")
+        backend = "opencv"
+    elif backend == "pyav" and av is None:
+        logger.warning("⚠️ PyAV no disponible, usando opencv")
+        backend = "opencv"
+    cap = _CLASES[backend](fuente, opciones["cada_n"], opciones["ancho"], opciones["solo_keyframes"])
+
+    # Los archivos se leen tan rápido como se decodifican: se reproducen al
+    # ritmo del video salvo que se pida lo contrario
+    tiempo_real = opciones.get("tiempo_real")
+    if tiempo_real is None:
+        tiempo_real = not es_stream(fuente) and not str(fuente).isdigit()
+    fps = cap.fps() if cap.isOpened() else 0.0
+    cap.intervalo = (1.0 / (fps or FPS_ARCHIVO_DEFECTO)) if tiempo_real else 0.0
+    return cap
@@ -0,0 +1,144 @@
+# api/core/codec.py
+"""
+Capa de codificación/decodificación JPEG
+
+- Usa simplejpeg o PyTurboJPEG (libjpeg-turbo con SIMD) si están instalados;
+  si no, OpenCV. JPEG_BACKEND=opencv|simplejpeg|turbojpeg fuerza uno.
+- codificar() retorna un memoryview sobre el buffer del encoder: se envía por
+  el WebSocket tal cual, sin la copia extra de buf.tobytes()
+- decodificar(data, reduccion) acepta bytes/memoryview sin copiarlos y puede
+  decodificar a 1/2, 1/4 u 1/8 del tamaño directamente en la DCT (para
+  inferencia no hace falta la resolución completa)
+- BufferPool reutiliza los arrays destino del redimensionado por tamaño
+"""
+import os
+import logging
+
+import cv2
+import numpy as np
+
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+    _turbo = TurboJPEG()
+except Exception:
+    _turbo = None
+
+logger = logging.getLogger(__name__)
+
+REDUCCIONES = (1, 2, 4, 8)
+_IMREAD_REDUCIDO = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def _codificar_opencv(frame, calidad):
+    ok, buf = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), calidad])
+    if not ok:
+        return None
+    return memoryview(buf).cast("B")
+
+
+def _decodificar_opencv(data, reduccion):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), _IMREAD_REDUCIDO[reduccion])
+
+
+def _codificar_simplejpeg(frame, calidad):
+    return memoryview(simplejpeg.encode_jpeg(
+        np.ascontiguousarray(frame), quality=calidad, colorspace="BGR", colorsubsampling="420", fastdct=True
+    ))
+
+
+def _decodificar_simplejpeg(data, reduccion):
+    return simplejpeg.decode_jpeg(data, colorspace="BGR", fastdct=True, fastupsample=True, min_factor=reduccion)
+
+
+def _codificar_turbojpeg(frame, calidad):
+    return memoryview(_turbo.encode(
+        np.ascontiguousarray(frame), quality=calidad, pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420
+    ))
+
+
+def _decodificar_turbojpeg(data, reduccion):
+    return _turbo.decode(bytes(data) if isinstance(data, memoryview) else data,
+                         pixel_format=TJPF_BGR, scaling_factor=(1, reduccion))
+
+
+# backend -> (codificar, decodificar), en orden de preferencia
+BACKENDS = {}
+if simplejpeg is not None:
+    BACKENDS["simplejpeg"] = (_codificar_simplejpeg, _decodificar_simplejpeg)
+if _turbo is not None:
+    BACKENDS["turbojpeg"] = (_codificar_turbojpeg, _decodificar_turbojpeg)
+BACKENDS["opencv"] = (_codificar_opencv, _decodificar_opencv)
+
+BACKEND = os.environ.get("JPEG_BACKEND", next(iter(BACKENDS)))
+if BACKEND not in BACKENDS:
+    logger.warning(f"⚠️ JPEG_BACKEND={BACKEND} no disponible, usando opencv")
+    BACKEND = "opencv"
+_codificar, _decodificar = BACKENDS[BACKEND]
+logger.info(f"🖼️ Codec JPEG: {BACKEND}")
+
+
+def codificar(frame, calidad: int = 70):
+    """JPEG como memoryview (sin copia) o None si falla la codificación."""
+    try:
+        return _codificar(frame, calidad)
+    except Exception as e:
+        logger.debug(f"Error codificando JPEG: {e}")
+        return None
+
+
+def decodificar(data, reduccion: int = 1):
+    """
+    Decodifica un JPEG (bytes, bytearray o memoryview) a BGR.
+    reduccion 2/4/8 entrega la imagen a esa fracción del tamaño.
+    Retorna None si los datos no son un JPEG válido.
+    """
+    if reduccion not in REDUCCIONES:
+        raise ValueError(f"Reducción inválida: {reduccion} (válidas: {REDUCCIONES})")
+    try:
+        return _decodificar(data, reduccion)
+    except Exception as e:
+        logger.debug(f"Error decodificando JPEG: {e}")
+        return None
+
+
+class BufferPool:
+    """
+    Arrays destino reutilizables por forma. No es seguro compartirlo entre
+    tareas que se intercalan: cada loop de cámara usa el suyo.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    def obtener(self, forma, dtype=np.uint8):
+        clave = (tuple(forma), np.dtype(dtype))
+        buf = self._buffers.get(clave)
+        if buf is None:
+            buf = self._buffers[clave] = np.empty(forma, dtype)
+        return buf
+
+    def liberar(self):
+        self._buffers.clear()
+
+
+def redimensionar(frame, ancho: int, pool: BufferPool = None):
+    """
+    Reduce el frame a `ancho` px manteniendo la proporción (nunca lo agranda).
+    Con pool, el resultado se escribe en un buffer reutilizado.
+    """
+    h, w = frame.shape[:2]
+    if not ancho or w <= ancho:
+        return frame
+    alto = max(1, round(h * ancho / w))
+    destino = pool.obtener((alto, ancho) + frame.shape[2:], frame.dtype) if pool is not None else None
+    return cv2.resize(frame, (ancho, alto), dst=destino, interpolation=cv2.INTER_AREA)
@@ -10,32 +10,105 @@ import os
 try:
     import sys
     sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
-    from detección_yolo.main import detectar_frame as detectar_frame_main
+    # main.py importa sus módulos hermanos (util, tracker, ...) sin prefijo de paquete
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'detección_yolo'))
+    from detección_yolo import main as pipeline
+    import trazas as pipeline_trazas
+    detectar_frame_main = pipeline.detectar_frame
 except Exception:
+    pipeline = None
     detectar_frame_main = None
 
-def procesar_frame(frame, frame_nmr=0, camara_id=None, db=None):
+def procesar_frame(frame, frame_nmr=0, camara_id=None, db=None, dibujar=True):
     """
-    Procesa frame con detección YOLO + OCR y crea facturas automáticamente
+    Procesa frame con detección YOLO + OCR y crea facturas automáticamente.
+    Las anotaciones se dibujan sobre el mismo frame (dibujar=False lo deja intacto).
     """
     if detectar_frame_main:
         try:
-            frame_procesado = detectar_frame_main(frame, frame_nmr)
+            frame_procesado = detectar_frame_main(frame, frame_nmr, camara_id, dibujar)
             return frame_procesado
         except Exception as e:
             print("Error en detectar_frame:", e)
             return frame
     else:
-        frame_copy = frame.copy()
-        cv2.putText(frame_copy, f"Camara {camara_id} - Frame {frame_nmr}", 
-                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        return frame_copy
+        if dibujar:
+            _dibujar_sin_pipeline(frame, camara_id, frame_nmr)
+        return frame
 
-def crear_registro_con_factura(db, camara_id: int, placa: str, tipo_vehiculo: str = "car"):
+def _dibujar_sin_pipeline(frame, camara_id, frame_nmr):
+    cv2.putText(frame, f"Camara {camara_id} - Frame {frame_nmr}", 
+               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    return frame
+
+def dibujar_detecciones(frame, camara_id=None, frame_nmr=0):
+    """Dibuja en sitio las detecciones del último frame procesado de la cámara"""
+    if pipeline is None:
+        return _dibujar_sin_pipeline(frame, camara_id, frame_nmr)
+    return pipeline.dibujar_ultimas(frame, camara_id)
+
+def estadisticas_tracks():
+    """Memoria del estado por track del pipeline (None si no está cargado)"""
+    if pipeline is None:
+        return None
+    return pipeline.estadisticas_tracks()
+
+def tiempos_etapas(camara_id=None):
+    """Segundos de inferencia, detector de placas y OCR del último frame de la cámara ({} sin pipeline)"""
+    if pipeline is None:
+        return {}
+    return pipeline.obtener_tiempos(camara_id)
+
+def contadores_ocr():
+    """Tracks que se saltaron el OCR (placa ya confirmada) vs los que lo usaron"""
+    if pipeline is None:
+        return {}
+    return pipeline.obtener_contadores_ocr()
+
+def trazar_pipeline(activo: bool):
+    """Activa/desactiva el registro de spans dentro de detectar_frame"""
+    if pipeline is not None:
+        pipeline_trazas.activar(activo)
+
+def drenar_spans():
+    """Spans (nombre, inicio, fin) del pipeline desde la última llamada"""
+    if pipeline is None:
+        return []
+    return pipeline_trazas.drenar()
+
+def obtener_detecciones(camara_id=None):
+    """Registros compactos de los tracks del último frame procesado de la cámara"""
+    if pipeline is None:
+        return []
+    return pipeline.obtener_detecciones(camara_id)
+
+def iniciar_retencion():
+    """Arranca la retención de evidencias y registros del pipeline (si está cargado)"""
+    if pipeline is not None:
+        pipeline.iniciar_retencion()
+
+def detener_retencion():
+    if pipeline is not None:
+        pipeline.retencion.detener()
+
+def liberar_camara(camara_id):
+    """Descarta el tracker y el estado por track de una cámara que dejó de procesarse"""
+    if pipeline is not None:
+        pipeline.liberar_camara(camara_id)
+
+def drenar_eventos():
+    """Eventos pendientes del pipeline (plate_confirmed, vehicle_entered, vehicle_exited)"""
+    if pipeline is None:
+        return []
+    return pipeline.drenar_eventos()
+
+def crear_registro_con_factura(db, camara_id: int, placa: str, tipo_vehiculo: str = "car", matcher=None,
+                               confianza: float = 0.8, ruta_imagen: str = None):
     """
-    Crea registro de detección y factura automáticamente
+    Crea registro de detección y factura automáticamente.
+    Si se pasa un ExitMatcher, la factura queda indexada para la salida.
     """
-    from ..crud import crear_registro, crear_factura
+    from crud import crear_registro, crear_factura
     
     try:
         registro = crear_registro(
@@ -43,13 +116,15 @@ def crear_registro_con_factura(db, camara_id: int, placa: str, tipo_vehiculo: st
             camara_id=camara_id,
             tipo_vehiculo=tipo_vehiculo,
             placa_final=placa,
-            confianza=0.8,
+            confianza=confianza,
             direccion="entrada",
-            ruta_imagen=None
+            ruta_imagen=ruta_imagen
         )
         
         if registro:
             factura = crear_factura(db, registro.id)
+            if factura and matcher is not None:
+                matcher.registrar_entrada(placa, factura.id, factura.hora_entrada, factura.tarifa_por_hora)
             return registro, factura
         
     except Exception as e:
@@ -57,3 +132,11 @@ def crear_registro_con_factura(db, camara_id: int, placa: str, tipo_vehiculo: st
     
     return None, None
 
+def registrar_salida(matcher, placa: str, direccion: str, hora_salida: datetime = None):
+    """
+    Envía una detección con dirección 'salida' al emparejador de facturas.
+    Retorna el id de la factura que se cerrará o None.
+    """
+    if direccion != "salida" or not placa:
+        return None
+    return matcher.encolar_salida(placa, hora_salida)
@@ -0,0 +1,112 @@
+# api/core/event_bus.py
+"""
+Bus de eventos asíncrono en proceso
+
+Eventos: plate_confirmed, vehicle_entered, vehicle_exited (dicts con "tipo").
+- publish() nunca bloquea: cada suscriptor tiene su propia cola acotada y,
+  si está llena, se descarta el evento más viejo de ESA cola
+- Un consumidor lento (DB, WebSocket) solo se atrasa a sí mismo, nunca a la
+  detección ni a los demás suscriptores
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+TIPOS_EVENTO = ("plate_confirmed", "vehicle_entered", "vehicle_exited")
+MAX_COLA_SUSCRIPTOR = 256
+
+
+class Suscripcion:
+    """Cola acotada de un suscriptor, opcionalmente filtrada por tipo de evento."""
+
+    def __init__(self, nombre: str, tipos=None, maxsize: int = MAX_COLA_SUSCRIPTOR):
+        self.nombre = nombre
+        self.tipos = set(tipos) if tipos else None
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.entregados = 0
+        self.descartados = 0
+
+    def acepta(self, evento: dict):
+        return self.tipos is None or evento.get("tipo") in self.tipos
+
+    def _offer(self, evento: dict):
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.descartados += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(evento)
+        self.entregados += 1
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class EventBus:
+    """
+    Publica eventos a todas las suscripciones interesadas.
+    publish() debe llamarse desde el hilo del event loop; desde otros hilos
+    usar publish_threadsafe().
+    """
+
+    def __init__(self):
+        self._suscripciones = []
+        self.publicados = 0
+        self._loop = None
+
+    def subscribe(self, nombre: str, tipos=None, maxsize: int = MAX_COLA_SUSCRIPTOR):
+        sub = Suscripcion(nombre, tipos, maxsize)
+        self._suscripciones.append(sub)
+        logger.info(f"📬 Suscriptor '{nombre}' registrado ({', '.join(sub.tipos) if sub.tipos else 'todos'})")
+        return sub
+
+    def unsubscribe(self, sub: Suscripcion):
+        if sub in self._suscripciones:
+            self._suscripciones.remove(sub)
+
+    def publish(self, evento: dict):
+        self.publicados += 1
+        for sub in self._suscripciones:
+            if sub.acepta(evento):
+                sub._offer(evento)
+
+    def publish_threadsafe(self, evento: dict):
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        self._loop.call_soon_threadsafe(self.publish, evento)
+
+    def bind_loop(self, loop):
+        self._loop = loop
+
+    def estadisticas(self):
+        return {
+            "publicados": self.publicados,
+            "suscriptores": {
+                s.nombre: {
+                    "en_cola": s.queue.qsize(),
+                    "entregados": s.entregados,
+                    "descartados": s.descartados,
+                }
+                for s in self._suscripciones
+            },
+        }
+
+
+def iniciar_consumidor(sub: Suscripcion, handler):
+    """
+    Crea una tarea que consume la suscripción y llama a handler(evento)
+    (corutina). Un error en un evento se registra y no detiene al consumidor.
+    """
+    async def _consumir():
+        while True:
+            evento = await sub.get()
+            try:
+                await handler(evento)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Error en suscriptor '{sub.nombre}': {e}")
+
+    return asyncio.get_running_loop().create_task(_consumir())
@@ -0,0 +1,216 @@
+# api/core/ingest.py
+"""
+Ingesta de frames enviados por el cliente (cámara local por WebSocket)
+
+- El detector se resuelve una sola vez, al importar el módulo
+- Cada sesión tiene una cola acotada: si el cliente envía más rápido de lo
+  que se procesa, se descarta el frame más viejo (se procesa siempre lo más
+  reciente, la latencia no crece)
+- Decodificación, detección y codificación corren en un pool de hilos; el
+  event loop solo recibe y envía, así que el cliente no espera la respuesta
+  de un frame para mandar el siguiente
+- Cada respuesta va precedida de un JSON con la secuencia del frame del
+  cliente al que corresponde (el n-ésimo frame binario recibido es seq=n).
+  Con protocolo "trama" el cliente envía cada frame en el sobre de
+  core/protocolo.py y la respuesta vuelve en un sobre con su mismo seq y ts
+  de captura (el cliente calcula la latencia de extremo a extremo)
+- Un frame que esperó en la cola más de EDAD_MAXIMA_FRAME_S se descarta sin
+  procesarlo
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from .codec import codificar, decodificar, redimensionar, BufferPool
+from .perfiles import perfil_efectivo, registrar_latencia
+from .protocolo import empaquetar, desempaquetar, TIPO_JPEG
+from .instrumentation import instrumentacion
+from .metrics import metricas
+
+logger = logging.getLogger(__name__)
+
+MAX_COLA_INGESTA = 2        # frames en espera por sesión antes de descartar el más viejo
+HILOS_INGESTA = 4           # hilos compartidos por todas las sesiones locales
+EDAD_MAXIMA_FRAME_S = 1.0   # s desde la recepción tras los que un frame ya no se procesa
+
+_pool_ingesta = ThreadPoolExecutor(max_workers=HILOS_INGESTA, thread_name_prefix="ingesta")
+
+SESIONES = {}   # cam_id -> SesionIngesta activa
+
+try:
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'detección_yolo'))
+    import simple_detection
+    from simple_detection import detectar_frame
+except Exception as e:
+    logger.error(f"❌ Detección simple no disponible: {e}")
+    simple_detection = None
+    detectar_frame = None
+
+
+def iniciar_retencion():
+    """Arranca la retención de las detecciones de cámaras locales"""
+    if simple_detection is not None:
+        simple_detection.iniciar_retencion()
+
+
+def detener_retencion():
+    if simple_detection is not None:
+        simple_detection.retencion.detener()
+
+
+def _detectar(frame, seq, cam_id):
+    """Detección sobre el frame; si falla, el frame con un aviso de sistema activo."""
+    if detectar_frame is not None:
+        try:
+            return detectar_frame(frame, seq)
+        except Exception as e:
+            logger.error(f"Error en detección: {e}")
+    cv2.putText(frame, f"Sistema Activo - {cam_id}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    cv2.putText(frame, "Buscando vehiculos...", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return frame
+
+
+class SesionIngesta:
+    """
+    Pipeline de una cámara local: recibir() encola sin bloquear y una tarea
+    propia procesa los frames en el pool y envía las respuestas en orden.
+    """
+
+    def __init__(self, websocket, cam_id: str, opciones: dict, reduccion: int = 1,
+                 maxsize: int = MAX_COLA_INGESTA):
+        self.websocket = websocket
+        self.trama = opciones.get("protocolo") == "trama"
+        self.cam_id = cam_id
+        self.opciones = opciones
+        self.reduccion = reduccion
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.pool = BufferPool()    # solo lo usa el frame en curso de esta sesión
+        self.seq = 0
+        self.recibidos = 0
+        self.procesados = 0
+        self.descartados = 0
+        self.invalidos = 0
+        self.metricas = metricas.camara(cam_id)
+        self._tarea = None
+
+    def iniciar(self):
+        SESIONES[self.cam_id] = self
+        self._tarea = asyncio.get_running_loop().create_task(self._procesar())
+        return self
+
+    def recibir(self, data: bytes):
+        """Encola un frame del cliente; con la cola llena se descarta el más viejo."""
+        self.recibidos += 1
+        self.metricas.contar("capturados")
+        if self.trama:
+            try:
+                trama = desempaquetar(data)
+            except ValueError as e:
+                self.invalidos += 1
+                logger.debug("Trama inválida de %s: %s", self.cam_id, e)
+                return
+            self.seq, ts, data = trama.seq, trama.ts, trama.payload
+        else:
+            self.seq += 1
+            ts = None
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.descartados += 1
+                self.metricas.contar("descartados")
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait((self.seq, ts, data, time.monotonic()))
+
+    def _pipeline(self, seq, data, perfil, inst=None):
+        """Decodificar -> detectar -> redimensionar -> codificar (en un hilo del pool)."""
+        if inst is None:
+            frame = decodificar(data, self.reduccion)
+            if frame is None:
+                return None
+            frame_proc = _detectar(frame, seq, self.cam_id)
+            return codificar(redimensionar(frame_proc, perfil.ancho, self.pool), perfil.calidad)
+
+        perfilando = inst.iniciar_muestra()
+        try:
+            t0 = time.perf_counter()
+            frame = decodificar(data, self.reduccion)
+            t1 = time.perf_counter()
+            inst.observar("decodificacion", t1 - t0)
+            if frame is None:
+                return None
+            frame_proc = _detectar(frame, seq, self.cam_id)
+            t2 = time.perf_counter()
+            inst.observar("inferencia", t2 - t1)
+            data_out = codificar(redimensionar(frame_proc, perfil.ancho, self.pool), perfil.calidad)
+            inst.observar("codificacion", time.perf_counter() - t2)
+            return data_out
+        finally:
+            if perfilando:
+                inst.terminar_muestra()
+
+    async def _procesar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            seq, ts, data, recibido = await self.queue.get()
+            inst = instrumentacion.para(self.cam_id)
+            if time.monotonic() - recibido > EDAD_MAXIMA_FRAME_S:
+                self.descartados += 1
+                self.metricas.contar("descartados")
+                if inst is not None:
+                    inst.contar("descartados_viejos")
+                continue
+            if inst is not None:
+                inst.contar("frames")
+            # Perfil (adaptativo) vigente al empezar este frame
+            perfil = perfil_efectivo(self.opciones)
+            try:
+                data_out = await loop.run_in_executor(_pool_ingesta, self._pipeline, seq, data, perfil, inst)
+            except Exception as e:
+                logger.error(f"❌ Error procesando frame local {seq}: {e}")
+                continue
+            if not data_out:
+                continue
+            self.procesados += 1
+            self.metricas.contar("inferidos")
+            try:
+                t0 = time.perf_counter()
+                if self.trama:
+                    await self.websocket.send_bytes(empaquetar(data_out, seq, ts, self.cam_id, TIPO_JPEG))
+                else:
+                    cabecera = json.dumps({"type": "frame", "seq": seq, "descartados": self.descartados},
+                                          separators=(",", ":"))
+                    await self.websocket.send_text(cabecera)
+                    await self.websocket.send_bytes(data_out)
+                duracion = time.perf_counter() - t0
+                registrar_latencia(self.opciones, duracion)
+                self.metricas.contar("enviados")
+                if inst is not None:
+                    inst.observar("envio", duracion)
+                    inst.contar("envios")
+                    inst.contar("frames_enviados")
+            except Exception as e:
+                logger.debug("Cliente local %s no recibe: %s", self.cam_id, e)
+                if inst is not None:
+                    inst.contar("envios_fallidos")
+                return
+
+    async def cerrar(self):
+        SESIONES.pop(self.cam_id, None)
+        instrumentacion.desactivar(self.cam_id)   # el id no se reutiliza
+        metricas.olvidar(self.cam_id)
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except (asyncio.CancelledError, Exception):
+                pass
+        self.pool.liberar()
+        logger.info(f"📊 Sesión local {self.cam_id}: {self.recibidos} recibidos, "
+                    f"{self.procesados} procesados, {self.descartados} descartados, {self.invalidos} inválidos")
@@ -0,0 +1,187 @@
+# api/core/instrumentation.py
+"""
+Instrumentación del camino caliente por cámara
+
+- Apagada por defecto: instrumentacion.para(cam_id) retorna None y los loops
+  no toman tiempos ni formatean nada (un solo dict.get por frame)
+- Encendida (por cámara, en caliente desde /api/admin/instrumentacion):
+  contadores e histogramas preasignados por etapa (captura, decodificación,
+  inferencia, OCR, codificación, envío) con cubetas fijas; observar() no
+  reserva memoria
+- Perfilador por muestreo: con perfilar=True se corre cProfile sobre uno de
+  cada `muestreo` frames y se acumulan las estadísticas
+"""
+import io
+import time
+import pstats
+import cProfile
+import logging
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+ETAPAS = ("captura", "decodificacion", "inferencia", "placas", "ocr", "codificacion", "envio")
+CONTADORES = ("frames", "frames_enviados", "envios", "envios_fallidos", "descartados_viejos", "errores_lectura")
+# Límites superiores de las cubetas en segundos (la última cubeta es +Inf)
+LIMITES_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+MUESTREO_PERFIL_DEFECTO = 30    # perfilar 1 de cada N frames
+TOP_PERFIL = 25
+
+
+class Histograma:
+    """Histograma de tiempos con cubetas fijas (LIMITES_S + desbordamiento)."""
+
+    __slots__ = ("cuentas", "suma", "n", "minimo", "maximo")
+
+    def __init__(self):
+        self.cuentas = [0] * (len(LIMITES_S) + 1)
+        self.suma = 0.0
+        self.n = 0
+        self.minimo = float("inf")
+        self.maximo = 0.0
+
+    def observar(self, segundos: float):
+        self.cuentas[bisect_left(LIMITES_S, segundos)] += 1
+        self.suma += segundos
+        self.n += 1
+        if segundos < self.minimo:
+            self.minimo = segundos
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+    def percentil(self, p: float):
+        """
+        Estimación del percentil p (0-100): interpola linealmente dentro de la
+        cubeta que lo contiene, con sus bordes acotados al mínimo y máximo
+        observados (como histogram_quantile de Prometheus).
+        """
+        if not self.n:
+            return None
+        objetivo = self.n * p / 100.0
+        acumulado = 0
+        inferior = 0.0
+        for limite, cuenta in zip(LIMITES_S + (self.maximo,), self.cuentas):
+            if cuenta and acumulado + cuenta >= objetivo:
+                bajo = max(inferior, self.minimo)
+                alto = min(limite, self.maximo)
+                return bajo + (alto - bajo) * max(objetivo - acumulado, 0.0) / cuenta
+            acumulado += cuenta
+            inferior = limite
+        return self.maximo
+
+    def a_dict(self):
+        return {
+            "n": self.n,
+            "media_ms": round(self.suma / self.n * 1000, 3) if self.n else None,
+            "p50_ms": _ms(self.percentil(50)),
+            "p95_ms": _ms(self.percentil(95)),
+            "p99_ms": _ms(self.percentil(99)),
+            "max_ms": round(self.maximo * 1000, 3),
+        }
+
+
+def _ms(segundos):
+    return None if segundos is None else round(segundos * 1000, 3)
+
+
+class InstrumentosCamara:
+    """Contadores, histogramas y perfilador de una cámara."""
+
+    def __init__(self, cam_id, perfilar: bool = False, muestreo: int = MUESTREO_PERFIL_DEFECTO):
+        self.cam_id = cam_id
+        self.desde = time.time()
+        self.histogramas = {etapa: Histograma() for etapa in ETAPAS}
+        self.contadores = dict.fromkeys(CONTADORES, 0)
+        self.muestreo = max(1, int(muestreo))
+        self.perfilador = cProfile.Profile() if perfilar else None
+        self.muestras_perfil = 0
+        self._turno = 0
+
+    def observar(self, etapa: str, segundos: float):
+        self.histogramas[etapa].observar(segundos)
+
+    def contar(self, nombre: str, n: int = 1):
+        self.contadores[nombre] += n
+
+    def medir_pipeline(self, total: float, tiempos: dict):
+        """
+        Reparte el tiempo del pipeline en inferencia/placas/OCR con los tiempos
+        que reporta el detector; sin ellos, todo cuenta como inferencia.
+        """
+        if not tiempos:
+            self.observar("inferencia", total)
+            return
+        for etapa in ("inferencia", "placas", "ocr"):
+            if etapa in tiempos:
+                self.observar(etapa, tiempos[etapa])
+
+    def iniciar_muestra(self):
+        """Activa el perfilador en uno de cada `muestreo` frames. Retorna si lo hizo."""
+        if self.perfilador is None:
+            return False
+        self._turno += 1
+        if self._turno % self.muestreo:
+            return False
+        try:
+            self.perfilador.enable()
+        except ValueError:
+            # Otro perfilador activo (desde 3.12 es global al proceso): se salta la muestra
+            return False
+        return True
+
+    def terminar_muestra(self):
+        self.perfilador.disable()
+        self.muestras_perfil += 1
+
+    def perfil_texto(self, top: int = TOP_PERFIL, orden: str = "cumulative"):
+        """Funciones más costosas de los frames perfilados (salida de pstats)."""
+        if self.perfilador is None:
+            return "Perfilador no activo para esta cámara"
+        if not self.muestras_perfil:
+            return "Todavía no hay frames perfilados"
+        salida = io.StringIO()
+        pstats.Stats(self.perfilador, stream=salida).sort_stats(orden).print_stats(top)
+        return salida.getvalue()
+
+    def a_dict(self):
+        return {
+            "cam_id": self.cam_id,
+            "desde": self.desde,
+            "contadores": dict(self.contadores),
+            "etapas": {etapa: h.a_dict() for etapa, h in self.histogramas.items() if h.n},
+            "perfilando": self.perfilador is not None,
+            "muestreo": self.muestreo,
+            "muestras_perfil": self.muestras_perfil,
+        }
+
+
+class Instrumentacion:
+    """Registro de las cámaras instrumentadas (las demás no pagan nada)."""
+
+    def __init__(self):
+        self._camaras = {}
+
+    def para(self, cam_id):
+        """Instrumentos de la cámara o None si está apagada."""
+        return self._camaras.get(cam_id)
+
+    def activar(self, cam_id, perfilar: bool = False, muestreo: int = MUESTREO_PERFIL_DEFECTO):
+        """Enciende (o reinicia) la instrumentación de una cámara."""
+        self._camaras[cam_id] = InstrumentosCamara(cam_id, perfilar, muestreo)
+        logger.info("🔬 Instrumentación activada para %s (perfilar=%s)", cam_id, perfilar)
+        return self._camaras[cam_id]
+
+    def desactivar(self, cam_id):
+        instrumentos = self._camaras.pop(cam_id, None)
+        if instrumentos is not None:
+            logger.info("🔬 Instrumentación desactivada para %s", cam_id)
+        return instrumentos
+
+    def camaras(self):
+        return list(self._camaras)
+
+    def estado(self):
+        return {str(cam_id): inst.a_dict() for cam_id, inst in self._camaras.items()}
+
+
+instrumentacion = Instrumentacion()
@@ -0,0 +1,156 @@
+# api/core/metrics.py
+"""
+Métricas siempre activas del pipeline en formato de exposición de Prometheus
+
+- Por cámara: frames capturados / inferidos / enviados / descartados
+  (contadores) y FPS recientes de cada uno (gauge calculado al exponer)
+- Histogramas de latencia por etapa y cámara: yolo, placas (detector de
+  placas), ocr, codificacion (JPEG) y escritura_db
+- Las colas, listeners, OCR y memoria los aporta quien expone (app.py) como
+  familias de gauges/counters simples
+
+Solo incrementa enteros y usa los histogramas de cubetas fijas de
+core/instrumentation.py, así que puede quedar encendido siempre (a
+diferencia de la instrumentación detallada, que se enciende por cámara).
+Sin dependencia de prometheus_client: el texto se arma aquí.
+"""
+import os
+import time
+import logging
+from collections import defaultdict
+
+from .instrumentation import Histograma, LIMITES_S
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+PREFIJO = "parking"
+TIPOS_FRAME = ("capturados", "inferidos", "enviados", "descartados")
+ETAPAS_METRICAS = ("yolo", "placas", "ocr", "codificacion", "escritura_db")
+VENTANA_FPS_S = 5.0     # mínimo de segundos entre dos cálculos de FPS
+
+
+class MetricasCamara:
+    """Contadores e histogramas de una cámara (preasignados)."""
+
+    __slots__ = ("frames", "histogramas", "_fps", "_referencia")
+
+    def __init__(self):
+        self.frames = dict.fromkeys(TIPOS_FRAME, 0)
+        self.histogramas = {etapa: Histograma() for etapa in ETAPAS_METRICAS}
+        self._fps = None
+        self._referencia = (time.monotonic(), dict(self.frames))
+
+    def contar(self, tipo: str, n: int = 1):
+        self.frames[tipo] += n
+
+    def observar(self, etapa: str, segundos: float):
+        self.histogramas[etapa].observar(segundos)
+
+    def observar_pipeline(self, tiempos: dict):
+        """Tiempos del detector (obtener_tiempos); placas/OCR solo si corrieron en el frame."""
+        if "inferencia" in tiempos:
+            self.histogramas["yolo"].observar(tiempos["inferencia"])
+        for etapa in ("placas", "ocr"):
+            if tiempos.get(etapa):
+                self.histogramas[etapa].observar(tiempos[etapa])
+
+    def fps(self):
+        """
+        FPS de cada contador desde el cálculo anterior (como mucho cada
+        VENTANA_FPS_S); antes de la primera ventana, desde que empezó la cámara.
+        """
+        ahora = time.monotonic()
+        t0, previos = self._referencia
+        dt = ahora - t0
+        if dt >= VENTANA_FPS_S:
+            self._fps = {tipo: (self.frames[tipo] - previos[tipo]) / dt for tipo in TIPOS_FRAME}
+            self._referencia = (ahora, dict(self.frames))
+        elif self._fps is None:
+            return {tipo: (self.frames[tipo] - previos[tipo]) / dt if dt > 0 else 0.0 for tipo in TIPOS_FRAME}
+        return self._fps
+
+
+class Metricas:
+    """Registro global de métricas por cámara."""
+
+    def __init__(self):
+        self._camaras = defaultdict(MetricasCamara)
+
+    def camara(self, cam_id):
+        return self._camaras[cam_id]
+
+    def olvidar(self, cam_id):
+        """Descarta las series de una cámara que no volverá (p.ej. sesión local cerrada)."""
+        self._camaras.pop(cam_id, None)
+
+    def familias(self):
+        """Familias (nombre, tipo, ayuda, muestras) de las métricas por cámara."""
+        frames, fps, histogramas = [], [], []
+        for cam_id, m in list(self._camaras.items()):
+            camara = str(cam_id)
+            actuales = m.fps()
+            for tipo in TIPOS_FRAME:
+                etiquetas = {"camara": camara, "tipo": tipo}
+                frames.append((etiquetas, m.frames[tipo]))
+                fps.append((etiquetas, round(actuales[tipo], 3)))
+            for etapa, h in m.histogramas.items():
+                if h.n:
+                    histogramas.append(({"camara": camara, "etapa": etapa}, h))
+        return [
+            (f"{PREFIJO}_frames_total", "counter", "Frames por cámara: capturados, inferidos, enviados y descartados", frames),
+            (f"{PREFIJO}_fps", "gauge", "Frames por segundo recientes por cámara y tipo", fps),
+            (f"{PREFIJO}_etapa_segundos", "histogram", "Latencia por etapa del pipeline", histogramas),
+        ]
+
+
+def memoria_proceso():
+    """RSS del proceso en bytes (psutil, /proc o el máximo de getrusage)."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(etiquetas: dict):
+    if not etiquetas:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in etiquetas.items()) + "}"
+
+
+def exponer(familias):
+    """
+    Texto de exposición de Prometheus. familias: lista de
+    (nombre, tipo, ayuda, muestras); muestras es [(etiquetas, valor)] o, en
+    histogramas, [(etiquetas, Histograma)].
+    """
+    lineas = []
+    for nombre, tipo, ayuda, muestras in familias:
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        for etiquetas, valor in muestras:
+            if tipo != "histogram":
+                lineas.append(f"{nombre}{_etiquetas(etiquetas)} {valor}")
+                continue
+            acumulado = 0
+            for limite, cuenta in zip(LIMITES_S + ("+Inf",), valor.cuentas):
+                acumulado += cuenta
+                lineas.append(f"{nombre}_bucket{_etiquetas({**etiquetas, 'le': limite})} {acumulado}")
+            lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {valor.suma}")
+            lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {valor.n}")
+    return "\n".join(lineas) + "\n"
+
+
+metricas = Metricas()
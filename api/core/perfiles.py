@@ -0,0 +1,98 @@
+# api/core/perfiles.py
+"""
+Perfiles de stream por listener (resolución y calidad JPEG)
+
+- El cliente pide un perfil en el handshake ("perfil": "alto"|"medio"|"bajo"
+  o "ancho"/"calidad" explícitos)
+- Cada listener mide la latencia de sus envíos; si el enlace no da abasto se
+  baja un escalón de ESCALERA y, tras un rato estable, se vuelve a subir
+  (nunca por encima de lo pedido)
+- Los listeners con el mismo perfil efectivo comparten una sola codificación
+"""
+import logging
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class PerfilStream(NamedTuple):
+    ancho: int      # ancho máximo en px (0 = resolución original)
+    calidad: int    # calidad JPEG (1-100)
+
+
+PERFILES = {
+    "alto": PerfilStream(0, 80),
+    "medio": PerfilStream(960, 65),
+    "bajo": PerfilStream(480, 45),
+}
+
+# Escalones de degradación automática; se combinan con el perfil pedido
+ESCALERA = (
+    PerfilStream(0, 100),
+    PerfilStream(1280, 70),
+    PerfilStream(960, 60),
+    PerfilStream(640, 50),
+    PerfilStream(480, 45),
+    PerfilStream(320, 40),
+)
+
+LATENCIA_DEGRADAR = 0.08    # s por envío (media móvil) para bajar un escalón
+LATENCIA_MEJORAR = 0.02     # s por envío para considerar el enlace holgado
+FRAMES_PARA_MEJORAR = 90    # envíos holgados seguidos antes de subir un escalón
+ALFA_LATENCIA = 0.2         # peso de la última medición en la media móvil
+MIN_MUESTRAS = 5            # envíos medidos en un escalón antes de poder bajar otro
+
+
+def perfil_desde_config(config: dict, calidad_defecto: int = 70):
+    """Perfil pedido en el handshake. Lanza ValueError si es inválido."""
+    nombre = config.get("perfil")
+    if nombre is None:
+        base = PerfilStream(0, calidad_defecto)
+    elif nombre in PERFILES:
+        base = PERFILES[nombre]
+    else:
+        raise ValueError(f"Perfil inválido: {nombre} (válidos: {', '.join(PERFILES)})")
+    ancho = int(config.get("ancho", base.ancho))
+    calidad = int(config.get("calidad", base.calidad))
+    if ancho < 0 or not 1 <= calidad <= 100:
+        raise ValueError("ancho debe ser >= 0 y calidad entre 1 y 100")
+    return PerfilStream(ancho, calidad)
+
+
+def estado_adaptacion(perfil: PerfilStream, adaptativo: bool = True):
+    """Estado por listener que usan perfil_efectivo() y registrar_latencia()."""
+    return {"perfil": perfil, "adaptativo": adaptativo, "nivel": 0, "latencia": None, "muestras": 0, "estables": 0}
+
+
+def perfil_efectivo(estado: dict):
+    """Perfil pedido limitado por el escalón actual de adaptación."""
+    base = estado["perfil"]
+    escalon = ESCALERA[estado["nivel"]]
+    anchos = [a for a in (base.ancho, escalon.ancho) if a]
+    return PerfilStream(min(anchos) if anchos else 0, min(base.calidad, escalon.calidad))
+
+
+def registrar_latencia(estado: dict, segundos: float):
+    """Actualiza la media móvil de latencia y sube/baja de escalón si corresponde."""
+    previa = estado["latencia"]
+    latencia = segundos if previa is None else ALFA_LATENCIA * segundos + (1 - ALFA_LATENCIA) * previa
+    estado["latencia"] = latencia
+    estado["muestras"] += 1
+    if not estado["adaptativo"]:
+        return
+
+    if latencia > LATENCIA_DEGRADAR and estado["muestras"] >= MIN_MUESTRAS and estado["nivel"] < len(ESCALERA) - 1:
+        estado["nivel"] += 1
+        estado["estables"] = 0
+        estado["latencia"] = None   # medir el nuevo escalón desde cero
+        estado["muestras"] = 0
+        logger.info(f"📉 Listener lento ({latencia * 1000:.0f} ms): perfil {perfil_efectivo(estado)}")
+    elif latencia < LATENCIA_MEJORAR:
+        estado["estables"] += 1
+        if estado["estables"] >= FRAMES_PARA_MEJORAR and estado["nivel"] > 0:
+            estado["nivel"] -= 1
+            estado["estables"] = 0
+            logger.info(f"📈 Listener recuperado: perfil {perfil_efectivo(estado)}")
+    else:
+        estado["estables"] = 0
+
@@ -0,0 +1,98 @@
+# api/core/protocolo.py
+"""
+Sobre binario de frames para /ws/camara-directa (ambas direcciones)
+
+Se negocia en el handshake con "protocolo": "trama"; sin él se mantiene el
+protocolo original (JPEG crudo). Cada mensaje binario es:
+
+    cabecera  !2sBBBIdH  (21 bytes, orden de red)
+        magia        b"PK"
+        version      VERSION
+        tipo         TIPO_JPEG | TIPO_DETECCIONES
+        flags        FLAG_DETECCIONES si hay bloque de detecciones
+        seq          uint32, secuencia del frame (la del cliente en cámaras locales)
+        ts           float64, instante de captura (epoch en segundos, reloj de quien capturó)
+        largo_cam    uint16
+    cam_id       largo_cam bytes UTF-8
+    [largo_det   uint32 + JSON UTF-8 de las detecciones]  si FLAG_DETECCIONES
+    payload      resto del mensaje (JPEG; vacío en TIPO_DETECCIONES)
+
+Con seq y ts el cliente mide la latencia de extremo a extremo y detecta
+frames perdidos; el servidor descarta frames que llegan viejos.
+"""
+import json
+import struct
+from typing import NamedTuple
+
+MAGIA = b"PK"
+VERSION = 1
+CABECERA = struct.Struct("!2sBBBIdH")
+LARGO_DET = struct.Struct("!I")
+
+TIPO_JPEG = 1
+TIPO_DETECCIONES = 2
+TIPOS = (TIPO_JPEG, TIPO_DETECCIONES)
+FLAG_DETECCIONES = 0x01
+
+PROTOCOLOS = ("jpeg", "trama")
+
+
+class Trama(NamedTuple):
+    seq: int
+    ts: float
+    cam_id: str
+    tipo: int
+    detecciones: list      # None si el mensaje no trae bloque de detecciones
+    payload: memoryview
+
+
+def protocolo_desde_config(config: dict):
+    """Protocolo pedido en el handshake. Lanza ValueError si es inválido."""
+    protocolo = config.get("protocolo", "jpeg")
+    if protocolo not in PROTOCOLOS:
+        raise ValueError(f"Protocolo inválido: {protocolo} (válidos: {', '.join(PROTOCOLOS)})")
+    return protocolo
+
+
+def empaquetar(payload, seq: int, ts: float, cam_id, tipo: int = TIPO_JPEG, detecciones=None):
+    """Arma el mensaje binario (payload puede ser bytes o memoryview)."""
+    cam = str(cam_id).encode("utf-8")
+    partes = [None, cam]
+    flags = 0
+    if detecciones is not None:
+        det = json.dumps(detecciones, separators=(",", ":")).encode("utf-8")
+        partes += [LARGO_DET.pack(len(det)), det]
+        flags |= FLAG_DETECCIONES
+    partes[0] = CABECERA.pack(MAGIA, VERSION, tipo, flags, seq & 0xFFFFFFFF, ts, len(cam))
+    partes.append(payload)
+    return b"".join(partes)
+
+
+def desempaquetar(data):
+    """Trama desde un mensaje binario. Lanza ValueError si no es un sobre válido."""
+    vista = memoryview(data)
+    if len(vista) < CABECERA.size:
+        raise ValueError("Mensaje más corto que la cabecera")
+    magia, version, tipo, flags, seq, ts, largo_cam = CABECERA.unpack_from(vista)
+    if magia != MAGIA or version != VERSION:
+        raise ValueError("Cabecera de trama inválida")
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de payload desconocido: {tipo}")
+    pos = CABECERA.size
+    # Cada bloque se valida contra el largo antes de leerlo: un sobre truncado
+    # es un ValueError (frame inválido), nunca un struct.error
+    if pos + largo_cam > len(vista):
+        raise ValueError("Mensaje truncado")
+    cam_id = bytes(vista[pos:pos + largo_cam]).decode("utf-8")
+    pos += largo_cam
+    detecciones = None
+    if flags & FLAG_DETECCIONES:
+        if pos + LARGO_DET.size > len(vista):
+            raise ValueError("Mensaje truncado")
+        (largo_det,) = LARGO_DET.unpack_from(vista, pos)
+        pos += LARGO_DET.size
+        if pos + largo_det > len(vista):
+            raise ValueError("Mensaje truncado")
+        detecciones = json.loads(bytes(vista[pos:pos + largo_det]))
+        pos += largo_det
+    return Trama(seq, ts, cam_id, tipo, detecciones, vista[pos:])
@@ -0,0 +1,193 @@
+# api/core/reports.py
+"""
+Reportes de facturación vectorizados
+
+- Carga solo las columnas necesarias de facturas + registros en un DataFrame
+- Duraciones y cobros calculados con NumPy sobre todo el conjunto
+  (misma regla que crud.calcular_valor_factura: mínimo 1 hora, redondeo hacia arriba)
+- Agregados por hora, día, mes, cámara o tipo de vehículo con groupby
+- Los agregados de facturas cerradas se cachean hasta que se cierre una
+  nueva factura; lo pendiente por cobrar (facturas activas, depende de la
+  hora actual) se recalcula en cada llamada
+"""
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+
+from models import Factura, Registro
+
+logger = logging.getLogger(__name__)
+
+# agrupación -> frecuencia de período de pandas (None = columna categórica)
+AGRUPACIONES = {
+    "hora": "h",
+    "dia": "D",
+    "mes": "M",
+    "camara": None,
+    "tipo_vehiculo": None,
+}
+
+MAX_REPORTES_CACHE = 64
+
+
+def calcular_valores_vectorizado(hora_entrada, hora_salida, tarifa_por_hora):
+    """
+    Versión vectorizada de calcular_valor_factura.
+    Recibe arrays datetime64 y de tarifas; retorna (valores, horas_cobradas).
+    """
+    segundos = (np.asarray(hora_salida) - np.asarray(hora_entrada)) / np.timedelta64(1, "s")
+    horas = np.ceil(np.maximum(segundos / 3600.0, 1.0))
+    return horas * np.asarray(tarifa_por_hora, dtype=np.float64), horas
+
+
+class ReportEngine:
+    """
+    Calcula reportes de ingresos sobre conjuntos completos de facturas.
+    """
+
+    def __init__(self, session_factory):
+        self._session_factory = session_factory
+        self._cache = {}   # (agrupacion, desde, hasta) -> (version, reporte de cerradas)
+        self._lock = threading.Lock()
+
+    def _version(self, db):
+        """Marca barata del estado de facturas cerradas (usa el índice de estado)."""
+        total, ultima_salida, ultimo_id = db.execute(
+            select(func.count(Factura.id), func.max(Factura.hora_salida), func.max(Factura.id))
+            .where(Factura.estado == "cerrado")
+        ).one()
+        return total, ultima_salida, ultimo_id
+
+    def _cargar(self, db, estado: str, desde: datetime = None, hasta: datetime = None):
+        columna_fecha = Factura.hora_salida if estado == "cerrado" else Factura.hora_entrada
+        stmt = (
+            select(
+                Factura.hora_entrada,
+                Factura.hora_salida,
+                Factura.tarifa_por_hora,
+                Factura.valor_pagado,
+                Registro.camara_id,
+                Registro.tipo_vehiculo,
+            )
+            .join(Registro, Factura.registro_id == Registro.id)
+            .where(Factura.estado == estado)
+        )
+        if desde is not None:
+            stmt = stmt.where(columna_fecha >= desde)
+        if hasta is not None:
+            stmt = stmt.where(columna_fecha < hasta)
+
+        return pd.read_sql(stmt, db.connection(), parse_dates=["hora_entrada", "hora_salida"])
+
+    def invalidar(self):
+        """Descarta todos los reportes cacheados."""
+        with self._lock:
+            self._cache.clear()
+
+    def reporte_ingresos(self, agrupacion: str = "dia", desde: datetime = None, hasta: datetime = None):
+        """
+        Reporte de ingresos agregado. Las facturas cerradas se agrupan por su
+        hora de salida; las activas solo aportan el total pendiente por cobrar
+        (nunca cacheado: cambia con cada entrada y con la hora).
+        """
+        if agrupacion not in AGRUPACIONES:
+            raise ValueError(f"Agrupación inválida: {agrupacion}")
+
+        clave = (agrupacion, desde, hasta)
+        db = self._session_factory()
+        try:
+            version = self._version(db)
+            with self._lock:
+                cacheado = self._cache.get(clave)
+            if cacheado and cacheado[0] == version:
+                reporte = cacheado[1]
+            else:
+                reporte = None
+                cerradas = self._cargar(db, "cerrado", desde, hasta)
+            activas = self._cargar(db, "activo")
+        finally:
+            db.close()
+
+        if reporte is None:
+            reporte = self._construir(cerradas, agrupacion)
+            reporte.update({
+                "agrupacion": agrupacion,
+                "desde": desde.isoformat() if desde else None,
+                "hasta": hasta.isoformat() if hasta else None,
+            })
+            with self._lock:
+                if len(self._cache) >= MAX_REPORTES_CACHE:
+                    self._cache.pop(next(iter(self._cache)))
+                self._cache[clave] = (version, reporte)
+
+        # Copia: el reporte cacheado no lleva los totales pendientes
+        return {**reporte, "totales": {**reporte["totales"], **self._pendientes(activas)}}
+
+    def _pendientes(self, activas, ahora: datetime = None):
+        """Facturas activas y lo que se cobraría si salieran ahora."""
+        por_cobrar = 0.0
+        if not activas.empty:
+            ahora = np.datetime64(ahora or datetime.utcnow())
+            valores_activos, _ = calcular_valores_vectorizado(
+                activas["hora_entrada"].to_numpy(), ahora, activas["tarifa_por_hora"].to_numpy()
+            )
+            por_cobrar = float(valores_activos.sum())
+        return {"facturas_activas": int(len(activas)), "por_cobrar": por_cobrar}
+
+    def _construir(self, cerradas, agrupacion: str):
+        totales = {
+            "facturas_cerradas": int(len(cerradas)),
+            "ingresos": 0.0,
+            "ingresos_calculados": 0.0,
+            "horas_cobradas": 0.0,
+        }
+        if cerradas.empty:
+            return {"totales": totales, "grupos": []}
+
+        valores, horas = calcular_valores_vectorizado(
+            cerradas["hora_entrada"].to_numpy(),
+            cerradas["hora_salida"].to_numpy(),
+            cerradas["tarifa_por_hora"].to_numpy(),
+        )
+        cerradas = cerradas.assign(
+            valor_calculado=valores,
+            horas_cobradas=horas,
+            duracion_min=(cerradas["hora_salida"] - cerradas["hora_entrada"]).dt.total_seconds() / 60.0,
+        )
+
+        frecuencia = AGRUPACIONES[agrupacion]
+        if frecuencia is not None:
+            grupo = cerradas["hora_salida"].dt.to_period(frecuencia).dt.start_time
+        else:
+            grupo = cerradas["camara_id" if agrupacion == "camara" else "tipo_vehiculo"]
+
+        agregado = cerradas.groupby(grupo, sort=True).agg(
+            facturas=("valor_pagado", "size"),
+            ingresos=("valor_pagado", "sum"),
+            ingresos_calculados=("valor_calculado", "sum"),
+            horas_cobradas=("horas_cobradas", "sum"),
+            duracion_promedio_min=("duracion_min", "mean"),
+        )
+
+        grupos = [
+            {
+                "grupo": k.isoformat() if isinstance(k, pd.Timestamp) else (None if pd.isna(k) else k),
+                "facturas": int(fila.facturas),
+                "ingresos": float(fila.ingresos),
+                "ingresos_calculados": float(fila.ingresos_calculados),
+                "horas_cobradas": float(fila.horas_cobradas),
+                "duracion_promedio_min": round(float(fila.duracion_promedio_min), 2),
+            }
+            for k, fila in zip(agregado.index, agregado.itertuples(index=False))
+        ]
+
+        totales.update({
+            "ingresos": float(cerradas["valor_pagado"].sum()),
+            "ingresos_calculados": float(valores.sum()),
+            "horas_cobradas": float(horas.sum()),
+        })
+        return {"totales": totales, "grupos": grupos}
@@ -0,0 +1,184 @@
+# api/core/supervisor.py
+"""
+Supervisión de cámaras: apertura/lectura con timeout, reconexión con backoff
+exponencial con jitter y estado de salud por cámara
+
+- Aperturas y lecturas corren en pools de hilos propios (no en el event loop
+  ni en el pool por defecto): un host RTSP muerto que cuelga cv2.VideoCapture
+  no bloquea al resto de cámaras
+- Cada cámara tiene a lo sumo una apertura en curso; si una apertura colgada
+  no ha vuelto, no se lanza otra (los hilos no se acumulan)
+- Una captura cuya lectura quedó colgada se libera cuando esa lectura termina,
+  nunca mientras otro hilo la está usando
+"""
+import asyncio
+import random
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .capture import abrir_captura
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_APERTURA = 15.0      # s máximos esperando a que abra una cámara
+TIMEOUT_LECTURA = 10.0       # s sin frames antes de considerar la cámara caída
+BACKOFF_BASE = 1.0           # s de espera tras el primer fallo
+BACKOFF_MAX = 60.0           # tope de espera entre reintentos
+FALLOS_PARA_CAIDA = 5        # fallos seguidos para marcar la cámara como "caida"
+HILOS_APERTURA = 8
+HILOS_LECTURA = 32
+
+# Pools separados: las aperturas colgadas no pueden dejar sin hilos a las lecturas
+_pool_apertura = ThreadPoolExecutor(max_workers=HILOS_APERTURA, thread_name_prefix="cam-abrir")
+_pool_lectura = ThreadPoolExecutor(max_workers=HILOS_LECTURA, thread_name_prefix="cam-leer")
+
+ESTADOS = ("conectando", "activa", "reconectando", "caida", "detenida")
+
+
+def calcular_espera(intentos: int):
+    """Backoff exponencial con jitter (entre la mitad y el total del escalón)."""
+    tope = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** max(0, intentos - 1)))
+    return random.uniform(tope / 2, tope)
+
+
+class SaludCamara:
+    """Estado de salud de una cámara (lo que expone /api/salud/camaras)."""
+
+    def __init__(self, url: str, backend: str = "opencv"):
+        self.url = url
+        self.backend = backend
+        self.estado = "conectando"
+        self.desde = time.time()
+        self.fallos_seguidos = 0
+        self.reconexiones = 0
+        self.frames = 0
+        self.ultimo_frame = None
+        self.ultimo_error = None
+        self.proximo_intento = None
+        self.apertura_pendiente = None   # futuro de una apertura que superó el timeout
+
+    def _cambiar(self, estado):
+        if estado != self.estado:
+            logger.info(f"🩺 Cámara {self.url}: {self.estado} -> {estado}")
+            self.estado = estado
+            self.desde = time.time()
+
+    def conectada(self):
+        if self.frames:
+            self.reconexiones += 1
+        self.proximo_intento = None
+        self._cambiar("activa")
+
+    def frame(self):
+        self.frames += 1
+        self.ultimo_frame = time.time()
+        self.fallos_seguidos = 0
+
+    def fallo(self, error: str):
+        """Registra un fallo y retorna cuántos segundos esperar antes de reintentar."""
+        self.fallos_seguidos += 1
+        self.ultimo_error = error
+        self._cambiar("caida" if self.fallos_seguidos >= FALLOS_PARA_CAIDA else "reconectando")
+        espera = calcular_espera(self.fallos_seguidos)
+        self.proximo_intento = time.time() + espera
+        return espera
+
+    def detenida(self):
+        self._cambiar("detenida")
+
+    def a_dict(self):
+        return {
+            "url": self.url,
+            "backend": self.backend,
+            "estado": self.estado,
+            "desde": self.desde,
+            "fallos_seguidos": self.fallos_seguidos,
+            "reconexiones": self.reconexiones,
+            "frames": self.frames,
+            "ultimo_frame": self.ultimo_frame,
+            "segundos_sin_frames": round(time.time() - self.ultimo_frame, 1) if self.ultimo_frame else None,
+            "ultimo_error": self.ultimo_error,
+            "proximo_intento": self.proximo_intento,
+        }
+
+
+def _liberar_al_terminar(futuro, obtener_cap):
+    """Libera la captura cuando el hilo que la usa termine."""
+    def _cb(f):
+        try:
+            cap = obtener_cap(f)
+            if cap is not None:
+                cap.release()
+        except Exception:
+            pass
+    futuro.add_done_callback(_cb)
+
+
+async def abrir(url: str, captura: dict, salud: SaludCamara):
+    """
+    Abre la captura en el pool de aperturas con TIMEOUT_APERTURA.
+    Retorna la captura abierta o None (el motivo queda en salud.ultimo_error).
+    """
+    pendiente = salud.apertura_pendiente
+    if pendiente is not None and not pendiente.done():
+        salud.ultimo_error = "apertura anterior todavía colgada"
+        return None
+    salud.apertura_pendiente = None
+
+    loop = asyncio.get_running_loop()
+    futuro = loop.run_in_executor(_pool_apertura, abrir_captura, url, captura)
+    try:
+        cap = await asyncio.wait_for(asyncio.shield(futuro), TIMEOUT_APERTURA)
+    except asyncio.TimeoutError:
+        salud.apertura_pendiente = futuro
+        salud.ultimo_error = f"timeout abriendo ({TIMEOUT_APERTURA:.0f} s)"
+        _liberar_al_terminar(futuro, lambda f: f.result())
+        return None
+    except asyncio.CancelledError:
+        _liberar_al_terminar(futuro, lambda f: f.result())
+        raise
+    except Exception as e:
+        salud.ultimo_error = f"error abriendo: {e}"
+        return None
+
+    if not cap.isOpened():
+        cap.release()
+        salud.ultimo_error = "no se pudo abrir"
+        return None
+    return cap
+
+
+async def leer(cap):
+    """
+    Lee un frame en el pool de lecturas con TIMEOUT_LECTURA.
+    Retorna el frame o None; si la lectura quedó colgada, la captura se
+    libera sola al terminar y no debe volver a usarse.
+    """
+    loop = asyncio.get_running_loop()
+    futuro = loop.run_in_executor(_pool_lectura, cap.read)
+    try:
+        ok, frame = await asyncio.wait_for(asyncio.shield(futuro), TIMEOUT_LECTURA)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        cap.lectura_colgada = True
+        _liberar_al_terminar(futuro, lambda f: cap)
+        if isinstance(e, asyncio.CancelledError):
+            raise
+        return None
+    return frame if ok else None
+
+
+def liberar(cap):
+    """Libera la captura salvo que una lectura colgada ya se encargue de hacerlo."""
+    if cap is not None and not getattr(cap, "lectura_colgada", False):
+        cap.release()
+
+
+async def esperar(segundos: float, detener):
+    """Duerme hasta `segundos` despertando antes si detener() pasa a True."""
+    limite = time.monotonic() + segundos
+    while not detener():
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            return
+        await asyncio.sleep(min(0.25, restante))
@@ -0,0 +1,137 @@
+# api/core/tracing.py
+"""
+Trazas por frame (spans) para encontrar qué etapa hizo lento un frame
+
+- Opt-in por cámara (PUT /api/admin/trazas/{cam_id}); trazador.para(cam_id)
+  es None en las demás y el loop no toma tiempos
+- Cada frame trazado junta los spans de CameraManager (captura, procesar,
+  dibujar, codificar, envío) y los de detectar_frame (coco_model, tracker,
+  lp_model, read_license_plate y sus intentos, upload_to_drive, ...)
+- Solo los frames que superan el umbral de la cámara se guardan, en un
+  buffer circular de los últimos MAX_FRAMES_LENTOS
+- exportar_chrome() los entrega en formato Chrome trace-event (abrir en
+  chrome://tracing o https://ui.perfetto.dev)
+"""
+import json
+import time
+import logging
+from collections import deque, defaultdict
+
+logger = logging.getLogger(__name__)
+
+MAX_FRAMES_LENTOS = 200
+UMBRAL_LENTO_MS = 100.0
+
+
+class TrazaFrame:
+    """Spans (nombre, inicio, fin) de un frame, en segundos de perf_counter."""
+
+    __slots__ = ("cam_id", "frame_n", "inicio", "fin", "ts", "spans")
+
+    def __init__(self, cam_id):
+        self.cam_id = cam_id
+        self.frame_n = None
+        self.inicio = time.perf_counter()
+        self.fin = None
+        self.ts = time.time()
+        self.spans = []
+
+    def agregar(self, nombre: str, inicio: float, fin: float = None):
+        self.spans.append((nombre, inicio, time.perf_counter() if fin is None else fin))
+
+    def extender(self, spans):
+        self.spans.extend(spans)
+
+    def duracion(self):
+        return (self.fin or time.perf_counter()) - self.inicio
+
+    def a_dict(self):
+        """Resumen con el desglose por etapa (ms sumados por nombre de span)."""
+        etapas = defaultdict(float)
+        for nombre, inicio, fin in self.spans:
+            etapas[nombre] += (fin - inicio) * 1000
+        return {
+            "cam_id": str(self.cam_id),
+            "frame": self.frame_n,
+            "ts": self.ts,
+            "total_ms": round(self.duracion() * 1000, 3),
+            "etapas_ms": {nombre: round(ms, 3) for nombre, ms in sorted(etapas.items(), key=lambda e: -e[1])},
+            "spans": [(nombre, round((inicio - self.inicio) * 1000, 3), round((fin - inicio) * 1000, 3))
+                      for nombre, inicio, fin in self.spans],
+        }
+
+
+class Trazador:
+    """Cámaras trazadas (con su umbral) y buffer de los frames lentos."""
+
+    def __init__(self, maxlen: int = MAX_FRAMES_LENTOS):
+        self._umbrales = {}
+        self.lentos = deque(maxlen=maxlen)
+        self.trazados = 0
+
+    def para(self, cam_id):
+        """Nueva traza de frame si la cámara está trazada, o None."""
+        if cam_id not in self._umbrales:
+            return None
+        return TrazaFrame(cam_id)
+
+    def activar(self, cam_id, umbral_ms: float = UMBRAL_LENTO_MS):
+        self._umbrales[cam_id] = umbral_ms / 1000.0
+        logger.info("🧵 Trazas activadas para %s (umbral %.0f ms)", cam_id, umbral_ms)
+
+    def desactivar(self, cam_id):
+        if self._umbrales.pop(cam_id, None) is None:
+            return False
+        logger.info("🧵 Trazas desactivadas para %s", cam_id)
+        return True
+
+    def camaras(self):
+        return {str(cam_id): umbral * 1000 for cam_id, umbral in self._umbrales.items()}
+
+    def terminar(self, traza: TrazaFrame):
+        """Cierra la traza y la guarda si el frame fue lento."""
+        traza.fin = time.perf_counter()
+        self.trazados += 1
+        umbral = self._umbrales.get(traza.cam_id)
+        if umbral is not None and traza.fin - traza.inicio >= umbral:
+            self.lentos.append(traza)
+
+    def limpiar(self):
+        self.lentos.clear()
+
+    def frames_lentos(self, cam_id=None, limite: int = None):
+        trazas = [t for t in self.lentos if cam_id is None or str(t.cam_id) == str(cam_id)]
+        if limite:
+            trazas = trazas[-limite:]
+        return [t.a_dict() for t in reversed(trazas)]
+
+    def exportar_chrome(self, cam_id=None):
+        """Frames lentos como trace-event JSON (eventos "X" con ts/dur en µs)."""
+        eventos = []
+        hilos = {}
+        for traza in self.lentos:
+            if cam_id is not None and str(traza.cam_id) != str(cam_id):
+                continue
+            tid = hilos.setdefault(str(traza.cam_id), len(hilos) + 1)
+            eventos.append({
+                "name": f"frame {traza.frame_n}", "cat": "frame", "ph": "X", "pid": 1, "tid": tid,
+                "ts": traza.inicio * 1e6, "dur": (traza.fin - traza.inicio) * 1e6,
+                "args": {"cam_id": str(traza.cam_id), "frame": traza.frame_n, "ts": traza.ts},
+            })
+            for nombre, inicio, fin in traza.spans:
+                eventos.append({
+                    "name": nombre, "cat": "etapa", "ph": "X", "pid": 1, "tid": tid,
+                    "ts": inicio * 1e6, "dur": (fin - inicio) * 1e6,
+                })
+        for nombre, tid in hilos.items():
+            eventos.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": f"cámara {nombre}"}})
+        return {"traceEvents": eventos, "displayTimeUnit": "ms"}
+
+    def guardar_chrome(self, ruta: str, cam_id=None):
+        """Escribe la exportación Chrome en un archivo (análisis offline)."""
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(self.exportar_chrome(cam_id), f)
+        return ruta
+
+
+trazador = Trazador()
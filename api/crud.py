@@ -1,3 +1,4 @@
+from sqlalchemy import update, select, bindparam
 from sqlalchemy.orm import Session
 from datetime import datetime
 from models import Camara, Registro, Factura
@@ -7,7 +8,7 @@ def crear_camara(db: Session, camara: CamaraCreate):
     db_camara = Camara(
         nombre=camara.nombre,
         url=camara.url,
-        activa=1,
+        activa=int(getattr(camara, "activa", True)),
         fecha_registro=datetime.utcnow()
     )
     db.add(db_camara)
@@ -21,6 +22,24 @@ def obtener_camaras(db: Session):
 def obtener_camara_por_id(db: Session, camara_id: int):
     return db.query(Camara).filter(Camara.id == camara_id).first()
 
+def obtener_camaras_activas(db: Session):
+    """Cámaras marcadas como activas (se procesan 24/7 desde el arranque)"""
+    return db.query(Camara).filter(Camara.activa == 1).order_by(Camara.id).all()
+
+def actualizar_camara(db: Session, camara_id: int, nombre: str = None, url: str = None, activa: bool = None):
+    camara = obtener_camara_por_id(db, camara_id)
+    if not camara:
+        return None
+    if nombre is not None:
+        camara.nombre = nombre
+    if url is not None:
+        camara.url = url
+    if activa is not None:
+        camara.activa = int(activa)
+    db.commit()
+    db.refresh(camara)
+    return camara
+
 def eliminar_camara(db: Session, camara_id: int):
     camara = db.query(Camara).filter(Camara.id == camara_id).first()
     if camara:
@@ -97,6 +116,47 @@ def cerrar_factura(db: Session, factura_id: int, valor_pagado: float, hora_salid
     db.refresh(factura)
     return factura
 
+def obtener_facturas_abiertas_con_placa(db: Session):
+    """Facturas activas junto con la placa de su registro (para indexar salidas)"""
+    return (
+        db.query(Factura.id, Registro.placa_final, Factura.hora_entrada, Factura.tarifa_por_hora)
+        .join(Registro, Factura.registro_id == Registro.id)
+        .filter(Factura.estado == "activo")
+        .order_by(Factura.hora_entrada.asc())
+        .all()
+    )
+
+def cerrar_facturas_lote(db: Session, cierres: list):
+    """
+    Cerrar varias facturas en una sola transacción. Solo se cierran las que
+    siguen activas: una factura cerrada a mano mientras esperaba en el lote
+    conserva su hora de salida y valor.
+
+    cierres: [{"id": factura_id, "hora_salida": datetime, "valor_pagado": float}, ...]
+    Retorna el conjunto de ids cerrados.
+    """
+    if not cierres:
+        return set()
+    
+    tabla = Factura.__table__
+    activas = set(db.scalars(
+        select(Factura.id).where(Factura.id.in_([c["id"] for c in cierres]), Factura.estado == "activo")
+    ))
+    filas = [
+        {"b_id": c["id"], "b_hora_salida": c["hora_salida"], "b_valor_pagado": c["valor_pagado"]}
+        for c in cierres if c["id"] in activas
+    ]
+    if filas:
+        db.execute(
+            update(tabla)
+            .where(tabla.c.id == bindparam("b_id"), tabla.c.estado == "activo")
+            .values(estado="cerrado", hora_salida=bindparam("b_hora_salida"),
+                    valor_pagado=bindparam("b_valor_pagado")),
+            filas,
+        )
+    db.commit()
+    return activas
+
 def obtener_factura_por_registro(db: Session, registro_id: int):
     """Obtener factura por ID de registro"""
     return db.query(Factura).filter(Factura.registro_id == registro_id).first()
@@ -20,7 +20,7 @@ class Registro(Base):
     id = Column(Integer, primary_key=True, index=True)
     camara_id = Column(Integer, ForeignKey("camaras.id"))
     tipo_vehiculo = Column(String, default="car")
-    placa_final = Column(String, nullable=False)
+    placa_final = Column(String, nullable=False, index=True)
     confianza = Column(Float, default=0.0)
     hora_deteccion = Column(DateTime, default=datetime.utcnow)
     direccion = Column(String, default="indeterminado")
@@ -38,7 +38,7 @@ class Factura(Base):
     hora_entrada = Column(DateTime, nullable=False)
     hora_salida = Column(DateTime)
     valor_pagado = Column(Float, default=0.0)
-    estado = Column(String, default="activo")  # activo, cerrado
+    estado = Column(String, default="activo", index=True)  # activo, cerrado
     tarifa_por_hora = Column(Float, default=3000.0)
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
     
@@ -5,16 +5,111 @@ Permite probar:
 - Registro de cámaras
 - Conexión WebSocket
 - Visualización de stream procesado
+- Carga: cientos de visores simultáneos de una cámara de archivo de video,
+  incluidos lectores lentos, con FPS por cliente, huecos entre frames,
+  latencia desde la captura y la latencia de envío que mide el servidor
+
+Uso:
+    python test_client.py
+    python test_client.py carga --video /ruta/muestra.mp4 --clientes 200 --lentos 0.1 --duracion 30
+    (para pasar de 50 visores, levantar el servidor con MAX_LISTENERS_POR_CAMARA)
 """
 
+import argparse
 import asyncio
+import os
+import random
 import websockets
 import json
 import requests
-import base64
+import time
 import cv2
 import numpy as np
 from datetime import datetime
+from core.protocolo import desempaquetar, TIPO_JPEG
+
+class VisorCarga:
+    """
+    Un visor simulado del dashboard. Con lento_s > 0 tarda ese tiempo en
+    "procesar" cada mensaje, así que deja de leer el socket y el servidor
+    sufre la contrapresión (como un navegador lento o una red pobre)
+    """
+    def __init__(self, n, lento_s=0.0):
+        self.n = n
+        self.lento_s = lento_s
+        self.frames = 0
+        self.perdidos = 0
+        self.huecos = []        # s entre frames consecutivos
+        self.latencias = []     # s desde la captura en el servidor hasta la recepción
+        self.error = None
+        self._ultimo = None
+
+    async def correr(self, ws_url, handshake, estado):
+        try:
+            async with websockets.connect(ws_url, max_size=None, open_timeout=30) as websocket:
+                await websocket.send(json.dumps(handshake))
+                ultimo_seq = None
+                while not estado["fin"]:
+                    try:
+                        message = await asyncio.wait_for(websocket.recv(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        continue
+                    if isinstance(message, str):
+                        data = json.loads(message)
+                        if "error" in data:
+                            self.error = data["error"]
+                            return
+                        continue
+                    ahora = time.monotonic()
+                    trama = desempaquetar(message)
+                    if trama.tipo != TIPO_JPEG:
+                        continue
+                    estado["cam_id"] = trama.cam_id
+                    if estado["midiendo"]:
+                        self.frames += 1
+                        self.latencias.append(time.time() - trama.ts)
+                        if self._ultimo is not None:
+                            self.huecos.append(ahora - self._ultimo)
+                        if ultimo_seq is not None and trama.seq > ultimo_seq + 1:
+                            self.perdidos += trama.seq - ultimo_seq - 1
+                    self._ultimo = ahora
+                    ultimo_seq = trama.seq
+                    if self.lento_s:
+                        await asyncio.sleep(self.lento_s)
+        except websockets.exceptions.ConnectionClosed as e:
+            if not estado["fin"]:
+                self.error = f"conexión cerrada ({e.rcvd.code if e.rcvd else 'sin código'})"
+        except (OSError, asyncio.TimeoutError, websockets.exceptions.InvalidHandshake) as e:
+            self.error = f"{type(e).__name__}: {e}"
+
+
+def _percentiles_ms(segundos):
+    if not segundos:
+        return None
+    ms = np.asarray(segundos) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 1),
+        "p95": round(float(np.percentile(ms, 95)), 1),
+        "p99": round(float(np.percentile(ms, 99)), 1),
+        "max": round(float(ms.max()), 1),
+    }
+
+
+def _resumen_visores(visores, duracion):
+    """FPS por cliente, huecos entre frames y latencia de un grupo de visores"""
+    activos = [v for v in visores if v.error is None]
+    if not activos:
+        return None
+    fps = np.array([v.frames / duracion for v in activos])
+    return {
+        "clientes": len(activos),
+        "fps": {"media": round(float(fps.mean()), 2), "min": round(float(fps.min()), 2),
+                "p5": round(float(np.percentile(fps, 5)), 2)},
+        "huecos_ms": _percentiles_ms([h for v in activos for h in v.huecos]),
+        "latencia_ms": _percentiles_ms([lat for v in activos for lat in v.latencias]),
+        "perdidos": sum(v.perdidos for v in activos),
+    }
+
 
 class TestClient:
     def __init__(self, base_url="http://localhost:8000"):
@@ -22,26 +117,28 @@ class TestClient:
         self.ws_url = base_url.replace("http", "ws")
 
     def registrar_camara_test(self):
-        """Registra una cámara de prueba"""
+        """Registra una cámara de prueba y retorna su URL"""
         camara_data = {
             "nombre": "Cámara Test",
-            "url": "0"  # Webcam local
+            "url": "0",  # Webcam local
+            # Sin procesamiento 24/7: la webcam solo se abre mientras haya visores
+            "activa": False
         }
         
-        response = requests.post(f"{self.base_url}/camaras", json=camara_data)
+        response = requests.post(f"{self.base_url}/api/camaras", json=camara_data)
         if response.status_code == 200:
             camara = response.json()
-            print(f"✅ Cámara registrada: ID {camara['id']} - {camara['nombre']}")
-            return camara['id']
+            print(f"✅ Cámara registrada: ID {camara['camera_id']} - {camara_data['nombre']}")
+            return camara_data['url']
         else:
             print(f"❌ Error registrando cámara: {response.text}")
             return None
 
     def listar_camaras(self):
         """Lista todas las cámaras"""
-        response = requests.get(f"{self.base_url}/camaras")
+        response = requests.get(f"{self.base_url}/api/camaras")
         if response.status_code == 200:
-            camaras = response.json()
+            camaras = response.json()["camaras"]
             print(f"📹 Cámaras registradas: {len(camaras)}")
             for cam in camaras:
                 print(f"  - ID {cam['id']}: {cam['nombre']} ({cam['url']})")
@@ -50,18 +147,24 @@ class TestClient:
             print(f"❌ Error listando cámaras: {response.text}")
             return []
 
-    async def conectar_websocket(self, cam_id, duracion=30):
-        """Conecta al WebSocket de una cámara y muestra el stream"""
-        ws_url = f"{self.ws_url}/ws/camara/{cam_id}"
+    async def conectar_websocket(self, camera_url, duracion=30):
+        """
+        Conecta a /ws/camara-directa con el protocolo "trama" y muestra el
+        stream con la latencia desde la captura y los frames perdidos
+        """
+        ws_url = f"{self.ws_url}/ws/camara-directa"
         print(f"🔌 Conectando a WebSocket: {ws_url}")
         
         try:
-            async with websockets.connect(ws_url) as websocket:
-                print(f"✅ Conectado a cámara {cam_id}")
+            async with websockets.connect(ws_url, max_size=None) as websocket:
+                await websocket.send(json.dumps({"type": "camera_url", "url": camera_url, "protocolo": "trama"}))
+                print(f"✅ Conectado a cámara {camera_url}")
                 print("📺 Mostrando stream (presiona 'q' para salir)...")
                 
                 start_time = datetime.now()
                 frame_count = 0
+                perdidos = 0
+                ultimo_seq = None
                 
                 while True:
                     # Verificar tiempo límite
@@ -72,64 +175,118 @@ class TestClient:
                     try:
                         # Recibir mensaje
                         message = await asyncio.wait_for(websocket.recv(), timeout=5.0)
-                        
-                        if message.startswith("ERROR"):
-                            print(f"❌ Error del servidor: {message}")
+                    except asyncio.TimeoutError:
+                        print("⏰ Timeout esperando frame")
+                        continue
+                    
+                    if isinstance(message, str):
+                        data = json.loads(message)
+                        if "error" in data:
+                            print(f"❌ Error del servidor: {data['error']}")
                             break
+                        continue
+                    
+                    # Sobre binario: seq para detectar pérdidas, ts de captura para la latencia
+                    trama = desempaquetar(message)
+                    if ultimo_seq is not None and trama.seq > ultimo_seq + 1:
+                        perdidos += trama.seq - ultimo_seq - 1
+                    ultimo_seq = trama.seq
+                    latencia_ms = (time.time() - trama.ts) * 1000
+                    if trama.tipo != TIPO_JPEG:
+                        continue
+                    frame_count += 1
+                    
+                    frame = cv2.imdecode(np.frombuffer(trama.payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+                    if frame is not None:
+                        # Mostrar información de detección si existe
+                        for det in trama.detecciones or []:
+                            if det.get("placa"):
+                                print(f"🎯 Detección: {det['placa']} (conf: {det['conf']:.2f}, dir: {det['direccion']})")
                         
-                        # Parsear JSON
-                        try:
-                            data = json.loads(message)
-                            if data.get("type") == "frame":
-                                frame_count += 1
-                                
-                                # Decodificar frame
-                                frame_b64 = data.get("frame", "")
-                                if frame_b64:
-                                    frame_bytes = base64.b64decode(frame_b64)
-                                    frame_array = np.frombuffer(frame_bytes, dtype=np.uint8)
-                                    frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
-                                    
-                                    if frame is not None:
-                                        # Mostrar información de detección si existe
-                                        if "detection" in data:
-                                            det = data["detection"]
-                                            print(f"🎯 Detección: {det['placa']} (conf: {det['confianza']:.2f}, dir: {det['direccion']})")
-                                        
-                                        # Mostrar frame
-                                        cv2.imshow(f"Cámara {cam_id}", frame)
-                                        
-                                        # Salir con 'q'
-                                        if cv2.waitKey(1) & 0xFF == ord('q'):
-                                            print("👋 Saliendo...")
-                                            break
-                                
-                                # Mostrar estadísticas cada 30 frames
-                                if frame_count % 30 == 0:
-                                    elapsed = (datetime.now() - start_time).seconds
-                                    fps = frame_count / elapsed if elapsed > 0 else 0
-                                    print(f"📊 Frames: {frame_count}, FPS: {fps:.1f}")
+                        # Mostrar frame
+                        cv2.imshow(f"Cámara {trama.cam_id}", frame)
                         
-                        except json.JSONDecodeError:
-                            # Mensaje de texto simple (backward compatibility)
-                            frame_bytes = base64.b64decode(message)
-                            frame_array = np.frombuffer(frame_bytes, dtype=np.uint8)
-                            frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
-                            
-                            if frame is not None:
-                                cv2.imshow(f"Cámara {cam_id}", frame)
-                                if cv2.waitKey(1) & 0xFF == ord('q'):
-                                    break
+                        # Salir con 'q'
+                        if cv2.waitKey(1) & 0xFF == ord('q'):
+                            print("👋 Saliendo...")
+                            break
                     
-                    except asyncio.TimeoutError:
-                        print("⏰ Timeout esperando frame")
-                        continue
+                    # Mostrar estadísticas cada 30 frames
+                    if frame_count % 30 == 0:
+                        elapsed = (datetime.now() - start_time).seconds
+                        fps = frame_count / elapsed if elapsed > 0 else 0
+                        print(f"📊 Frames: {frame_count}, FPS: {fps:.1f}, latencia: {latencia_ms:.0f} ms, perdidos: {perdidos}")
                 
         except Exception as e:
             print(f"❌ Error en WebSocket: {e}")
         finally:
             cv2.destroyAllWindows()
 
+    async def prueba_carga(self, video, clientes=200, lentos=0.1, lento_ms=200, rampa=50,
+                           duracion=30, calentamiento=5, perfil=None):
+        """
+        Abre `clientes` conexiones a /ws/camara-directa contra la misma cámara
+        (un archivo de video del servidor), una fracción `lentos` de ellas
+        lectores lentos, y mide durante `duracion` s (tras `calentamiento` s).
+        La latencia de envío del lado del servidor sale de la instrumentación
+        de la cámara, que se reinicia al empezar la medición
+        """
+        ws_url = f"{self.ws_url}/ws/camara-directa"
+        handshake = {"type": "camera_url", "url": os.path.abspath(video) if os.path.exists(video) else video,
+                     "protocolo": "trama"}
+        if perfil:
+            handshake["perfil"] = perfil
+        n_lentos = round(clientes * lentos)
+        visores = [VisorCarga(i, lento_ms / 1000 if i < n_lentos else 0.0) for i in range(clientes)]
+        random.Random(0).shuffle(visores)  # los lentos repartidos a lo largo de la rampa
+        estado = {"fin": False, "midiendo": False, "cam_id": None}
+        
+        print(f"🚦 Abriendo {clientes} visores ({n_lentos} lentos, {lento_ms} ms/mensaje) a {rampa}/s")
+        tareas = []
+        for visor in visores:
+            tareas.append(asyncio.create_task(visor.correr(ws_url, handshake, estado)))
+            await asyncio.sleep(1.0 / rampa)
+        await asyncio.sleep(calentamiento)
+        
+        cam_id = estado["cam_id"]
+        if cam_id is not None:
+            await asyncio.to_thread(requests.put, f"{self.base_url}/api/admin/instrumentacion/{cam_id}", json={})
+        print(f"⏱️ Midiendo {duracion} s sobre la cámara {cam_id}...")
+        estado["midiendo"] = True
+        t0 = time.monotonic()
+        await asyncio.sleep(duracion)
+        estado["midiendo"] = False
+        total = time.monotonic() - t0
+        servidor = None
+        if cam_id is not None:
+            r = await asyncio.to_thread(requests.get, f"{self.base_url}/api/admin/instrumentacion")
+            servidor = r.json()["instrumentadas"].get(str(cam_id))
+            await asyncio.to_thread(requests.put, f"{self.base_url}/api/admin/instrumentacion/{cam_id}",
+                                    json={"activa": False})
+        estado["fin"] = True
+        await asyncio.gather(*tareas, return_exceptions=True)
+        
+        errores = {}
+        for visor in visores:
+            if visor.error is not None:
+                errores[visor.error] = errores.get(visor.error, 0) + 1
+        return {
+            "cam_id": cam_id,
+            "clientes": clientes,
+            "duracion_s": round(total, 2),
+            "normales": _resumen_visores([v for v in visores if not v.lento_s], total),
+            "lentos": _resumen_visores([v for v in visores if v.lento_s], total),
+            "fallidos": sum(errores.values()),
+            "errores": errores,
+            "servidor": None if servidor is None else {
+                "fps_captura": round(servidor["contadores"]["frames"] / total, 2),
+                "envio": servidor["etapas"].get("envio"),
+                "codificacion": servidor["etapas"].get("codificacion"),
+                "envios_fallidos": servidor["contadores"]["envios_fallidos"],
+                "descartados_viejos": servidor["contadores"]["descartados_viejos"],
+            },
+        }
+
     def test_facturacion(self):
         """Prueba funcionalidad de facturación"""
         print("\n💰 Probando funcionalidad de facturación...")
@@ -215,38 +372,86 @@ class TestClient:
         
         # 2. Registrar nueva cámara
         print("\n2️⃣ Registrando nueva cámara:")
-        cam_id = self.registrar_camara_test()
+        camera_url = self.registrar_camara_test()
         
         # 3. Probar facturación
         self.test_facturacion()
         
-        if cam_id:
+        if camera_url:
             # 4. Listar cámaras actualizadas
             print("\n4️⃣ Listando cámaras actualizadas:")
             self.listar_camaras()
             
-            return cam_id
+            return camera_url
         
         return None
 
-async def main():
+def imprimir_reporte_carga(reporte):
+    """Resumen legible de prueba_carga()"""
+    print(f"\n📊 Carga: {reporte['clientes']} visores, {reporte['duracion_s']} s, cámara {reporte['cam_id']}")
+    for grupo in ("normales", "lentos"):
+        r = reporte[grupo]
+        if r is None:
+            continue
+        huecos, lat = r["huecos_ms"] or {}, r["latencia_ms"] or {}
+        print(f"  {grupo:>8}: {r['clientes']} clientes | FPS media {r['fps']['media']} (min {r['fps']['min']}, "
+              f"p5 {r['fps']['p5']}) | huecos p50/p99/max {huecos.get('p50')}/{huecos.get('p99')}/{huecos.get('max')} ms | "
+              f"latencia p50/p99 {lat.get('p50')}/{lat.get('p99')} ms | perdidos {r['perdidos']}")
+    if reporte["fallidos"]:
+        print(f"  ❌ {reporte['fallidos']} visores fallidos:")
+        for error, n in reporte["errores"].items():
+            print(f"     {n} x {error}")
+    servidor = reporte["servidor"]
+    if servidor:
+        envio = servidor["envio"] or {}
+        print(f"  🖥️ servidor: captura {servidor['fps_captura']} fps | envío p50/p95/p99/max "
+              f"{envio.get('p50_ms')}/{envio.get('p95_ms')}/{envio.get('p99_ms')}/{envio.get('max_ms')} ms "
+              f"({envio.get('n', 0)} envíos) | fallidos {servidor['envios_fallidos']} | "
+              f"descartados por viejos {servidor['descartados_viejos']}")
+
+async def main(base_url="http://localhost:8000"):
     """Función principal de prueba"""
-    client = TestClient()
+    client = TestClient(base_url)
     
     # Probar API REST
-    cam_id = client.test_api_completa()
+    camera_url = client.test_api_completa()
     
-    if cam_id:
+    if camera_url:
         # Probar WebSocket
-        await client.conectar_websocket(cam_id, duracion=60)
+        await client.conectar_websocket(camera_url, duracion=60)
     else:
         print("❌ No se pudo probar WebSocket sin cámara registrada")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cliente de prueba y generador de carga del backend")
+    parser.add_argument("--servidor", default="http://localhost:8000")
+    comandos = parser.add_subparsers(dest="comando")
+    carga = comandos.add_parser("carga", help="Muchos visores simultáneos de una cámara de archivo")
+    carga.add_argument("--video", required=True, help="Archivo de video accesible para el servidor")
+    carga.add_argument("--clientes", type=int, default=200)
+    carga.add_argument("--lentos", type=float, default=0.1, help="Fracción de lectores lentos")
+    carga.add_argument("--lento-ms", type=float, default=200, help="Demora por mensaje de un lector lento")
+    carga.add_argument("--rampa", type=float, default=50, help="Conexiones nuevas por segundo")
+    carga.add_argument("--duracion", type=float, default=30)
+    carga.add_argument("--calentamiento", type=float, default=5)
+    carga.add_argument("--perfil", choices=("alto", "medio", "bajo"))
+    carga.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+    
     print("🚀 Cliente de prueba para Backend FastAPI")
-    print("📋 Asegúrate de que el servidor esté ejecutándose en http://localhost:8000")
+    print(f"📋 Asegúrate de que el servidor esté ejecutándose en {args.servidor}")
     
     try:
-        asyncio.run(main())
+        if args.comando == "carga":
+            reporte = asyncio.run(TestClient(args.servidor).prueba_carga(
+                args.video, args.clientes, args.lentos, args.lento_ms, args.rampa,
+                args.duracion, args.calentamiento, args.perfil,
+            ))
+            if args.json:
+                print(json.dumps(reporte, indent=2))
+            else:
+                imprimir_reporte_carga(reporte)
+        else:
+            asyncio.run(main(args.servidor))
     except KeyboardInterrupt:
         print("\n👋 Prueba interrumpida por el usuario")
\ No newline at end of file
@@ -0,0 +1,20 @@
+"""
+Configuración común de las pruebas del backend
+
+Los módulos del backend se importan sin prefijo de paquete (como los corre
+uvicorn desde api/; los del pipeline, como los importa main.py desde
+detección_yolo/), y database.py crea carpetas relativas al cwd al
+importarse: las pruebas corren en un directorio temporal.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'detección_yolo'))
+
+
+@pytest.fixture(autouse=True)
+def _cwd_temporal(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
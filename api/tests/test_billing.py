@@ -0,0 +1,64 @@
+"""Pruebas del cierre de facturas por lotes (core/billing.py + crud)"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+@pytest.fixture
+def Session():
+    from database import Base
+    import models  # noqa: F401  (registra las tablas)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def _entrada(Session, matcher, placa):
+    from models import Registro, Factura
+    db = Session()
+    registro = Registro(camara_id=1, placa_final=placa)
+    db.add(registro)
+    db.flush()
+    factura = Factura(registro_id=registro.id, hora_entrada=datetime.utcnow() - timedelta(minutes=30))
+    db.add(factura)
+    db.commit()
+    matcher.registrar_entrada(placa, factura.id, factura.hora_entrada)
+    factura_id = factura.id
+    db.close()
+    return factura_id
+
+
+def test_no_recierra_factura_cerrada_a_mano(Session):
+    import crud
+    from core.billing import ExitMatcher
+    from models import Factura
+    matcher = ExitMatcher(Session)
+    manual = _entrada(Session, matcher, "AAA111")
+    automatica = _entrada(Session, matcher, "BBB222")
+
+    matcher.encolar_salida("AAA111")
+    matcher.encolar_salida("BBB222")
+    # Salida manual mientras la automática espera en el lote
+    db = Session()
+    crud.cerrar_factura(db, manual, valor_pagado=1234.0)
+    db.close()
+
+    cierres = matcher.procesar_lote()
+    assert [c["id"] for c in cierres] == [automatica]
+    db = Session()
+    assert db.get(Factura, manual).valor_pagado == 1234.0
+    assert db.get(Factura, automatica).estado == "cerrado"
+    db.close()
+
+
+def test_vaciar_procesa_todos_los_lotes(Session):
+    from core.billing import ExitMatcher
+    matcher = ExitMatcher(Session, tamano_lote=2)
+    for i in range(5):
+        _entrada(Session, matcher, f"CCC{i:03d}")
+        matcher.encolar_salida(f"CCC{i:03d}")
+    assert matcher.vaciar() == 5
+    assert not matcher.pendientes
@@ -0,0 +1,50 @@
+"""Pruebas de los histogramas de la instrumentación (core/instrumentation.py)"""
+import numpy as np
+import pytest
+
+from core.instrumentation import Histograma
+
+
+def _histograma(valores):
+    h = Histograma()
+    for v in valores:
+        h.observar(float(v))
+    return h
+
+
+def test_percentiles_submilisegundo_no_colapsan_al_maximo():
+    # 1000 tiempos uniformes entre 0.1 y 0.9 ms: todos en la primera cubeta (<= 1 ms)
+    valores = np.linspace(0.0001, 0.0009, 1000)
+    h = _histograma(valores)
+    p50, p95, p99 = h.percentil(50), h.percentil(95), h.percentil(99)
+    assert p50 < p95 < p99 < h.maximo
+    assert p50 == pytest.approx(np.percentile(valores, 50), rel=0.05)
+    assert p95 == pytest.approx(np.percentile(valores, 95), rel=0.05)
+
+
+def test_percentil_interpola_entre_cubetas():
+    # mitad en (1, 2.5] ms y mitad en (5, 10] ms
+    valores = [0.002] * 50 + [0.008] * 50
+    h = _histograma(valores)
+    assert 0.002 <= h.percentil(25) <= 0.0025
+    assert 0.005 <= h.percentil(75) <= 0.008
+    assert h.percentil(25) < h.percentil(50) < h.percentil(75)
+    assert h.percentil(100) == pytest.approx(0.008)
+
+
+def test_percentil_acotado_por_minimo_y_maximo():
+    h = _histograma([0.003] * 10)
+    for p in (0, 50, 99, 100):
+        assert h.percentil(p) == pytest.approx(0.003)
+
+
+def test_percentil_en_cubeta_de_desbordamiento():
+    h = _histograma([3.0, 4.0, 5.0, 6.0])
+    assert 3.0 <= h.percentil(50) <= 6.0
+    assert h.percentil(100) == pytest.approx(6.0)
+
+
+def test_histograma_vacio():
+    h = Histograma()
+    assert h.percentil(50) is None
+    assert h.a_dict()["p50_ms"] is None
@@ -0,0 +1,44 @@
+"""Pruebas del historial de movimiento y las líneas virtuales (detección_yolo/movimiento.py)"""
+import numpy as np
+import pytest
+
+from movimiento import HistorialMovimiento, LineaVirtual
+
+
+def test_historial_orden_cronologico_tras_dar_la_vuelta():
+    h = HistorialMovimiento(capacidad=4)
+    for t in range(6):
+        h.agregar(t, 10.0 * t, 0.5, 0.5)
+    assert len(h) == 4
+    assert h.muestras()[:, 0].tolist() == [2, 3, 4, 5]
+
+
+def test_desplazamiento_ajuste_lineal():
+    h = HistorialMovimiento()
+    for t in np.linspace(0.0, 2.0, 11):
+        h.agregar(t, 100.0 + 50.0 * t, 0.8 - 0.1 * t, 0.5)
+    dy, darea = h.desplazamiento()
+    assert dy == pytest.approx(-0.2)
+    assert darea == pytest.approx(100.0)
+
+
+def test_desplazamiento_sin_variacion_de_tiempo():
+    h = HistorialMovimiento()
+    h.agregar(1.0, 10.0, 0.5, 0.5)
+    assert h.desplazamiento() == (0.0, 0.0)
+
+
+def test_linea_lados_y_fuera_del_segmento():
+    linea = LineaVirtual(0.2, 0.5, 0.8, 0.5)
+    assert linea.lado(0.5, 0.7) == 1
+    assert linea.lado(0.5, 0.3) == -1
+    assert linea.lado(0.9, 0.7) == 0     # fuera de los extremos del segmento
+
+
+def test_linea_cruce_segun_sentido():
+    linea = LineaVirtual(0.0, 0.6, 1.0, 0.6, sentido_entrada=-1)
+    abajo, arriba = linea.lado(0.5, 0.9), linea.lado(0.5, 0.3)
+    assert linea.cruce(abajo, arriba) == "entrada"
+    assert linea.cruce(arriba, abajo) == "salida"
+    assert linea.cruce(abajo, abajo) is None
+    assert linea.cruce(0, arriba) is None
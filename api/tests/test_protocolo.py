@@ -0,0 +1,66 @@
+"""Pruebas del sobre binario de frames (core/protocolo.py)"""
+import pytest
+
+from core.protocolo import (empaquetar, desempaquetar, protocolo_desde_config, CABECERA, TIPO_JPEG,
+                            TIPO_DETECCIONES)
+
+
+DETECCIONES = [{"track_id": 3, "bbox": [1, 2, 30, 40], "tipo": "car", "placa": "ABC123", "conf": 0.9,
+                "direccion": None}]
+
+
+def test_ida_y_vuelta_con_detecciones():
+    data = empaquetar(b"\xff\xd8jpeg", 7, 1700000000.25, "cámara_1", TIPO_JPEG, DETECCIONES)
+    trama = desempaquetar(data)
+    assert (trama.seq, trama.ts, trama.cam_id, trama.tipo) == (7, 1700000000.25, "cámara_1", TIPO_JPEG)
+    assert trama.detecciones == DETECCIONES
+    assert bytes(trama.payload) == b"\xff\xd8jpeg"
+
+
+def test_ida_y_vuelta_sin_detecciones_ni_payload():
+    trama = desempaquetar(empaquetar(b"", 2 ** 32 + 5, 0.0, 12, TIPO_DETECCIONES))
+    assert trama.seq == 5           # seq es uint32
+    assert trama.cam_id == "12"
+    assert trama.detecciones is None
+    assert bytes(trama.payload) == b""
+
+
+def test_acepta_memoryview():
+    data = empaquetar(memoryview(b"xyz"), 1, 1.0, "c")
+    assert bytes(desempaquetar(memoryview(data)).payload) == b"xyz"
+
+
+@pytest.mark.parametrize("corte", range(1, 40))
+def test_truncado_es_value_error(corte):
+    data = empaquetar(b"", 1, 1.0, "cam", TIPO_JPEG, DETECCIONES)
+    if corte >= len(data):
+        pytest.skip("corte fuera del mensaje")
+    truncado = data[:len(data) - corte]
+    # Sin payload, cualquier corte deja la cabecera, el cam_id o las detecciones incompletos
+    with pytest.raises(ValueError):
+        desempaquetar(truncado)
+
+
+def test_bandera_de_detecciones_sin_largo():
+    # Sobre de 20+ bytes con FLAG_DETECCIONES pero sin los 4 bytes del largo
+    data = empaquetar(b"", 1, 1.0, "c", TIPO_JPEG, [])
+    with pytest.raises(ValueError):
+        desempaquetar(data[:CABECERA.size + 1 + 2])
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"XX" + bytes(30),
+    empaquetar(b"", 1, 1.0, "c")[:2] + bytes([9]) + empaquetar(b"", 1, 1.0, "c")[3:],   # versión
+    empaquetar(b"", 1, 1.0, "c")[:3] + bytes([99]) + empaquetar(b"", 1, 1.0, "c")[4:],  # tipo
+])
+def test_cabecera_invalida(data):
+    with pytest.raises(ValueError):
+        desempaquetar(data)
+
+
+def test_protocolo_desde_config():
+    assert protocolo_desde_config({}) == "jpeg"
+    assert protocolo_desde_config({"protocolo": "trama"}) == "trama"
+    with pytest.raises(ValueError):
+        protocolo_desde_config({"protocolo": "otro"})
@@ -0,0 +1,31 @@
+"""Pruebas del registro de lecturas OCR crudas (detección_yolo/registro_ocr.py)"""
+import sqlite3
+
+from registro_ocr import RegistroOCR, crear_tabla
+
+
+def test_lecturas_guardan_la_camara(tmp_path):
+    db = str(tmp_path / "estacionamiento.db")
+    registro = RegistroOCR(db, intervalo=0.05).iniciar()
+    # Mismo id de SORT en dos cámaras (cada una tiene su tracker)
+    registro.append(1, "ABC123", 0.9, 10, camara_id=4)
+    registro.append(1, "XYZ789", 0.8, 11, camara_id="local_ab12")
+    registro.append(2, "QWE456", 0.7, 12)
+    registro.detener()
+
+    with sqlite3.connect(db) as conn:
+        filas = conn.execute("SELECT camara_id, id_sort, placa_raw FROM detecciones_raw ORDER BY id").fetchall()
+    assert filas == [("4", 1, "ABC123"), ("local_ab12", 1, "XYZ789"), (None, 2, "QWE456")]
+
+
+def test_tabla_anterior_recibe_la_columna(tmp_path):
+    db = str(tmp_path / "estacionamiento.db")
+    with sqlite3.connect(db) as conn:
+        conn.execute("CREATE TABLE detecciones_raw (id INTEGER PRIMARY KEY AUTOINCREMENT, id_sort INTEGER, "
+                     "placa_raw TEXT, score REAL, frame_number INTEGER, timestamp TEXT)")
+        conn.execute("INSERT INTO detecciones_raw (id_sort, placa_raw) VALUES (1, 'OLD111')")
+        crear_tabla(conn)
+        crear_tabla(conn)  # idempotente
+        columnas = [c[1] for c in conn.execute("PRAGMA table_info(detecciones_raw)")]
+        assert columnas.count("camara_id") == 1
+        assert conn.execute("SELECT placa_raw, camara_id FROM detecciones_raw").fetchall() == [("OLD111", None)]
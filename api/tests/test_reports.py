@@ -0,0 +1,100 @@
+"""Pruebas del motor de reportes de ingresos (core/reports.py)"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.reports import AGRUPACIONES
+
+
+@pytest.fixture
+def reports():
+    from core import reports
+    return reports
+
+
+@pytest.fixture
+def motor():
+    """ReportEngine sobre una base SQLite en memoria con las tablas del modelo"""
+    from core.reports import ReportEngine
+    from database import Base
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    return ReportEngine(Session), Session
+
+
+def _cerradas():
+    entrada = pd.to_datetime(["2024-01-31 22:10", "2024-02-01 08:00", "2024-02-15 10:30"])
+    return pd.DataFrame({
+        "hora_entrada": entrada,
+        "hora_salida": entrada + pd.to_timedelta([90, 30, 200], unit="min"),
+        "tarifa_por_hora": [3000.0, 3000.0, 2000.0],
+        "valor_pagado": [6000.0, 3000.0, 8000.0],
+        "camara_id": [1, 2, 1],
+        "tipo_vehiculo": ["car", "motorcycle", "car"],
+    })
+
+
+def test_calcular_valores_minimo_una_hora_y_redondeo(reports):
+    entrada = pd.to_datetime(["2024-01-01 10:00", "2024-01-01 10:00"]).to_numpy()
+    salida = pd.to_datetime(["2024-01-01 10:20", "2024-01-01 12:01"]).to_numpy()
+    valores, horas = reports.calcular_valores_vectorizado(entrada, salida, [3000.0, 3000.0])
+    assert list(horas) == [1.0, 3.0]
+    assert list(valores) == [3000.0, 9000.0]
+
+
+@pytest.mark.parametrize("agrupacion", sorted(AGRUPACIONES))
+def test_todas_las_agrupaciones(reports, agrupacion):
+    reporte = reports.ReportEngine(None)._construir(_cerradas(), agrupacion)
+    assert sum(g["facturas"] for g in reporte["grupos"]) == 3
+    assert reporte["totales"]["ingresos"] == 17000.0
+    assert reporte["totales"]["ingresos_calculados"] == 6000.0 + 3000.0 + 8000.0
+
+
+def test_agrupacion_mensual(reports):
+    grupos = reports.ReportEngine(None)._construir(_cerradas(), "mes")["grupos"]
+    assert [(g["grupo"], g["facturas"]) for g in grupos] == [
+        ("2024-01-01T00:00:00", 1), ("2024-02-01T00:00:00", 2)
+    ]
+
+
+def test_sin_facturas_cerradas(reports):
+    reporte = reports.ReportEngine(None)._construir(_cerradas().iloc[:0], "dia")
+    assert reporte["grupos"] == [] and reporte["totales"]["facturas_cerradas"] == 0
+
+
+def test_agrupacion_invalida(motor):
+    with pytest.raises(ValueError):
+        motor[0].reporte_ingresos("semana")
+
+
+def test_pendientes_no_quedan_cacheados(motor):
+    from models import Registro, Factura
+    engine, Session = motor
+
+    def nueva_factura(placa, estado):
+        db = Session()
+        registro = Registro(camara_id=1, placa_final=placa)
+        db.add(registro)
+        db.flush()
+        ahora = datetime.utcnow()
+        db.add(Factura(registro_id=registro.id, hora_entrada=ahora - timedelta(minutes=90), estado=estado,
+                       hora_salida=ahora if estado == "cerrado" else None, valor_pagado=6000.0))
+        db.commit()
+        db.close()
+
+    nueva_factura("AAA111", "cerrado")
+    antes = engine.reporte_ingresos("dia")
+    assert antes["totales"]["facturas_activas"] == 0
+
+    # Una entrada nueva (sin cerrar ninguna factura) debe verse en lo pendiente
+    nueva_factura("BBB222", "activo")
+    despues = engine.reporte_ingresos("dia")
+    assert despues["totales"]["facturas_cerradas"] == 1
+    assert despues["totales"]["facturas_activas"] == 1
+    assert despues["totales"]["por_cobrar"] == 6000.0
+    assert despues["grupos"] == antes["grupos"]
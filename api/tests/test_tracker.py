@@ -0,0 +1,67 @@
+"""Pruebas del tracker SORT vectorizado (detección_yolo/tracker.py)"""
+import numpy as np
+
+from tracker import SortVectorizado, TrackerVehiculos, asociar, iou_batch
+
+
+def _caja(x, y, w=40, h=30, score=0.9):
+    return [x, y, x + w, y + h, score]
+
+
+def test_iou_batch():
+    a = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=float)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10]], dtype=float)
+    iou = iou_batch(a, b)
+    assert iou.shape == (2, 2)
+    assert iou[0, 0] == 1.0
+    assert np.isclose(iou[0, 1], 50 / 150)
+    assert iou[1, 0] == 0.0
+
+
+def test_asociar_sin_solapamiento():
+    dets = np.array([_caja(0, 0)], dtype=float)
+    predichas = np.array([_caja(500, 500)], dtype=float)
+    matches, libres_d, libres_t = asociar(dets, predichas)
+    assert len(matches) == 0
+    assert list(libres_d) == [0] and list(libres_t) == [0]
+
+
+def test_ids_estables_con_movimiento_suave():
+    sort = SortVectorizado(max_age=1, min_hits=3)
+    ids = []
+    for i in range(10):
+        salida = sort.update(np.array([_caja(10 + 3 * i, 10), _caja(300, 200 + 2 * i)]))
+        ids.append(sorted(salida[:, 4].astype(int).tolist()))
+    assert ids[-1] == [1, 2]
+    assert all(f == [1, 2] for f in ids)
+
+
+def test_track_vencido_se_elimina():
+    sort = SortVectorizado(max_age=1, min_hits=1)
+    sort.update(np.array([_caja(10, 10)]))
+    assert len(sort) == 1
+    sort.update(np.empty((0, 5)))
+    sort.update(np.empty((0, 5)))
+    assert len(sort) == 0
+    # Una detección nueva recibe un id nuevo (visible desde su segundo frame)
+    sort.update(np.array([_caja(10, 10)]))
+    salida = sort.update(np.array([_caja(12, 10)]))
+    assert salida[:, 4].astype(int).tolist() == [2]
+
+
+def test_tracker_vehiculos_filtra_clases():
+    tracker = TrackerVehiculos()
+    data = np.array([
+        [10, 10, 50, 40, 0.9, 2],      # car
+        [100, 100, 140, 130, 0.9, 0],  # person: se descarta
+        [200, 10, 260, 60, 0.8, 7],    # truck
+    ], dtype=np.float32)
+    tracks, clases = tracker.update(data)
+    assert len(tracks) == 2
+    assert sorted(clases.tolist()) == [2, 7]
+
+
+def test_tracker_vehiculos_sin_detecciones():
+    tracks, clases = TrackerVehiculos().update(np.empty((0, 6)))
+    assert tracks.shape == (0, 5)
+    assert len(clases) == 0
@@ -0,0 +1,101 @@
+"""
+Micro-benchmark de codificación/decodificación JPEG por resolución
+
+Mide, para cada backend disponible en api/core/codec.py (opencv y, si están
+instalados, simplejpeg / turbojpeg), el costo de codificar un frame y de
+decodificarlo a tamaño completo y reducido (1/2, 1/4). Usa un frame de un
+video si se pasa --video; si no, una imagen sintética con bordes y ruido.
+
+Uso:
+    python benchmarks/bench_codec.py
+    python benchmarks/bench_codec.py --resoluciones 640x480 1920x1080 --calidad 70 --json
+    python benchmarks/bench_codec.py --video muestra.mp4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'api'))
+from core.codec import BACKENDS  # noqa: E402
+
+
+def frame_sintetico(ancho, alto, seed=0):
+    """Degradado con rectángulos y ruido: comprime parecido a una escena real."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, ancho, dtype=np.float32)
+    y = np.linspace(0, 255, alto, dtype=np.float32)[:, None]
+    base = np.stack([np.broadcast_to(x, (alto, ancho)), np.broadcast_to(y, (alto, ancho)),
+                     np.broadcast_to((x + y) / 2, (alto, ancho))], axis=2)
+    frame = np.ascontiguousarray(base.astype(np.uint8))
+    for _ in range(20):
+        x1, y1 = rng.integers(0, ancho), rng.integers(0, alto)
+        cv2.rectangle(frame, (int(x1), int(y1)), (int(x1) + ancho // 8, int(y1) + alto // 10),
+                      tuple(int(c) for c in rng.integers(0, 255, 3)), -1)
+    ruido = rng.normal(0, 6, frame.shape)
+    return np.clip(frame + ruido, 0, 255).astype(np.uint8)
+
+
+def frame_de_video(path, ancho, alto):
+    cap = cv2.VideoCapture(path)
+    ok, frame = cap.read()
+    cap.release()
+    if not ok:
+        raise SystemExit(f"No se pudo leer un frame de {path}")
+    return cv2.resize(frame, (ancho, alto), interpolation=cv2.INTER_AREA)
+
+
+def medir_ms(fn, repeticiones):
+    fn()  # calentamiento
+    tiempos = np.empty(repeticiones)
+    for i in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos[i] = time.perf_counter() - t0
+    ms = tiempos * 1e3
+    return {"media_ms": round(float(ms.mean()), 3), "p95_ms": round(float(np.percentile(ms, 95)), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo de codificar/decodificar JPEG por resolución")
+    parser.add_argument("--resoluciones", nargs="+", default=["640x360", "1280x720", "1920x1080"])
+    parser.add_argument("--calidad", type=int, default=70)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    parser.add_argument("--video", help="Tomar el frame de este video en vez de uno sintético")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+
+    resultados = []
+    for res in args.resoluciones:
+        ancho, alto = (int(v) for v in res.lower().split("x"))
+        frame = frame_de_video(args.video, ancho, alto) if args.video else frame_sintetico(ancho, alto)
+        for backend, (codificar, decodificar) in BACKENDS.items():
+            jpeg = codificar(frame, args.calidad)
+            fila = {
+                "resolucion": res,
+                "backend": backend,
+                "bytes": len(jpeg),
+                "codificar": medir_ms(lambda: codificar(frame, args.calidad), args.repeticiones),
+            }
+            for reduccion in (1, 2, 4):
+                fila[f"decodificar_1/{reduccion}"] = medir_ms(lambda: decodificar(jpeg, reduccion), args.repeticiones)
+            resultados.append(fila)
+
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+
+    for fila in resultados:
+        dec = " | ".join(
+            f"dec {k.split('_')[1]}: {v['media_ms']:>6.2f} ms" for k, v in fila.items() if k.startswith("decodificar")
+        )
+        print(f"{fila['resolucion']:>10} {fila['backend']:>10} | {fila['bytes'] / 1024:>7.1f} KB | "
+              f"enc: {fila['codificar']['media_ms']:>6.2f} ms | {dec}")
+
+
+if __name__ == "__main__":
+    main()
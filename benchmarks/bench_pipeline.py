@@ -0,0 +1,396 @@
+"""
+Benchmark de extremo a extremo del pipeline con videos grabados
+
+Dos modos (o ambos con "todo"):
+
+- detector: reproduce el video por detectar_frame (YOLO + tracker + placas +
+  OCR) en este proceso, con cwd en un directorio temporal, y mide FPS,
+  latencia por frame (p50/p95/p99), el desglose inferencia/placas/OCR que
+  reporta el pipeline, CPU y RSS.
+- extremo: levanta el backend (uvicorn) en un subproceso, con su base de datos
+  en un directorio temporal, y simula N cámaras (enlaces al mismo video) con M
+  listeners WebSocket cada una por /ws/camara-directa con el protocolo
+  "trama". Mide FPS recibidos por listener, latencia captura -> recepción
+  (p50/p95/p99), frames perdidos, CPU y RSS del servidor y las etapas que
+  reporta /api/admin/instrumentacion. Con --camaras/--listeners de varios
+  valores se corre la grilla completa (un servidor nuevo por combinación).
+
+Los videos se leen tan rápido como da el pipeline (sin --tiempo-real) para
+medir el techo de throughput. En ambos modos la base de datos y las
+evidencias quedan en el directorio temporal (los pesos *.pt del directorio
+actual se enlazan ahí) y no se suben imágenes a Drive (SUBIR_A_DRIVE=0). La salida --json incluye commit y máquina para
+comparar corridas entre commits en la misma máquina (CPU).
+
+Uso:
+    python benchmarks/bench_pipeline.py detector --video muestra.mp4 --frames 300
+    python benchmarks/bench_pipeline.py extremo --video muestra.mp4 --camaras 1 4 --listeners 1 10 --json
+    python benchmarks/bench_pipeline.py todo --video muestra.mp4 --salida resultados.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import cv2
+import numpy as np
+import websockets
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+API = os.path.join(RAIZ, 'api')
+sys.path.append(API)
+from core.metrics import memoria_proceso  # noqa: E402
+from core.protocolo import desempaquetar, TIPO_JPEG  # noqa: E402
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+TIMEOUT_ARRANQUE_S = 60.0
+MUESTREO_RSS_S = 0.5
+MODELOS = ("yolo11n.pt", "license_plate_detector.pt")  # rutas relativas en detección_yolo/main.py
+
+
+def percentiles_ms(segundos):
+    if not len(segundos):
+        return None
+    ms = np.asarray(segundos) * 1e3
+    return {
+        "media": round(float(ms.mean()), 3),
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p95": round(float(np.percentile(ms, 95)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3),
+        "max": round(float(ms.max()), 3),
+    }
+
+
+def resumen(valores):
+    if not valores:
+        return None
+    return {"media": round(float(np.mean(valores)), 2), "min": round(float(np.min(valores)), 2),
+            "max": round(float(np.max(valores)), 2)}
+
+
+def contexto():
+    """Commit y máquina de la corrida (para comparar entre commits)."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "maquina": platform.machine(),
+        "procesador": platform.processor() or None,
+        "cpus": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def directorio_aislado():
+    """
+    Directorio temporal para la DB y las evidencias del pipeline, con enlaces
+    a los pesos de los modelos que haya en el directorio actual.
+    """
+    directorio = tempfile.mkdtemp(prefix="bench_pipeline_")
+    for modelo in MODELOS:
+        if os.path.exists(modelo):
+            os.symlink(os.path.abspath(modelo), os.path.join(directorio, modelo))
+    return directorio
+
+
+# ==================== MODO DETECTOR ====================
+
+def bench_detector(args):
+    directorio = directorio_aislado()
+    anterior = os.getcwd()
+    video = os.path.abspath(args.video)
+    os.environ["SUBIR_A_DRIVE"] = "0"
+    os.chdir(directorio)
+    try:
+        return _bench_detector(args, video)
+    finally:
+        os.chdir(anterior)
+        if not args.conservar:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+def _bench_detector(args, video):
+    # main.py crea su DB y carpeta de evidencias al importarse: ya en el directorio temporal
+    from core import detection
+    if detection.pipeline is None:
+        return {"modo": "detector", "error": "pipeline de detección no disponible (ver detección_yolo/main.py)"}
+
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise SystemExit(f"No se pudo abrir {args.video}")
+
+    def leer():
+        ok, frame = cap.read()
+        if not ok:  # al terminar el video se vuelve a empezar
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = cap.read()
+        return frame if ok else None
+
+    for n in range(args.calentamiento):
+        detection.pipeline.detectar_frame(leer(), n, "bench", False)
+
+    tiempos, etapas, resolucion = [], {"inferencia": [], "placas": [], "ocr": []}, None
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    for n in range(args.frames):
+        frame = leer()
+        if frame is None:
+            break
+        resolucion = f"{frame.shape[1]}x{frame.shape[0]}"
+        inicio = time.perf_counter()
+        detection.pipeline.detectar_frame(frame, args.calentamiento + n, "bench", False)
+        tiempos.append(time.perf_counter() - inicio)
+        for etapa, segundos in detection.tiempos_etapas("bench").items():
+            if etapa in etapas and segundos:
+                etapas[etapa].append(segundos)
+    total, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    cap.release()
+
+    return {
+        "modo": "detector",
+        "frames": len(tiempos),
+        "resolucion": resolucion,
+        "fps": round(len(tiempos) / total, 2) if total else None,
+        "latencia_ms": percentiles_ms(tiempos),
+        "etapas_ms": {etapa: percentiles_ms(valores) for etapa, valores in etapas.items() if valores},
+        "ocr": detection.contadores_ocr(),
+        "cpu_pct": round(100 * cpu / total, 1) if total else None,
+        "rss_mb": round(memoria_proceso() / 2 ** 20, 1),
+    }
+
+
+# ==================== MODO EXTREMO A EXTREMO ====================
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def uso_proceso(pid):
+    """(segundos de CPU, RSS en bytes) de otro proceso: psutil o /proc."""
+    if psutil is not None:
+        p = psutil.Process(pid)
+        t = p.cpu_times()
+        return t.user + t.system, p.memory_info().rss
+    with open(f"/proc/{pid}/stat") as f:
+        campos = f.read().rsplit(")", 1)[1].split()
+    with open(f"/proc/{pid}/statm") as f:
+        rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    return (int(campos[11]) + int(campos[12])) / os.sysconf("SC_CLK_TCK"), rss
+
+
+def http_json(url, metodo="GET", cuerpo=None):
+    datos = None if cuerpo is None else json.dumps(cuerpo).encode()
+    req = urllib.request.Request(url, data=datos, method=metodo, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=10) as r:
+        return json.loads(r.read() or b"null")
+
+
+class Servidor:
+    """Backend en un subproceso con cwd en un directorio temporal (DB y evidencias aisladas)."""
+
+    def __init__(self, directorio, puerto):
+        self.base = f"http://127.0.0.1:{puerto}"
+        self.log = open(os.path.join(directorio, "servidor.log"), "wb")
+        env = dict(os.environ, SUBIR_A_DRIVE="0",
+                   PYTHONPATH=os.pathsep.join(filter(None, [API, os.environ.get("PYTHONPATH")])))
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(puerto),
+             "--log-level", "warning"],
+            cwd=directorio, env=env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        limite = time.monotonic() + TIMEOUT_ARRANQUE_S
+        while True:
+            if self.proc.poll() is not None:
+                raise SystemExit(f"El servidor terminó al arrancar (ver {self.log.name})")
+            try:
+                urllib.request.urlopen(f"{self.base}/metrics", timeout=2).close()
+                return
+            except OSError:
+                if time.monotonic() > limite:
+                    self.cerrar()
+                    raise SystemExit(f"El servidor no respondió en {TIMEOUT_ARRANQUE_S:.0f} s")
+                time.sleep(0.2)
+
+    def cerrar(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.log.close()
+
+
+async def listener(ws_url, camara, args, estado, stats):
+    """Un visor con protocolo "trama": registra latencia, frames y pérdidas mientras se mide."""
+    handshake = {"type": "camera_url", "url": camara, "protocolo": "trama",
+                 "captura": {"tiempo_real": args.tiempo_real}}
+    if args.perfil:
+        handshake["perfil"] = args.perfil
+    async with websockets.connect(ws_url, max_size=None) as ws:
+        await ws.send(json.dumps(handshake))
+        ultimo_seq = None
+        while not estado["fin"]:
+            try:
+                mensaje = await asyncio.wait_for(ws.recv(), timeout=1.0)
+            except asyncio.TimeoutError:
+                continue
+            if isinstance(mensaje, str):
+                stats["errores"].append(json.loads(mensaje).get("error"))
+                return
+            trama = desempaquetar(mensaje)
+            if trama.tipo != TIPO_JPEG:
+                continue
+            estado["camaras"].add(trama.cam_id)
+            if estado["midiendo"]:
+                stats["frames"] += 1
+                stats["latencias"].append(time.time() - trama.ts)
+                if ultimo_seq is not None and trama.seq > ultimo_seq + 1:
+                    stats["perdidos"] += trama.seq - ultimo_seq - 1
+            ultimo_seq = trama.seq
+
+
+async def medir_extremo(servidor, camaras, args):
+    # Sin pipeline el servidor solo escribe texto sobre los frames: no se mide
+    if not (await asyncio.to_thread(http_json, f"{servidor.base}/api/admin/instrumentacion")).get("pipeline"):
+        return {"modo": "extremo", "camaras": len(camaras), "listeners_por_camara": args.listeners_actual,
+                "error": "el servidor no cargó el pipeline de detección (ver servidor.log con --conservar)"}
+    ws_url = servidor.base.replace("http", "ws") + "/ws/camara-directa"
+    estado = {"fin": False, "midiendo": False, "camaras": set()}
+    stats = [{"frames": 0, "latencias": [], "perdidos": 0, "errores": []}
+             for _ in range(len(camaras) * args.listeners_actual)]
+    tareas = [asyncio.create_task(listener(ws_url, camaras[i // args.listeners_actual], args, estado, s))
+              for i, s in enumerate(stats)]
+
+    await asyncio.sleep(args.calentamiento_s)
+    # La instrumentación se (re)inicia al empezar la ventana de medición
+    for cam_id in estado["camaras"]:
+        await asyncio.to_thread(http_json, f"{servidor.base}/api/admin/instrumentacion/{cam_id}", "PUT", {})
+    cpu0, rss0 = uso_proceso(servidor.proc.pid)
+    t0 = time.perf_counter()
+    estado["midiendo"] = True
+    rss_max = rss0
+    while time.perf_counter() - t0 < args.duracion:
+        await asyncio.sleep(MUESTREO_RSS_S)
+        rss_max = max(rss_max, uso_proceso(servidor.proc.pid)[1])
+    estado["midiendo"] = False
+    total = time.perf_counter() - t0
+    cpu1, rss1 = uso_proceso(servidor.proc.pid)
+    instrumentadas = (await asyncio.to_thread(http_json, f"{servidor.base}/api/admin/instrumentacion"))["instrumentadas"]
+    estado["fin"] = True
+    await asyncio.gather(*tareas, return_exceptions=True)
+
+    latencias = [lat for s in stats for lat in s["latencias"]]
+    return {
+        "modo": "extremo",
+        "camaras": len(camaras),
+        "listeners_por_camara": args.listeners_actual,
+        "duracion_s": round(total, 2),
+        "fps_listener": resumen([s["frames"] / total for s in stats]),
+        "fps_camara_servidor": resumen([inst["contadores"]["frames"] / total for inst in instrumentadas.values()]),
+        "frames_recibidos": sum(s["frames"] for s in stats),
+        "perdidos": sum(s["perdidos"] for s in stats),
+        "latencia_ms": percentiles_ms(latencias),
+        "cpu_servidor_pct": round(100 * (cpu1 - cpu0) / total, 1),
+        "rss_servidor_mb": {"inicio": round(rss0 / 2 ** 20, 1), "max": round(max(rss_max, rss1) / 2 ** 20, 1)},
+        "etapas_servidor": {cam_id: inst["etapas"] for cam_id, inst in instrumentadas.items()},
+        "errores": sorted({e for s in stats for e in s["errores"]}) or None,
+    }
+
+
+def bench_extremo(args):
+    resultados = []
+    extension = os.path.splitext(args.video)[1]
+    for n_camaras in args.camaras:
+        for n_listeners in args.listeners:
+            directorio = directorio_aislado()
+            # Cada cámara es un enlace distinto al mismo video (ids de cámara distintos)
+            camaras = []
+            for i in range(n_camaras):
+                ruta = os.path.join(directorio, f"camara_{i}{extension}")
+                os.symlink(os.path.abspath(args.video), ruta)
+                camaras.append(ruta)
+            servidor = Servidor(directorio, puerto_libre())
+            try:
+                args.listeners_actual = n_listeners
+                resultados.append(asyncio.run(medir_extremo(servidor, camaras, args)))
+            finally:
+                servidor.cerrar()
+                if not args.conservar:
+                    shutil.rmtree(directorio, ignore_errors=True)
+    return resultados
+
+
+def imprimir(resultado):
+    if resultado.get("error"):
+        print(f"{resultado['modo']:>9}: {resultado['error']}")
+        return
+    lat = resultado["latencia_ms"] or {}
+    latencia = f"lat p50/p95/p99: {lat.get('p50')}/{lat.get('p95')}/{lat.get('p99')} ms"
+    if resultado["modo"] == "detector":
+        print(f" detector: {resultado['frames']} frames {resultado['resolucion']} | {resultado['fps']} fps | "
+              f"{latencia} | CPU {resultado['cpu_pct']}% | RSS {resultado['rss_mb']} MB")
+        for etapa, p in resultado["etapas_ms"].items():
+            print(f"{'':>10}{etapa:>10}: p50 {p['p50']} ms, p95 {p['p95']} ms, p99 {p['p99']} ms")
+        return
+    fps = resultado["fps_listener"] or {}
+    print(f"  extremo: {resultado['camaras']} cám x {resultado['listeners_por_camara']} listeners | "
+          f"fps/listener {fps.get('media')} (min {fps.get('min')}) | {latencia} | perdidos {resultado['perdidos']} | "
+          f"CPU {resultado['cpu_servidor_pct']}% | RSS máx {resultado['rss_servidor_mb']['max']} MB")
+    if resultado["errores"]:
+        print(f"{'':>10}errores: {resultado['errores']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput y latencia del pipeline con videos grabados")
+    parser.add_argument("modo", nargs="?", choices=("detector", "extremo", "todo"), default="todo")
+    parser.add_argument("--video", required=True, help="Video a reproducir (se repite en bucle)")
+    parser.add_argument("--frames", type=int, default=300, help="Frames medidos en modo detector")
+    parser.add_argument("--calentamiento", type=int, default=5, help="Frames sin medir en modo detector")
+    parser.add_argument("--camaras", type=int, nargs="+", default=[1], help="Cámaras simuladas (extremo)")
+    parser.add_argument("--listeners", type=int, nargs="+", default=[1], help="Listeners por cámara (extremo)")
+    parser.add_argument("--duracion", type=float, default=20.0, help="Segundos medidos por combinación")
+    parser.add_argument("--calentamiento-s", type=float, default=5.0, help="Segundos sin medir (extremo)")
+    parser.add_argument("--perfil", choices=("alto", "medio", "bajo"), help="Perfil de video de los listeners")
+    parser.add_argument("--tiempo-real", action="store_true", help="Reproducir al FPS del video")
+    parser.add_argument("--conservar", action="store_true", help="No borrar el directorio temporal (log, DB)")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    parser.add_argument("--salida", help="Guardar el JSON en este archivo")
+    args = parser.parse_args()
+
+    resultados = []
+    if args.modo in ("detector", "todo"):
+        resultados.append(bench_detector(args))
+    if args.modo in ("extremo", "todo"):
+        resultados.extend(bench_extremo(args))
+
+    reporte = {"contexto": contexto(), "video": os.path.basename(args.video), "resultados": resultados}
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2)
+    if args.json:
+        print(json.dumps(reporte, indent=2))
+        return
+
+    for resultado in resultados:
+        imprimir(resultado)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark del costo del tracker por frame
+
+Simula N vehículos moviéndose (con detecciones perdidas y ruido) y mide el
+tiempo de TrackerVehiculos.update por frame. Si el módulo SORT original
+(sort.sort) está disponible, también lo mide para comparar.
+
+Uso:
+    python benchmarks/bench_tracker.py
+    python benchmarks/bench_tracker.py --tracks 10 50 100 --frames 2000 --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'detección_yolo'))
+from tracker import TrackerVehiculos  # noqa: E402
+
+
+def generar_escena(n_tracks, n_frames, seed=0):
+    """Genera arrays (N, 6) por frame como los de boxes.data de YOLO."""
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(0, 1600, (n_tracks, 2))
+    vel = rng.normal(0, 4, (n_tracks, 2))
+    size = rng.uniform(60, 240, (n_tracks, 2))
+    clases = rng.choice([2, 3, 5, 7], n_tracks).astype(np.float32)
+
+    frames = []
+    for _ in range(n_frames):
+        pos += vel
+        visibles = rng.random(n_tracks) > 0.05
+        cajas = np.column_stack([pos, pos + size]) + rng.normal(0, 1.5, (n_tracks, 4))
+        data = np.column_stack([cajas, rng.uniform(0.5, 0.95, n_tracks), clases])[visibles]
+        frames.append(data.astype(np.float32))
+    return frames
+
+
+def medir(update, frames):
+    tiempos = np.empty(len(frames))
+    for i, data in enumerate(frames):
+        t0 = time.perf_counter()
+        update(data)
+        tiempos[i] = time.perf_counter() - t0
+    us = tiempos * 1e6
+    return {
+        "media_us": round(float(us.mean()), 1),
+        "p50_us": round(float(np.percentile(us, 50)), 1),
+        "p99_us": round(float(np.percentile(us, 99)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo del tracker por frame")
+    parser.add_argument("--tracks", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+
+    try:
+        from sort.sort import Sort
+    except ImportError:
+        Sort = None
+
+    resultados = []
+    for n in args.tracks:
+        frames = generar_escena(n, args.frames)
+        fila = {"tracks": n, "vectorizado": medir(TrackerVehiculos().update, frames)}
+        if Sort is not None:
+            sort = Sort()
+            fila["sort_original"] = medir(lambda d: sort.update(d[:, :5]), frames)
+        resultados.append(fila)
+
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+
+    for fila in resultados:
+        v = fila["vectorizado"]
+        linea = f"{fila['tracks']:>4} tracks | vectorizado: {v['media_us']:>8.1f} us (p99 {v['p99_us']:.1f})"
+        if "sort_original" in fila:
+            o = fila["sort_original"]
+            linea += f" | sort: {o['media_us']:>8.1f} us (p99 {o['p99_us']:.1f})"
+        print(linea)
+
+
+if __name__ == "__main__":
+    main()
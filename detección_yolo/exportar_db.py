@@ -0,0 +1,190 @@
+"""
+Exportación en streaming del historial de detecciones (CSV / NDJSON / Parquet)
+
+Recorre 'registros' o 'detecciones_raw' por páginas (WHERE id > ? LIMIT n),
+así la memoria usada es constante sin importar el tamaño de la base de datos
+y cada página es una lectura corta que no bloquea al proceso de detección.
+
+Uso:
+    python exportar_db.py registros --formato csv --salida registros.csv
+    python exportar_db.py detecciones_raw --formato parquet --salida raw.parquet
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+
+DB_PATH = "estacionamiento.db"
+TABLAS = ("registros", "detecciones_raw")
+FORMATOS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+FILAS_POR_LOTE = 5000
+
+
+def columnas_tabla(conn, tabla):
+    """Retorna [(nombre, tipo_declarado)] de la tabla."""
+    if tabla not in TABLAS:
+        raise ValueError(f"Tabla no exportable: {tabla}")
+    cursor = conn.execute(f"PRAGMA table_info({tabla});")
+    columnas = [(c[1], (c[2] or "").upper()) for c in cursor.fetchall()]
+    if not columnas:
+        raise ValueError(f"No existe la tabla '{tabla}'")
+    return columnas
+
+
+def iterar_lotes(db_path, tabla, filas_por_lote=FILAS_POR_LOTE, desde_id=0):
+    """
+    Genera listas de filas por páginas ordenadas por id.
+    Paginación por clave: cada página es O(log n) gracias a la PK.
+    """
+    with sqlite3.connect(db_path) as conn:
+        columnas = columnas_tabla(conn, tabla)
+        nombres = [c[0] for c in columnas]
+        idx_id = nombres.index("id")
+        query = f"SELECT {', '.join(nombres)} FROM {tabla} WHERE id > ? ORDER BY id LIMIT ?"
+
+        ultimo_id = desde_id
+        while True:
+            filas = conn.execute(query, (ultimo_id, filas_por_lote)).fetchall()
+            if not filas:
+                break
+            yield filas
+            ultimo_id = filas[-1][idx_id]
+            if len(filas) < filas_por_lote:
+                break
+
+
+#
+# ESCRITORES POR FORMATO (generan bloques de bytes)
+
+
+def _csv_bloques(columnas, lotes):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([c[0] for c in columnas])
+    for filas in lotes:
+        writer.writerows(filas)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _ndjson_bloques(columnas, lotes):
+    nombres = [c[0] for c in columnas]
+    for filas in lotes:
+        yield "".join(
+            json.dumps(dict(zip(nombres, fila)), ensure_ascii=False) + "\n" for fila in filas
+        ).encode("utf-8")
+
+
+class _SumideroBytes:
+    """Archivo de solo escritura que acumula bytes para entregarlos por bloques."""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+        self.closed = False
+
+    def write(self, data):
+        self._partes.append(bytes(data))
+        self._posicion += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drenar(self):
+        data = b"".join(self._partes)
+        self._partes.clear()
+        return data
+
+
+def _esquema_arrow(pa, columnas):
+    tipos = {"INTEGER": pa.int64(), "REAL": pa.float64(), "FLOAT": pa.float64()}
+    return pa.schema([(nombre, tipos.get(tipo, pa.string())) for nombre, tipo in columnas])
+
+
+def _parquet_bloques(columnas, lotes):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Para exportar a Parquet instala: pip install pyarrow")
+
+    sumidero = _SumideroBytes()
+    esquema = _esquema_arrow(pa, columnas)
+    writer = pq.ParquetWriter(sumidero, esquema, compression="zstd")
+    try:
+        for filas in lotes:
+            # Transponer el lote a columnas: un row group por lote
+            valores = list(zip(*filas))
+            tabla = pa.Table.from_arrays(
+                [pa.array(v, type=campo.type) for v, campo in zip(valores, esquema)],
+                schema=esquema,
+            )
+            writer.write_table(tabla)
+            yield sumidero.drenar()
+    finally:
+        writer.close()
+    yield sumidero.drenar()
+
+
+_ESCRITORES = {
+    "csv": _csv_bloques,
+    "ndjson": _ndjson_bloques,
+    "parquet": _parquet_bloques,
+}
+
+
+def exportar_bloques(db_path, tabla, formato="csv", filas_por_lote=FILAS_POR_LOTE):
+    """Generador de bloques de bytes listo para un StreamingResponse o un archivo."""
+    if formato not in _ESCRITORES:
+        raise ValueError(f"Formato no soportado: {formato}")
+    with sqlite3.connect(db_path) as conn:
+        columnas = columnas_tabla(conn, tabla)
+    lotes = iterar_lotes(db_path, tabla, filas_por_lote)
+    for bloque in _ESCRITORES[formato](columnas, lotes):
+        if bloque:
+            yield bloque
+
+
+def exportar_archivo(db_path, tabla, formato, salida, filas_por_lote=FILAS_POR_LOTE):
+    """Exporta una tabla a disco. Retorna el número de bytes escritos."""
+    total = 0
+    with open(salida, "wb") as f:
+        for bloque in exportar_bloques(db_path, tabla, formato, filas_por_lote):
+            f.write(bloque)
+            total += len(bloque)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Exporta el historial de detecciones en streaming (memoria constante)."
+    )
+    parser.add_argument("tabla", choices=TABLAS, help="Tabla a exportar")
+    parser.add_argument("--formato", choices=sorted(FORMATOS), default="csv", help="Formato de salida")
+    parser.add_argument("--salida", help="Archivo de salida (por defecto <tabla>.<formato>)")
+    parser.add_argument("--db", default=DB_PATH, help="Ruta de la base de datos SQLite")
+    parser.add_argument("--lote", type=int, default=FILAS_POR_LOTE, help="Filas por lote")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"No se encontró la base de datos '{args.db}'. Ejecuta primero main.py.")
+        raise SystemExit(1)
+
+    salida = args.salida or f"{args.tabla}.{args.formato}"
+    n_bytes = exportar_archivo(args.db, args.tabla, args.formato, salida, args.lote)
+    print(f"Exportado '{args.tabla}' a {salida} ({n_bytes / 1024:.1f} KB)")
@@ -1,33 +1,47 @@
 from ultralytics import YOLO
+import atexit
 import cv2
 import numpy as np
 import os
 import sqlite3
+import sys
+import threading
+import time
 from datetime import datetime
 from collections import defaultdict, deque
 from util import (
     read_license_plate,
     license_complies_format,
-    seleccionar_mas_cercano,
     consolidar_buffer,
     infer_direction_from_history,
 )
 from visualize import draw_detections
-from sort.sort import Sort
+from registro_ocr import RegistroOCR, asegurar_columna
+from retencion import CompactadorFondo, preparar_db
+from tracker import TrackerVehiculos
+from trazas import span
+from movimiento import HistorialMovimiento, LineaVirtual
 
 # SUBIR IMAGENES A GOOGLE DRIVE Y OBTENER URL
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.errors import HttpError
-from google.colab import auth
+# SUBIR_A_DRIVE=0 guarda solo la evidencia local (benchmarks, pruebas) y no
+# requiere las librerías de Google: las imágenes subidas quedan públicas en
+# la carpeta compartida
+SUBIR_A_DRIVE = os.environ.get("SUBIR_A_DRIVE", "1") != "0"
+drive_service = None
 
-# Si estás en Colab, autentica Drive una sola vez
-try:
-    auth.authenticate_user()
-except Exception:
-    pass
+if SUBIR_A_DRIVE:
+    from googleapiclient.discovery import build
+    from googleapiclient.http import MediaFileUpload
+    from googleapiclient.errors import HttpError
+    from google.colab import auth
 
-drive_service = build('drive', 'v3')
+    # Si estás en Colab, autentica Drive una sola vez
+    try:
+        auth.authenticate_user()
+    except Exception:
+        pass
+
+    drive_service = build('drive', 'v3')
 
 def upload_to_drive(local_path, folder_id="1F4ZZN2VrFra9t27bI5xdH4nDgHBzIVu5"):
     """
@@ -72,17 +86,39 @@ MIN_PLATE_LEN = 3
 FPS_DEFAULT = 20
 MIN_FRAMES_BUFFER = 7       # mínimo lecturas válidas antes de intentar consolidar
 PLATE_CONFIRM_THRESHOLD = 0.50  # confianza mínima final para aceptar una placa
-STRICT_MODE = True           # no cambia de vehículo hasta lectura confiable
+MAX_VEHICULOS_OCR = 4        # vehículos con detector de placas + OCR por frame
+ZONA_LECTURA = (0.0, 0.2, 1.0, 1.0)  # (x1, y1, x2, y2) relativos donde la placa es legible
+MIN_AREA_LECTURA = 0.01      # área mínima del vehículo (fracción del frame) para leer placa
+TRACK_TTL_S = 5.0            # segundos sin ver un track antes de liberar su estado
+MAX_LECTURAS_TRACK = 30      # lecturas OCR guardadas por track (las más recientes)
+MAX_EVENTOS = 1000           # eventos de cruce pendientes de consumir
 DIRECTION_SIGN = 1           # +1 si cámara abajo, -1 si está invertida
+OCR_RAW_SAMPLING = 1.0       # fracción de lecturas OCR guardadas en detecciones_raw
+OCR_RAW_MAX_DIAS = 7         # retención de lecturas crudas
+RETENCION_IMAGENES_DIAS = 30         # evidencias a resolución completa
+RETENCION_IMAGENES_MB = 2048         # cuota de disco de UNIQUE_FOLDER
+RETENCION_REGISTROS_DIAS = 180       # después se archivan comprimidos
+
+# Líneas virtuales por cámara (coordenadas relativas). La clave None aplica a
+# cámaras sin configuración propia. Subir en la imagen (lado +1 -> -1) es entrada.
+TRIPWIRES = {
+    None: [LineaVirtual(0.0, 0.6, 1.0, 0.6, sentido_entrada=-DIRECTION_SIGN, nombre="acceso")],
+}
 
 #
 #  INICIALIZACIÓN DE MODELOS Y DB
 coco_model = YOLO("yolo11n.pt")
 lp_model = YOLO("license_plate_detector.pt")
-mot_tracker = Sort()
+# Cada cámara llama a detectar_frame desde su propio hilo: los modelos YOLO
+# (su predictor guarda estado entre llamadas), la conexión y los contadores
+# globales se usan bajo estos locks
+_lock_modelos = threading.Lock()
+_lock_db = threading.Lock()
+_lock_contadores = threading.Lock()
 
 conn = sqlite3.connect(DB_PATH, check_same_thread=False)
 cursor = conn.cursor()
+preparar_db(conn)
 
 # Crear tabla principal si no existe
 cursor.execute('''
@@ -94,105 +130,359 @@ CREATE TABLE IF NOT EXISTS registros (
     direccion TEXT,
     url_imagen TEXT,
     id_sort_original INTEGER,
-    frames_hasta_placa INTEGER
+    frames_hasta_placa INTEGER,
+    camara_id TEXT
 )
 ''')
+# id_sort_original solo es único dentro de la cámara que lo generó
+asegurar_columna(conn, "registros", "camara_id", "TEXT")
 conn.commit()
 
+# Log de lecturas OCR crudas (escritura por lotes en un hilo aparte)
+registro_ocr = RegistroOCR(DB_PATH, tasa_muestreo=OCR_RAW_SAMPLING, max_dias=OCR_RAW_MAX_DIAS).iniciar()
+# El escritor es un hilo daemon: sin esto, las lecturas en cola se pierden al salir
+atexit.register(registro_ocr.detener)
+
+# Retención de evidencias y archivado de registros viejos (hilo de fondo).
+# No arranca al importar: se inicia con iniciar_retencion()
+retencion = CompactadorFondo(
+    carpetas=[{
+        "ruta": UNIQUE_FOLDER,
+        "max_dias": RETENCION_IMAGENES_DIAS,
+        "max_bytes": RETENCION_IMAGENES_MB * 1024 * 1024,
+    }],
+    tablas=[{
+        "db": DB_PATH,
+        "tabla": "registros",
+        "columna_fecha": "hora_entrada",
+        "max_dias": RETENCION_REGISTROS_DIAS,
+    }],
+)
+
+
+def iniciar_retencion():
+    """Arranca el hilo de retención (borra y archiva datos viejos)."""
+    return retencion.iniciar()
+
 
 # ESTRUCTURAS EN MEMORIA
 # 
-vehiculo_activo_id = None
-vehiculo_estado = {}            # sort_id -> {bbox, frame_inicial, tipo, ...}
-movement_history = defaultdict(lambda: deque(maxlen=30))  # para inferir dirección
-lecturas_ocr = defaultdict(list)  # sort_id -> [(texto, score, frame_number)]
+class EstadoCamara:
+    """
+    Tracker y estado por track de una cámara. Los ids de SORT solo son únicos
+    dentro de su tracker: cada cámara tiene el suyo, así los tracks, lecturas
+    OCR y lados de las líneas virtuales de cámaras distintas no se mezclan.
+    """
+
+    def __init__(self):
+        self.tracker = TrackerVehiculos(VEHICLE_CLASSES)
+        self.vehiculo_estado = {}       # sort_id -> {bbox, frame_inicial, tipo, placa, visto, ...}
+        self.movement_history = defaultdict(HistorialMovimiento)  # sort_id -> ring buffer (t, area, cy, cx)
+        self.lecturas_ocr = defaultdict(lambda: deque(maxlen=MAX_LECTURAS_TRACK))  # sort_id -> [(texto, score, frame_number)]
+        self.tracks_expirados = 0
+        self.ultimas_detecciones = []   # registros compactos de los tracks del último frame procesado
+        self.ultimos_resultados = {}    # mismo contenido en el formato de draw_detections
+        self.ultimos_tiempos = {}       # s de inferencia (vehículos + tracking), detector de placas y OCR del último frame
+
+
+camaras = {}                    # camara_id -> EstadoCamara
+tracks_expirados = 0            # de cámaras ya liberadas
+eventos = deque(maxlen=MAX_EVENTOS)  # cruces de líneas virtuales y placas confirmadas (con camara_id)
+contadores_ocr = {"omitidos": 0, "procesados": 0}  # tracks con placa confirmada (sin OCR) vs tracks que pasaron por OCR
+
+
+def _estado_camara(camara_id):
+    estado = camaras.get(camara_id)
+    if estado is None:
+        estado = camaras[camara_id] = EstadoCamara()
+    return estado
 
 
-def detectar_frame(frame, frame_nmr):
+def liberar_camara(camara_id):
+    """Descarta el tracker y el estado de una cámara que dejó de procesarse."""
+    global tracks_expirados
+    estado = camaras.pop(camara_id, None)
+    if estado is not None:
+        with _lock_contadores:
+            tracks_expirados += estado.tracks_expirados + len(estado.vehiculo_estado)
+
+
+def drenar_eventos():
+    """Retorna y vacía los eventos pendientes (en orden de llegada)."""
+    pendientes = []
+    while eventos:
+        pendientes.append(eventos.popleft())
+    return pendientes
+
+
+def obtener_detecciones(camara_id=None):
+    """Registros (track_id, bbox, tipo, placa, conf, direccion) del último frame de la cámara."""
+    estado = camaras.get(camara_id)
+    return estado.ultimas_detecciones if estado else []
+
+
+def obtener_tiempos(camara_id=None):
+    """Duración de las etapas del último frame de la cámara: {"inferencia": s, "placas": s, "ocr": s}."""
+    estado = camaras.get(camara_id)
+    return estado.ultimos_tiempos if estado else {}
+
+
+def obtener_contadores_ocr():
+    """Tracks que se saltaron el OCR por tener la placa confirmada vs los que lo usaron."""
+    with _lock_contadores:
+        return dict(contadores_ocr)
+
+
+def dibujar_ultimas(frame, camara_id=None):
+    """Dibuja en el frame (en sitio) los tracks del último frame procesado de la cámara."""
+    estado = camaras.get(camara_id)
+    return draw_detections(frame, estado.ultimos_resultados if estado else {})
+
+
+def _expirar_tracks(cam, ahora):
+    """Libera el estado de los tracks que SORT dejó de reportar hace más de TRACK_TTL_S."""
+    vencidos = [tid for tid, e in cam.vehiculo_estado.items() if ahora - e["visto"] > TRACK_TTL_S]
+    for tid in vencidos:
+        del cam.vehiculo_estado[tid]
+        cam.lecturas_ocr.pop(tid, None)
+        cam.movement_history.pop(tid, None)
+    cam.tracks_expirados += len(vencidos)
+
+
+def estadisticas_tracks():
     """
-    Detecta vehículo y placa en un frame, guarda registro si es necesario,
-    y retorna el frame anotado para streaming.
+    Objetos vivos del estado por track (todas las cámaras) y memoria aproximada
+    que ocupan. Los hilos de las cámaras siguen modificando sus dicts: se
+    recorren copias (list() de un dict no suelta el GIL).
     """
-    global vehiculo_activo_id, vehiculo_estado, lecturas_ocr, movement_history
-
-    raw_detections = coco_model(frame)[0]
-    dets = [
-        [x1, y1, x2, y2, score, VEHICLE_CLASSES[int(cls)]]
-        for x1, y1, x2, y2, score, cls in raw_detections.boxes.data.tolist()
-        if int(cls) in VEHICLE_CLASSES
+    estados = list(camaras.values())
+    copias = [
+        (list(cam.vehiculo_estado.values()), list(cam.lecturas_ocr.values()), list(cam.movement_history.values()))
+        for cam in estados
     ]
-    tracks = mot_tracker.update(
-        np.array([d[:5] for d in dets], dtype=np.float32) if dets else np.empty((0, 5))
+    n_lecturas = sum(len(b) for _, buffers, _ in copias for b in buffers)
+    n_muestras = sum(len(h) for _, _, historiales in copias for h in historiales)
+    bytes_aprox = n_lecturas * sys.getsizeof(("ABC123", 0.0, 0))
+    for cam, (vehiculos, buffers, historiales) in zip(estados, copias):
+        bytes_aprox += (
+            sys.getsizeof(cam.vehiculo_estado) + sys.getsizeof(cam.lecturas_ocr) + sys.getsizeof(cam.movement_history)
+            + sum(sys.getsizeof(e) for e in vehiculos)
+            + sum(sys.getsizeof(b) for b in buffers)
+            + sum(sys.getsizeof(h) for h in historiales)
+            + sum(h.datos.nbytes for h in historiales)
+        )
+    return {
+        "camaras": len(estados),
+        "tracks_vivos": sum(len(vehiculos) for vehiculos, _, _ in copias),
+        "tracks_expirados": tracks_expirados + sum(cam.tracks_expirados for cam in estados),
+        "buffers_ocr": sum(len(buffers) for _, buffers, _ in copias),
+        "lecturas_ocr": n_lecturas,
+        "muestras_movimiento": n_muestras,
+        "bytes_aprox": bytes_aprox,
+    }
+
+
+def _en_zona_lectura(bbox, w, h):
+    """True si el vehículo está donde la placa es legible (zona y tamaño mínimo)."""
+    x1, y1, x2, y2 = bbox
+    cx, cy = (x1 + x2) / 2 / w, (y1 + y2) / 2 / h
+    zx1, zy1, zx2, zy2 = ZONA_LECTURA
+    if not (zx1 <= cx <= zx2 and zy1 <= cy <= zy2):
+        return False
+    return (x2 - x1) * (y2 - y1) >= MIN_AREA_LECTURA * w * h
+
+
+def _guardar_registro(cam, track_id, placa, tipo, frame, frame_nmr, camara_id=None):
+    """Guarda evidencia y registro de una placa confirmada."""
+    estado = cam.vehiculo_estado[track_id]
+    # Un cruce de línea virtual es más confiable que la tendencia del movimiento
+    direction = estado.get("direccion") or infer_direction_from_history(
+        cam.movement_history.get(track_id), sign=DIRECTION_SIGN
     )
-    best_track = seleccionar_mas_cercano(tracks)
-
-    if vehiculo_activo_id is None and best_track is not None:
-        vehiculo_activo_id = int(best_track[4])
-        vehiculo_estado[vehiculo_activo_id] = {
-            "bbox": best_track[:4],
-            "tipo": "desconocido",
-            "frame_inicial": frame_nmr,
-        }
-        lecturas_ocr[vehiculo_activo_id] = []
-
-    # Procesar vehículo activo
-    if vehiculo_activo_id is not None and vehiculo_activo_id in vehiculo_estado:
-        tx1, ty1, tx2, ty2 = map(int, vehiculo_estado[vehiculo_activo_id]["bbox"])
-        h, w, _ = frame.shape
-        if tx1 < 0 or ty1 < 0 or tx2 > w or ty2 > h or tx1 >= tx2 or ty1 >= ty2:
-            return frame  # sin cambios
-
-        car_crop = frame[ty1:ty2, tx1:tx2]
-        if car_crop is None or car_crop.size == 0:
-            return frame
-
-        plates = lp_model(car_crop)[0]
-        if plates.boxes is not None:
-            for p in plates.boxes.data.tolist():
-                x1, y1, x2, y2, score, _ = p
-                license_crop = car_crop[int(y1):int(y2), int(x1):int(x2)]
-                placa_read, conf_read = read_license_plate(license_crop)
-                if placa_read and len(placa_read) >= MIN_PLATE_LEN:
-                    lecturas_ocr[vehiculo_activo_id].append((placa_read, conf_read, frame_nmr))
-
-        # Consolidar cuando haya suficientes lecturas
-        num_lecturas = len(lecturas_ocr[vehiculo_activo_id])
-        if num_lecturas >= MIN_FRAMES_BUFFER:
-            lecturas_validas = [(t, s) for t, s, _ in lecturas_ocr[vehiculo_activo_id]]
-            best_placa, best_conf = consolidar_buffer(lecturas_validas)
-            direction = infer_direction_from_history(movement_history[vehiculo_activo_id])
-
-            if best_placa and license_complies_format(best_placa) and best_conf >= PLATE_CONFIRM_THRESHOLD:
-                hora_actual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                filepath = os.path.join(UNIQUE_FOLDER, f"{best_placa}_{vehiculo_activo_id}_{frame_nmr}.jpg")
-                cv2.imwrite(filepath, frame)
-
-                # Subir a Drive y guardar URL
-                public_url = upload_to_drive(filepath)
-
-                conn.execute(
-                    """
-                    INSERT INTO registros (tipo_vehiculo, placa_final, hora_entrada, direccion, url_imagen, id_sort_original, frames_hasta_placa)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    ("car", best_placa, hora_actual, direction, public_url, vehiculo_activo_id, frame_nmr),
-                )
-                conn.commit()
-
-                print(f"Registro guardado: {best_placa} ({public_url})")
-
-                vehiculo_activo_id = None
-
-    # Dibujar detecciones en el frame
-    frame_vis = frame.copy()
-    if vehiculo_activo_id is not None and vehiculo_activo_id in vehiculo_estado:
-        draw_detections(
-            frame_vis,
-            {
-                vehiculo_activo_id: {
-                    "car": {"bbox": vehiculo_estado[vehiculo_activo_id]["bbox"]},
-                    "license_plate": {"bbox": (0, 0, 0, 0), "text": "...", "text_score": 0.0},
-                }
-            },
+    hora_actual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    prefijo = "" if camara_id is None else f"{camara_id}_"
+    filepath = os.path.join(UNIQUE_FOLDER, f"{prefijo}{placa}_{track_id}_{frame_nmr}.jpg")
+    with span("imwrite_evidencia"):
+        cv2.imwrite(filepath, frame)
+
+    # Subir a Drive y guardar URL
+    public_url = None
+    if SUBIR_A_DRIVE:
+        with span("upload_to_drive"):
+            public_url = upload_to_drive(filepath)
+
+    with span("insert_registro"), _lock_db:
+        conn.execute(
+            """
+            INSERT INTO registros (tipo_vehiculo, placa_final, hora_entrada, direccion, url_imagen, id_sort_original,
+                                   frames_hasta_placa, camara_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (tipo, placa, hora_actual, direction, public_url, track_id, frame_nmr,
+             None if camara_id is None else str(camara_id)),
         )
-    return frame_vis
+        conn.commit()
+
+    eventos.append({
+        "tipo": "plate_confirmed",
+        "track_id": track_id,
+        "placa": placa,
+        "confianza": estado["conf"],
+        "tipo_vehiculo": tipo,
+        "direccion": direction,
+        "camara_id": camara_id,
+        "bbox": [float(v) for v in estado["bbox"]],
+        "url_imagen": public_url,
+        "timestamp": datetime.now().isoformat(),
+    })
+
+    print(f"Registro guardado: {placa} ({public_url})")
+
+
+def _registrar_movimiento(cam, track_id, estado, bbox, ahora, w, h, lineas, camara_id):
+    """Agrega la muestra de movimiento y detecta cruces de líneas virtuales."""
+    x1, y1, x2, y2 = bbox
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    cam.movement_history[track_id].agregar(ahora, (x2 - x1) * (y2 - y1), cy, cx)
+
+    lados = estado["lados"]
+    for i, linea in enumerate(lineas):
+        lado = linea.lado(cx / w, cy / h)
+        if lado == 0:
+            continue
+        direccion = linea.cruce(lados.get(i, 0), lado)
+        lados[i] = lado
+        if direccion:
+            estado["direccion"] = direccion
+            eventos.append({
+                "tipo": "vehicle_entered" if direccion == "entrada" else "vehicle_exited",
+                "track_id": track_id,
+                "placa": estado["placa"],
+                "tipo_vehiculo": estado["tipo"],
+                "camara_id": camara_id,
+                "linea": linea.nombre,
+                "timestamp": datetime.now().isoformat(),
+            })
+
+
+def detectar_frame(frame, frame_nmr, camara_id=None, dibujar=True):
+    """
+    Detecta vehículos y placas en un frame, guarda registros cuando una
+    placa se confirma y retorna el frame anotado para streaming.
+    Las anotaciones se dibujan sobre el mismo frame; con dibujar=False se
+    retorna sin tocar (el cliente dibuja con obtener_detecciones()).
+
+    Mantiene estado OCR para todos los tracks vivos a la vez; solo los que
+    están en la zona de lectura (hasta MAX_VEHICULOS_OCR, los más cercanos)
+    pasan por el detector de placas y el OCR en cada frame.
+
+    El tracker y el estado por track son de la cámara (camara_id): frames de
+    cámaras distintas nunca se asocian entre sí.
+    """
+    cam = _estado_camara(camara_id)
+    t_inicio = time.perf_counter()
+    with span("coco_model"), _lock_modelos:
+        raw_detections = coco_model(frame)[0]
+    # Detecciones como array (N, 6) de principio a fin, sin pasar por listas
+    with span("tracker"):
+        tracks, clases = cam.tracker.update(raw_detections.boxes.data.cpu().numpy())
+    t_inferencia = time.perf_counter() - t_inicio
+
+    h, w, _ = frame.shape
+    ahora = time.monotonic()
+    lineas = TRIPWIRES.get(camara_id, TRIPWIRES.get(None, []))
+    candidatos = []
+    omitidos = 0
+    for (tx1, ty1, tx2, ty2, sort_id), cls in zip(tracks, clases):
+        track_id = int(sort_id)
+        bbox = (max(0, tx1), max(0, ty1), min(w, tx2), min(h, ty2))
+        estado = cam.vehiculo_estado.get(track_id)
+        if estado is None:
+            estado = cam.vehiculo_estado[track_id] = {
+                "bbox": bbox,
+                "tipo": "desconocido",
+                "frame_inicial": frame_nmr,
+                "placa": None,
+                "conf": 0.0,
+                "direccion": None,
+                "lados": {},        # índice de línea virtual -> último lado visto
+            }
+        estado["bbox"] = bbox
+        estado["visto"] = ahora
+        estado["tipo"] = VEHICLE_CLASSES.get(int(cls), estado["tipo"])
+        _registrar_movimiento(cam, track_id, estado, bbox, ahora, w, h, lineas, camara_id)
+
+        if estado["placa"] is not None:
+            omitidos += 1
+        elif bbox[0] < bbox[2] and bbox[1] < bbox[3] and _en_zona_lectura(bbox, w, h):
+            candidatos.append((track_id, bbox))
+
+    _expirar_tracks(cam, ahora)
+
+    # Los más cercanos (mayor área) primero; el resto espera a acercarse
+    candidatos.sort(key=lambda c: (c[1][2] - c[1][0]) * (c[1][3] - c[1][1]), reverse=True)
+    candidatos = candidatos[:MAX_VEHICULOS_OCR]
+
+    with _lock_contadores:
+        contadores_ocr["omitidos"] += omitidos
+        contadores_ocr["procesados"] += len(candidatos)
+
+    t_placas = t_ocr = 0.0
+    if candidatos:
+        t_inicio = time.perf_counter()
+        crops = [frame[int(y1):int(y2), int(x1):int(x2)] for _, (x1, y1, x2, y2) in candidatos]
+        # Una sola llamada al detector de placas para todos los candidatos
+        with span("lp_model"), _lock_modelos:
+            resultados_placas = lp_model(crops)
+        t_placas = time.perf_counter() - t_inicio
+        t_inicio = time.perf_counter()
+
+        for (track_id, bbox), car_crop, plates in zip(candidatos, crops, resultados_placas):
+            if plates.boxes is not None:
+                for x1, y1, x2, y2, score, _ in plates.boxes.data.tolist():
+                    license_crop = car_crop[int(y1):int(y2), int(x1):int(x2)]
+                    with span("read_license_plate"):
+                        placa_read, conf_read = read_license_plate(license_crop)
+                    if placa_read and len(placa_read) >= MIN_PLATE_LEN:
+                        cam.lecturas_ocr[track_id].append((placa_read, conf_read, frame_nmr))
+                        registro_ocr.append(track_id, placa_read, conf_read, frame_nmr, camara_id)
+
+            # Consolidar cuando haya suficientes lecturas
+            if len(cam.lecturas_ocr[track_id]) >= MIN_FRAMES_BUFFER:
+                lecturas_validas = [(t, s) for t, s, _ in cam.lecturas_ocr[track_id]]
+                best_placa, best_conf = consolidar_buffer(lecturas_validas)
+
+                if best_placa and license_complies_format(best_placa) and best_conf >= PLATE_CONFIRM_THRESHOLD:
+                    estado = cam.vehiculo_estado[track_id]
+                    estado["placa"] = best_placa
+                    estado["conf"] = float(best_conf)
+                    with span("guardar_registro"):
+                        _guardar_registro(cam, track_id, best_placa, estado["tipo"], frame, frame_nmr, camara_id)
+        t_ocr = time.perf_counter() - t_inicio
+
+    # Dibujar todos los tracks vivos del frame
+    cam.ultimos_tiempos = {"inferencia": t_inferencia, "placas": t_placas, "ocr": t_ocr}
+    resultados = {}
+    detecciones = []
+    for *_, sort_id in tracks:
+        track_id = int(sort_id)
+        estado = cam.vehiculo_estado[track_id]
+        resultados[track_id] = {
+            "tipo": estado["tipo"],
+            "car": {"bbox": estado["bbox"]},
+            "license_plate": {"text": estado["placa"] or "...", "text_score": estado["conf"]},
+        }
+        detecciones.append({
+            "track_id": track_id,
+            "bbox": [int(v) for v in estado["bbox"]],
+            "tipo": estado["tipo"],
+            "placa": estado["placa"],
+            "conf": round(estado["conf"], 3),
+            "direccion": estado["direccion"],
+        })
+    cam.ultimas_detecciones = detecciones
+    cam.ultimos_resultados = resultados
+    if not dibujar:
+        return frame
+    with span("draw_detections"):
+        return draw_detections(frame, resultados)
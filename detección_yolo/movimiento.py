@@ -0,0 +1,93 @@
+"""
+Historial de movimiento por track y líneas virtuales de cruce
+
+- HistorialMovimiento: ring buffer NumPy de tamaño fijo con (t, área, cy, cx)
+  por frame. La tendencia se obtiene con un ajuste lineal vectorizado sobre
+  todas las muestras (más robusto que comparar solo la primera y la última)
+- LineaVirtual: tripwire por cámara. Detectar un cruce es O(1) por track:
+  solo se compara el lado de la línea del frame anterior con el actual
+"""
+import numpy as np
+
+CAPACIDAD_HISTORIAL = 30
+
+
+class HistorialMovimiento:
+    """
+    Buffer circular (capacidad, 4) con columnas [t, area, cy, cx].
+    """
+
+    __slots__ = ("datos", "n", "pos")
+
+    def __init__(self, capacidad=CAPACIDAD_HISTORIAL):
+        self.datos = np.zeros((capacidad, 4), dtype=np.float64)
+        self.n = 0
+        self.pos = 0
+
+    def __len__(self):
+        return self.n
+
+    def agregar(self, t, area, cy, cx):
+        fila = self.datos[self.pos]
+        fila[0] = t
+        fila[1] = area
+        fila[2] = cy
+        fila[3] = cx
+        self.pos = (self.pos + 1) % len(self.datos)
+        if self.n < len(self.datos):
+            self.n += 1
+
+    def muestras(self):
+        """Muestras en orden cronológico (vista si el buffer no dio la vuelta)."""
+        if self.n < len(self.datos):
+            return self.datos[:self.n]
+        return np.roll(self.datos, -self.pos, axis=0)
+
+    def desplazamiento(self):
+        """
+        Ajuste lineal por mínimos cuadrados de área y cy contra el tiempo.
+        Retorna (dy, darea) estimados sobre toda la ventana.
+        """
+        # El ajuste no depende del orden: no hace falta desenrollar el buffer
+        m = self.datos[:self.n]
+        t = m[:, 0]
+        y = m[:, 1:3]                       # [area, cy]
+        tc = t - t.mean()
+        var = float(tc @ tc)
+        if var <= 0.0:
+            return 0.0, 0.0
+        pendientes = tc @ (y - y.mean(axis=0)) / var   # [d_area/dt, d_cy/dt]
+        duracion = t.max() - t.min()
+        darea, dy = pendientes * duracion
+        return float(dy), float(darea)
+
+
+class LineaVirtual:
+    """
+    Segmento en coordenadas relativas (0-1) del frame. Cruzar del lado
+    negativo al positivo es una entrada si sentido_entrada=+1 (salida si -1).
+    """
+
+    def __init__(self, x1, y1, x2, y2, sentido_entrada=1, nombre="linea"):
+        self.p1 = np.array([x1, y1], dtype=np.float64)
+        self.p2 = np.array([x2, y2], dtype=np.float64)
+        self.sentido_entrada = sentido_entrada
+        self.nombre = nombre
+        d = self.p2 - self.p1
+        self._d = d
+        self._largo2 = float(d @ d)
+
+    def lado(self, cx, cy):
+        """-1, 0 o +1 según el lado de la línea; 0 si queda fuera del segmento."""
+        px, py = cx - self.p1[0], cy - self.p1[1]
+        proy = (px * self._d[0] + py * self._d[1]) / self._largo2
+        if proy < 0.0 or proy > 1.0:
+            return 0
+        cruz = self._d[0] * py - self._d[1] * px
+        return 1 if cruz > 0 else -1
+
+    def cruce(self, lado_anterior, lado_actual):
+        """Retorna 'entrada', 'salida' o None a partir del cambio de lado."""
+        if lado_anterior == 0 or lado_actual == 0 or lado_anterior == lado_actual:
+            return None
+        return "entrada" if lado_actual == self.sentido_entrada else "salida"
@@ -0,0 +1,196 @@
+"""
+Registro de lecturas OCR crudas (tabla detecciones_raw)
+
+- append(): se llama desde detectar_frame; solo agrega una tupla a una cola
+  acotada (sin I/O), así el pipeline nunca espera a la base de datos
+- Hilo escritor: vacía la cola con executemany en lotes, en su propia conexión
+- Muestreo opcional para guardar solo una fracción de las lecturas
+- Retención: límite de filas y de antigüedad, borrando en bloques pequeños
+"""
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+DB_PATH = "estacionamiento.db"
+
+TAMANO_LOTE = 500            # filas por INSERT
+INTERVALO_ESCRITURA = 1.0    # segundos máximos entre escrituras
+MAX_COLA = 20000             # lecturas en memoria antes de descartar las más viejas
+MAX_FILAS = 1_000_000        # retención por cantidad
+MAX_DIAS = 7                 # retención por antigüedad
+BLOQUE_BORRADO = 5000        # filas por DELETE (transacciones cortas)
+INTERVALO_RETENCION = 300.0  # segundos entre pasadas de retención
+
+
+def asegurar_columna(conn, tabla, columna, tipo):
+    """Agrega la columna si la tabla (creada por una versión anterior) no la tiene."""
+    columnas = [c[1] for c in conn.execute(f"PRAGMA table_info({tabla});")]
+    if columna not in columnas:
+        conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}")
+
+
+def crear_tabla(conn):
+    # Los ids de SORT son por cámara (cada una tiene su tracker): una lectura
+    # se identifica por (camara_id, id_sort)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS detecciones_raw (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        id_sort INTEGER,
+        placa_raw TEXT,
+        score REAL,
+        frame_number INTEGER,
+        timestamp TEXT,
+        camara_id TEXT
+    )
+    ''')
+    asegurar_columna(conn, "detecciones_raw", "camara_id", "TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_detecciones_raw_id_sort ON detecciones_raw (id_sort)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_detecciones_raw_camara ON detecciones_raw (camara_id, id_sort)")
+    conn.commit()
+
+
+class RegistroOCR:
+    """
+    Log de alto volumen para lecturas OCR por frame.
+    """
+
+    def __init__(self, db_path=DB_PATH, tasa_muestreo=1.0, tamano_lote=TAMANO_LOTE,
+                 intervalo=INTERVALO_ESCRITURA, max_cola=MAX_COLA,
+                 max_filas=MAX_FILAS, max_dias=MAX_DIAS):
+        self.db_path = db_path
+        self.tasa_muestreo = tasa_muestreo
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.max_filas = max_filas
+        self.max_dias = max_dias
+        self._cola = deque(maxlen=max_cola)
+        self._evento = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self.escritas = 0
+        self.descartadas = 0
+
+    def iniciar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._escritor, name="registro_ocr", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self, timeout=5.0):
+        """Escribe lo pendiente y detiene el hilo escritor."""
+        self._detener.set()
+        self._evento.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def append(self, id_sort, placa_raw, score, frame_number, camara_id=None):
+        """Encola una lectura (O(1)). Aplica el muestreo antes de encolar."""
+        if self.tasa_muestreo < 1.0 and random.random() >= self.tasa_muestreo:
+            return
+        if len(self._cola) == self._cola.maxlen:
+            self.descartadas += 1
+        self._cola.append((int(id_sort), placa_raw, float(score), int(frame_number), time.time(),
+                           None if camara_id is None else str(camara_id)))
+        if len(self._cola) >= self.tamano_lote:
+            self._evento.set()
+
+    def _tomar_lote(self):
+        lote = []
+        while self._cola and len(lote) < self.tamano_lote:
+            id_sort, placa, score, frame_number, ts, camara_id = self._cola.popleft()
+            lote.append((id_sort, placa, score, frame_number,
+                         datetime.fromtimestamp(ts).isoformat(sep=" ", timespec="milliseconds"), camara_id))
+        return lote
+
+    def _escritor(self):
+        conn = sqlite3.connect(self.db_path)
+        # WAL: las lecturas (visualizar_db, exportaciones) no bloquean las escrituras
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        crear_tabla(conn)
+        ultima_retencion = 0.0
+
+        try:
+            while True:
+                self._evento.wait(self.intervalo)
+                self._evento.clear()
+                detener = self._detener.is_set()
+
+                while self._cola:
+                    lote = self._tomar_lote()
+                    try:
+                        conn.executemany(
+                            "INSERT INTO detecciones_raw (id_sort, placa_raw, score, frame_number, timestamp, camara_id) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            lote,
+                        )
+                        conn.commit()
+                        self.escritas += len(lote)
+                    except sqlite3.Error as e:
+                        print(f"❌ Error escribiendo detecciones_raw: {e}")
+                        self.descartadas += len(lote)
+                        break
+
+                if detener:
+                    break
+
+                if time.monotonic() - ultima_retencion >= INTERVALO_RETENCION:
+                    ultima_retencion = time.monotonic()
+                    self.aplicar_retencion(conn)
+        finally:
+            conn.close()
+
+    def aplicar_retencion(self, conn=None):
+        """
+        Borra lecturas por encima de max_filas o más viejas que max_dias.
+        El id es creciente en el tiempo, así que basta con un id de corte.
+        Retorna el número de filas borradas.
+        """
+        propia = conn is None
+        if propia:
+            conn = sqlite3.connect(self.db_path)
+        try:
+            (max_id,) = conn.execute("SELECT MAX(id) FROM detecciones_raw").fetchone()
+            if max_id is None:
+                return 0
+
+            corte = 0
+            if self.max_filas:
+                corte = max(corte, max_id - self.max_filas)
+            if self.max_dias:
+                limite = (datetime.now() - timedelta(days=self.max_dias)).isoformat(sep=" ")
+                fila = conn.execute(
+                    "SELECT id FROM detecciones_raw WHERE timestamp >= ? ORDER BY id LIMIT 1", (limite,)
+                ).fetchone()
+                corte = max(corte, (fila[0] - 1) if fila else max_id)
+
+            borradas = 0
+            while corte > 0:
+                cur = conn.execute(
+                    "DELETE FROM detecciones_raw WHERE id IN "
+                    "(SELECT id FROM detecciones_raw WHERE id <= ? ORDER BY id LIMIT ?)",
+                    (corte, BLOQUE_BORRADO),
+                )
+                conn.commit()
+                borradas += cur.rowcount
+                if cur.rowcount < BLOQUE_BORRADO:
+                    break
+            if borradas:
+                print(f"🧹 detecciones_raw: {borradas} lecturas antiguas eliminadas")
+            return borradas
+        finally:
+            if propia:
+                conn.close()
+
+    def estadisticas(self):
+        return {
+            "en_cola": len(self._cola),
+            "escritas": self.escritas,
+            "descartadas": self.descartadas,
+            "tasa_muestreo": self.tasa_muestreo,
+        }
+
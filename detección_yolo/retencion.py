@@ -0,0 +1,319 @@
+"""
+Retención, archivado y compactación de evidencias y registros
+
+- Carpetas de imágenes: límite por antigüedad y por tamaño total. Antes de
+  borrar una imagen se guarda una miniatura reducida en <carpeta>/miniaturas
+- Tablas SQLite: las filas antiguas se archivan en particiones mensuales
+  NDJSON comprimidas con gzip y luego se borran de la base de datos
+- Compactación: checkpoint del WAL e incremental_vacuum por pasos
+- Todo corre en un hilo de fondo con bloques pequeños y pausas entre ellos,
+  así la ingesta en vivo nunca espera un bloqueo largo
+
+Uso:
+    python retencion.py               # una pasada con la configuración por defecto
+    python retencion.py --vacuum      # además VACUUM completo (bloquea la DB)
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import cv2
+
+CARPETA_ARCHIVO = "archivo"
+SUBCARPETA_MINIATURAS = "miniaturas"
+ANCHO_MINIATURA = 320
+CALIDAD_MINIATURA = 70
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png")
+
+FILAS_POR_BLOQUE = 2000      # filas archivadas por transacción
+PAGINAS_VACUUM = 256         # páginas liberadas por paso de incremental_vacuum
+PAUSA_BLOQUE = 0.05          # segundos entre bloques (cede la DB a la ingesta)
+INTERVALO_JOB = 3600.0       # segundos entre pasadas del job de fondo
+
+
+#
+# IMÁGENES
+
+
+def generar_miniatura(ruta, carpeta_miniaturas, ancho=ANCHO_MINIATURA):
+    """Guarda una versión reducida de la imagen. Retorna la ruta o None."""
+    # Decodificar ya reducida a 1/2 para no pagar el full-HD completo
+    img = cv2.imread(ruta, cv2.IMREAD_REDUCED_COLOR_2)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    if w > ancho:
+        img = cv2.resize(img, (ancho, int(h * ancho / w)), interpolation=cv2.INTER_AREA)
+
+    os.makedirs(carpeta_miniaturas, exist_ok=True)
+    destino = os.path.join(carpeta_miniaturas, os.path.splitext(os.path.basename(ruta))[0] + ".jpg")
+    cv2.imwrite(destino, img, [int(cv2.IMWRITE_JPEG_QUALITY), CALIDAD_MINIATURA])
+    return destino
+
+
+def _listar_imagenes(carpeta):
+    archivos = []
+    with os.scandir(carpeta) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith(EXTENSIONES_IMAGEN):
+                st = entry.stat()
+                archivos.append((st.st_mtime, st.st_size, entry.path))
+    archivos.sort()  # más viejas primero
+    return archivos
+
+
+def _aplicar_cuota(archivos, max_dias, max_bytes):
+    """Retorna los archivos (más viejos primero) que exceden antigüedad o tamaño."""
+    limite = time.time() - max_dias * 86400 if max_dias else None
+    total = sum(a[1] for a in archivos)
+    expulsar = []
+    for mtime, size, ruta in archivos:
+        vencido = limite is not None and mtime < limite
+        excedido = max_bytes is not None and total > max_bytes
+        if not (vencido or excedido):
+            break
+        expulsar.append(ruta)
+        total -= size
+    return expulsar
+
+
+def limpiar_carpeta(carpeta, max_dias=30, max_bytes=None, miniaturas=True,
+                    max_bytes_miniaturas=None):
+    """
+    Aplica la cuota de una carpeta de evidencias.
+    Retorna (imagenes_borradas, miniaturas_creadas).
+    """
+    if not os.path.isdir(carpeta):
+        return 0, 0
+
+    carpeta_min = os.path.join(carpeta, SUBCARPETA_MINIATURAS)
+    borradas = creadas = 0
+    for ruta in _aplicar_cuota(_listar_imagenes(carpeta), max_dias, max_bytes):
+        if miniaturas and generar_miniatura(ruta, carpeta_min):
+            creadas += 1
+        try:
+            os.remove(ruta)
+            borradas += 1
+        except OSError:
+            pass
+
+    # Las miniaturas también tienen cuota propia (solo por tamaño)
+    if miniaturas and max_bytes_miniaturas and os.path.isdir(carpeta_min):
+        for ruta in _aplicar_cuota(_listar_imagenes(carpeta_min), None, max_bytes_miniaturas):
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+    return borradas, creadas
+
+
+#
+# TABLAS
+
+
+def archivar_tabla(db_path, tabla, columna_fecha, max_dias, carpeta_archivo=CARPETA_ARCHIVO,
+                   filas_por_bloque=FILAS_POR_BLOQUE, pausa=PAUSA_BLOQUE):
+    """
+    Mueve filas más viejas que max_dias a archivo/<db>/<tabla>/<AAAA-MM>.ndjson.gz.
+    Cada bloque se escribe al archivo antes de borrarse de la DB, en una
+    transacción corta. Retorna el número de filas archivadas.
+    """
+    if not os.path.exists(db_path):
+        return 0
+
+    limite = (datetime.now() - timedelta(days=max_dias)).isoformat(sep=" ")
+    destino = os.path.join(carpeta_archivo, os.path.splitext(os.path.basename(db_path))[0], tabla)
+    archivadas = 0
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        existe = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (tabla,)
+        ).fetchone()
+        if not existe:
+            return 0
+
+        cursor = conn.execute(f"SELECT * FROM {tabla} LIMIT 0")
+        nombres = [d[0] for d in cursor.description]
+        idx_fecha = nombres.index(columna_fecha)
+        query = (
+            f"SELECT * FROM {tabla} WHERE id > ? AND {columna_fecha} < ? "
+            f"ORDER BY id LIMIT ?"
+        )
+
+        ultimo_id = 0
+        while True:
+            filas = conn.execute(query, (ultimo_id, limite, filas_por_bloque)).fetchall()
+            if not filas:
+                break
+
+            # Agrupar por partición mensual según la fecha de la fila
+            particiones = {}
+            for fila in filas:
+                mes = str(fila[idx_fecha] or "sin_fecha")[:7]
+                particiones.setdefault(mes, []).append(fila)
+
+            os.makedirs(destino, exist_ok=True)
+            for mes, filas_mes in particiones.items():
+                # gzip en modo append agrega un miembro nuevo: el archivo sigue siendo válido
+                with gzip.open(os.path.join(destino, f"{mes}.ndjson.gz"), "at", encoding="utf-8") as f:
+                    for fila in filas_mes:
+                        f.write(json.dumps(dict(zip(nombres, fila)), ensure_ascii=False, default=str) + "\n")
+
+            ids = [fila[0] for fila in filas]
+            conn.executemany(f"DELETE FROM {tabla} WHERE id = ?", [(i,) for i in ids])
+            conn.commit()
+            archivadas += len(ids)
+            ultimo_id = ids[-1]
+
+            if len(filas) < filas_por_bloque:
+                break
+            time.sleep(pausa)
+    finally:
+        conn.close()
+
+    if archivadas:
+        print(f"📦 {tabla}: {archivadas} filas archivadas en {destino}")
+    return archivadas
+
+
+def compactar_db(db_path, paginas=PAGINAS_VACUUM, pausa=PAUSA_BLOQUE, vacuum_completo=False):
+    """
+    Devuelve espacio libre al sistema de archivos sin bloqueos largos.
+    Con auto_vacuum=INCREMENTAL libera páginas por pasos; si la DB no está en
+    ese modo solo hace checkpoint del WAL (o VACUUM completo si se pide).
+    Retorna las páginas libres restantes.
+    """
+    if not os.path.exists(db_path):
+        return 0
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if vacuum_completo:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        (modo,) = conn.execute("PRAGMA auto_vacuum").fetchone()
+        if modo == 2:
+            (libres,) = conn.execute("PRAGMA freelist_count").fetchone()
+            for _ in range(-(-libres // paginas)):
+                # executescript recorre el pragma completo (execute solo libera 1 página)
+                conn.executescript(f"PRAGMA incremental_vacuum({paginas});")
+                time.sleep(pausa)
+        conn.execute("PRAGMA optimize")
+        (libres,) = conn.execute("PRAGMA freelist_count").fetchone()
+        return libres
+    finally:
+        conn.close()
+
+
+#
+# JOB DE FONDO
+
+
+class CompactadorFondo:
+    """
+    Ejecuta periódicamente la retención configurada en un hilo de baja prioridad.
+
+    carpetas: [{"ruta": str, "max_dias": int, "max_bytes": int, "max_bytes_miniaturas": int}]
+    tablas:   [{"db": str, "tabla": str, "columna_fecha": str, "max_dias": int}]
+    """
+
+    def __init__(self, carpetas=None, tablas=None, intervalo=INTERVALO_JOB,
+                 carpeta_archivo=CARPETA_ARCHIVO):
+        self.carpetas = carpetas or []
+        self.tablas = tablas or []
+        self.intervalo = intervalo
+        self.carpeta_archivo = carpeta_archivo
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._loop, name="retencion", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+
+    def _loop(self):
+        if sys.platform.startswith("linux"):
+            try:
+                os.nice(10)  # en Linux la prioridad es por hilo: no afecta a la ingesta
+            except OSError:
+                pass
+        while not self._detener.is_set():
+            try:
+                self.ejecutar()
+            except Exception as e:
+                print(f"❌ Error en retención: {e}")
+            self._detener.wait(self.intervalo)
+
+    def ejecutar(self):
+        """Una pasada completa: imágenes, archivado y compactación."""
+        resumen = {"imagenes_borradas": 0, "miniaturas": 0, "filas_archivadas": 0}
+
+        for c in self.carpetas:
+            borradas, creadas = limpiar_carpeta(
+                c["ruta"], c.get("max_dias", 30), c.get("max_bytes"),
+                max_bytes_miniaturas=c.get("max_bytes_miniaturas"),
+            )
+            resumen["imagenes_borradas"] += borradas
+            resumen["miniaturas"] += creadas
+
+        dbs = []
+        for t in self.tablas:
+            resumen["filas_archivadas"] += archivar_tabla(
+                t["db"], t["tabla"], t["columna_fecha"], t.get("max_dias", 90), self.carpeta_archivo
+            )
+            if t["db"] not in dbs:
+                dbs.append(t["db"])
+
+        for db in dbs:
+            compactar_db(db)
+
+        return resumen
+
+
+def preparar_db(conn):
+    """
+    Activa auto_vacuum incremental. Solo tiene efecto en DBs nuevas
+    (antes de crear tablas); las existentes requieren un VACUUM completo.
+    """
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retención y compactación de evidencias y registros.")
+    parser.add_argument("--dias-imagenes", type=int, default=30, help="Antigüedad máxima de imágenes")
+    parser.add_argument("--max-mb", type=int, default=2048, help="Tamaño máximo por carpeta de imágenes")
+    parser.add_argument("--dias-registros", type=int, default=90, help="Antigüedad máxima de registros en DB")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM completo (bloquea la DB)")
+    args = parser.parse_args()
+
+    max_bytes = args.max_mb * 1024 * 1024
+    job = CompactadorFondo(
+        carpetas=[
+            {"ruta": "detecciones_unicas", "max_dias": args.dias_imagenes, "max_bytes": max_bytes},
+            {"ruta": "detecciones_guardadas", "max_dias": args.dias_imagenes, "max_bytes": max_bytes},
+        ],
+        tablas=[
+            {"db": "estacionamiento.db", "tabla": "registros", "columna_fecha": "hora_entrada",
+             "max_dias": args.dias_registros},
+            {"db": "detecciones.db", "tabla": "detecciones", "columna_fecha": "timestamp",
+             "max_dias": args.dias_registros},
+        ],
+    )
+    print(job.ejecutar())
+    if args.vacuum:
+        for db in ("estacionamiento.db", "detecciones.db"):
+            print(f"{db}: {compactar_db(db, vacuum_completo=True)} páginas libres")
@@ -4,16 +4,20 @@ from datetime import datetime
 import os
 import sqlite3
 import re
+from retencion import CompactadorFondo, preparar_db
 
 # Configuración simple sin dependencias externas complejas
 DB_PATH = "detecciones.db"
 OUTPUT_FOLDER = "detecciones_guardadas"
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+RETENCION_DIAS = 7
+RETENCION_MB = 512
 
 # Inicializar base de datos
 def init_db():
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
     conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     cursor = conn.cursor()
+    preparar_db(conn)
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS detecciones (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -124,9 +128,17 @@ def procesar_frame_simple(frame, frame_count=0):
     
     return frame_result
 
+_db_lista = False
+
 def guardar_deteccion(frame, placa, confianza):
     """Guardar detección en base de datos y archivo"""
+    global _db_lista
     try:
+        # La DB y la carpeta se crean con la primera detección, no al importar
+        if not _db_lista:
+            init_db().close()
+            _db_lista = True
+        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{placa}_{timestamp}.jpg"
         filepath = os.path.join(OUTPUT_FOLDER, filename)
@@ -154,5 +166,13 @@ def detectar_frame(frame, frame_nmr):
     """Función principal llamada desde el backend"""
     return procesar_frame_simple(frame, frame_nmr)
 
-# Inicializar DB al importar
-init_db()
\ No newline at end of file
+# Limpieza periódica de imágenes y filas viejas. No arranca al importar:
+# quien usa el módulo la inicia explicitamente con iniciar_retencion()
+retencion = CompactadorFondo(
+    carpetas=[{"ruta": OUTPUT_FOLDER, "max_dias": RETENCION_DIAS, "max_bytes": RETENCION_MB * 1024 * 1024}],
+    tablas=[{"db": DB_PATH, "tabla": "detecciones", "columna_fecha": "timestamp", "max_dias": RETENCION_DIAS}],
+)
+
+def iniciar_retencion():
+    """Arranca el hilo de retención (borra y archiva datos viejos)"""
+    return retencion.iniciar()
\ No newline at end of file
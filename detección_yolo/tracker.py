@@ -0,0 +1,216 @@
+"""
+Tracker de vehículos SORT vectorizado
+
+Mismo modelo que SORT (Kalman de velocidad constante sobre [cx, cy, área, aspecto]
+y asociación por IoU), pero con el estado de todos los tracks en arrays NumPy:
+predicción, actualización e IoU se calculan en bloque para todos los tracks,
+sin un objeto KalmanFilter por vehículo ni listas de Python por frame.
+
+Uso:
+    tracker = TrackerVehiculos()
+    tracks, clases = tracker.update(resultado_yolo.boxes.data.cpu().numpy())
+    # tracks: (K, 5) [x1, y1, x2, y2, track_id]   clases: (K,) id de clase COCO
+"""
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+VEHICLE_CLASSES = {2: "car", 3: "motorcycle", 5: "bus", 7: "truck"}
+
+# Matrices del modelo (idénticas a las de SORT)
+_F = np.eye(7)
+_F[0, 4] = _F[1, 5] = _F[2, 6] = 1.0
+_Q = np.eye(7)
+_Q[-1, -1] *= 0.01
+_Q[4:, 4:] *= 0.01
+_R = np.eye(4)
+_R[2:, 2:] *= 10.0
+_P0 = np.eye(7) * 10.0
+_P0[4:, 4:] *= 1000.0
+_I7 = np.eye(7)
+
+
+def iou_batch(a, b):
+    """IoU entre todas las cajas de a (N, 4) y b (M, 4). Retorna (N, M)."""
+    a = a[:, None, :4]
+    b = b[None, :, :4]
+    w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0.0, None)
+    h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0.0, None)
+    inter = w * h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def _bbox_a_z(bbox):
+    """(N, 4) [x1, y1, x2, y2] -> (N, 4) [cx, cy, área, aspecto]"""
+    w = bbox[:, 2] - bbox[:, 0]
+    h = bbox[:, 3] - bbox[:, 1]
+    return np.stack([bbox[:, 0] + w / 2.0, bbox[:, 1] + h / 2.0, w * h, w / np.maximum(h, 1e-9)], axis=1)
+
+
+def _x_a_bbox(x):
+    """(N, 7) estado -> (N, 4) [x1, y1, x2, y2]"""
+    s = np.maximum(x[:, 2], 0.0)
+    w = np.sqrt(s * x[:, 3])
+    h = s / np.maximum(w, 1e-9)
+    return np.stack([x[:, 0] - w / 2.0, x[:, 1] - h / 2.0, x[:, 0] + w / 2.0, x[:, 1] + h / 2.0], axis=1)
+
+
+def asociar(dets, predichas, iou_threshold=0.3):
+    """
+    Asocia detecciones (N, 4+) con tracks predichos (M, 4+).
+    Retorna (matches (k, 2) [det, track], dets_sin_track, tracks_sin_det).
+    """
+    n, m = len(dets), len(predichas)
+    if n == 0 or m == 0:
+        return np.empty((0, 2), dtype=int), np.arange(n), np.arange(m)
+
+    iou = iou_batch(dets, predichas)
+    candidatos = iou > iou_threshold
+    if candidatos.sum(1).max() == 1 and candidatos.sum(0).max() == 1:
+        # Caso común: cada detección solapa con un único track
+        matches = np.argwhere(candidatos)
+    elif linear_sum_assignment is not None:
+        filas, cols = linear_sum_assignment(-iou)
+        matches = np.stack([filas, cols], axis=1)
+    else:
+        # Asignación greedy por IoU descendente
+        orden = np.argsort(-iou, axis=None)
+        usadas_d, usadas_t, pares = set(), set(), []
+        for d, t in zip(*np.unravel_index(orden, iou.shape)):
+            if d not in usadas_d and t not in usadas_t:
+                usadas_d.add(d)
+                usadas_t.add(t)
+                pares.append((d, t))
+        matches = np.array(pares, dtype=int).reshape(-1, 2)
+
+    if len(matches):
+        matches = matches[iou[matches[:, 0], matches[:, 1]] >= iou_threshold]
+
+    libres_d = np.ones(n, dtype=bool)
+    libres_t = np.ones(m, dtype=bool)
+    libres_d[matches[:, 0]] = False
+    libres_t[matches[:, 1]] = False
+    return matches, np.flatnonzero(libres_d), np.flatnonzero(libres_t)
+
+
+class SortVectorizado:
+    """
+    SORT con estado en arrays: x (K, 7), P (K, 7, 7) y contadores (K,).
+    update() recibe (N, 5) [x1, y1, x2, y2, score] y retorna (K, 5) [x1, y1, x2, y2, id].
+    """
+
+    def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3):
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+        self.frame_count = 0
+        self._next_id = 1
+        self.x = np.empty((0, 7))
+        self.P = np.empty((0, 7, 7))
+        self.ids = np.empty(0, dtype=np.int64)
+        self.clases = np.empty(0, dtype=np.int64)
+        self.time_since_update = np.empty(0, dtype=np.int64)
+        self.hit_streak = np.empty(0, dtype=np.int64)
+        self.ultimas_clases = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _predecir(self):
+        # Evitar área negativa (igual que SORT)
+        negativa = (self.x[:, 6] + self.x[:, 2]) <= 0
+        self.x[negativa, 6] = 0.0
+        self.x = self.x @ _F.T
+        self.P = np.einsum("ij,kjl,ml->kim", _F, self.P, _F) + _Q
+        self.hit_streak[self.time_since_update > 0] = 0
+        self.time_since_update += 1
+
+    def _actualizar(self, idx, z):
+        P = self.P[idx]
+        S = P[:, :4, :4] + _R
+        K = P[:, :, :4] @ np.linalg.inv(S)                  # (k, 7, 4)
+        y = z - self.x[idx, :4]
+        self.x[idx] += np.einsum("kij,kj->ki", K, y)
+        self.P[idx] = (_I7 - np.concatenate([K, np.zeros((len(idx), 7, 3))], axis=2)) @ P
+        self.time_since_update[idx] = 0
+        self.hit_streak[idx] += 1
+
+    def _crear(self, z, clases):
+        k = len(z)
+        x = np.zeros((k, 7))
+        x[:, :4] = z
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, np.broadcast_to(_P0, (k, 7, 7))])
+        self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + k)])
+        self.clases = np.concatenate([self.clases, clases])
+        self.time_since_update = np.concatenate([self.time_since_update, np.zeros(k, dtype=np.int64)])
+        self.hit_streak = np.concatenate([self.hit_streak, np.zeros(k, dtype=np.int64)])
+        self._next_id += k
+
+    def _filtrar(self, mascara):
+        self.x = self.x[mascara]
+        self.P = self.P[mascara]
+        self.ids = self.ids[mascara]
+        self.clases = self.clases[mascara]
+        self.time_since_update = self.time_since_update[mascara]
+        self.hit_streak = self.hit_streak[mascara]
+
+    def update(self, dets=np.empty((0, 5)), clases=None):
+        self.frame_count += 1
+        dets = np.asarray(dets, dtype=np.float64)
+        if dets.size == 0:
+            dets = np.empty((0, 5))
+        if clases is None:
+            clases = np.full(len(dets), -1, dtype=np.int64)
+
+        if len(self.ids):
+            self._predecir()
+            validos = np.isfinite(self.x[:, :4]).all(axis=1)
+            if not validos.all():
+                self._filtrar(validos)
+
+        predichas = _x_a_bbox(self.x)
+        matches, libres_d, _ = asociar(dets, predichas, self.iou_threshold)
+
+        z = _bbox_a_z(dets[:, :4])
+        if len(matches):
+            self._actualizar(matches[:, 1], z[matches[:, 0]])
+            self.clases[matches[:, 1]] = clases[matches[:, 0]]
+        if len(libres_d):
+            self._crear(z[libres_d], clases[libres_d])
+
+        visibles = (self.time_since_update < 1) & (
+            (self.hit_streak >= self.min_hits) | (self.frame_count <= self.min_hits)
+        )
+        salida = np.concatenate([_x_a_bbox(self.x[visibles]), self.ids[visibles, None]], axis=1)
+        self.ultimas_clases = self.clases[visibles]
+
+        self._filtrar(self.time_since_update <= self.max_age)
+        return salida
+
+
+class TrackerVehiculos:
+    """
+    Filtra las detecciones YOLO a vehículos y las pasa al tracker sin
+    convertirlas a listas de Python.
+    """
+
+    def __init__(self, clases=VEHICLE_CLASSES, tracker=None):
+        self.clases_validas = np.array(sorted(clases), dtype=np.int64)
+        self.tracker = tracker or SortVectorizado()
+
+    def update(self, data):
+        """
+        data: (N, 6) [x1, y1, x2, y2, score, clase] (p.ej. boxes.data.cpu().numpy())
+        Retorna (tracks (K, 5), clases (K,)).
+        """
+        data = np.asarray(data, dtype=np.float32).reshape(-1, 6)
+        clases = data[:, 5].astype(np.int64)
+        mascara = np.isin(clases, self.clases_validas)
+        tracks = self.tracker.update(data[mascara, :5], clases[mascara])
+        return tracks, self.tracker.ultimas_clases
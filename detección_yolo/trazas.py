@@ -0,0 +1,43 @@
+"""
+Spans opcionales por frame del pipeline de detección
+
+Con el trazado apagado (por defecto) span() no toma tiempos. Cuando el backend
+traza una cámara, activa el registro durante detectar_frame y luego lee los
+spans del frame con drenar(): (nombre, inicio, fin) en segundos de
+time.perf_counter(), anidados por tiempo (p.ej. "ocr" contiene
+"ocr_intento_1", "preprocesar_placa" y "ocr_intento_2").
+
+El estado es por hilo: cada cámara procesa en su propio hilo, así activar()
+y drenar() solo ven los spans de la cámara que llama.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+@contextmanager
+def span(nombre):
+    """Registra la duración del bloque si el trazado está activo en este hilo."""
+    if not getattr(_local, "activo", False):
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.spans.append((nombre, inicio, time.perf_counter()))
+
+
+def activar(valor=True):
+    _local.activo = valor
+    if not hasattr(_local, "spans"):
+        _local.spans = []
+
+
+def drenar():
+    """Spans registrados en este hilo desde la última llamada."""
+    spans = getattr(_local, "spans", [])
+    _local.spans = []
+    return spans
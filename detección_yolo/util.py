@@ -6,6 +6,7 @@ import numpy as np
 from collections import Counter
 from rapidfuzz import fuzz
 import easyocr
+from trazas import span
 
 # 
 #  INICIALIZACIÓN DE EASYOCR GLOBAL
@@ -111,7 +112,8 @@ def read_license_plate(license_crop):
 
     # Intento 1 — imagen original
     try:
-        detections = reader.readtext(license_crop)
+        with span("ocr_intento_1"):
+            detections = reader.readtext(license_crop)
     except Exception:
         detections = []
 
@@ -123,10 +125,12 @@ def read_license_plate(license_crop):
             return clean, float(score)
 
     # Intento 2 — imagen mejorada
-    processed = preprocess_plate(license_crop)
+    with span("preprocesar_placa"):
+        processed = preprocess_plate(license_crop)
     if processed is not None:
         try:
-            detections2 = reader.readtext(processed)
+            with span("ocr_intento_2"):
+                detections2 = reader.readtext(processed)
         except Exception:
             detections2 = []
         for _, text, score in detections2:
@@ -176,37 +180,29 @@ def consolidar_buffer(buffer):
 
 
 # 
-# VEHÍCULO MÁS CERCANO Y DIRECCIÓN
-
-
-def seleccionar_mas_cercano(tracks):
-    """Devuelve el track con mayor área (vehículo más cercano)."""
-    if tracks is None or (hasattr(tracks, "__len__") and len(tracks) == 0):
-        return None
-
-    max_area = 0
-    best_track = None
-    for t in tracks:
-        tx1, ty1, tx2, ty2, sort_id = t
-        area = (tx2 - tx1) * (ty2 - ty1)
-        if area > max_area:
-            max_area = area
-            best_track = (tx1, ty1, tx2, ty2, int(sort_id), area)
-    return best_track
+# DIRECCIÓN
 
 
 def infer_direction_from_history(history_deque, sign=1, min_samples=6, motion_threshold_px=10):
-    """Infere si el vehículo entra o sale."""
-    if not history_deque or len(history_deque) < min_samples:
+    """
+    Infere si el vehículo entra o sale.
+    Acepta un HistorialMovimiento (ajuste lineal sobre todo el buffer) o
+    una secuencia de tuplas (_, area, cy, _) (primera vs última muestra).
+    """
+    if history_deque is None or len(history_deque) < min_samples:
         return "indeterminado"
 
-    first = history_deque[0]
-    last = history_deque[-1]
-    _, area_first, cy_first, _ = first
-    _, area_last, cy_last, _ = last
+    if hasattr(history_deque, "desplazamiento"):
+        dy, darea = history_deque.desplazamiento()
+        dy *= sign
+    else:
+        first = history_deque[0]
+        last = history_deque[-1]
+        _, area_first, cy_first, _ = first
+        _, area_last, cy_last, _ = last
 
-    dy = (cy_last - cy_first) * sign
-    darea = area_last - area_first
+        dy = (cy_last - cy_first) * sign
+        darea = area_last - area_first
 
     if abs(dy) < motion_threshold_px and abs(darea) < 1:
         return "indeterminado"
@@ -6,10 +6,11 @@ import os
 
 DB_PATH = "estacionamiento.db"
 
-def visualizar_registros(show_all_detections=False, id_sort_filter=None):
+def visualizar_registros(show_all_detections=False, id_sort_filter=None, camara_filter=None):
     """
     Visualiza los registros únicos y, si existe, la tabla de detecciones_raw.
-    Además muestra estadísticas básicas por vehículo.
+    Además muestra estadísticas básicas por vehículo (cámara + sort_id: los
+    ids de SORT se repiten entre cámaras).
     """
     if not os.path.exists(DB_PATH):
         print(f"No se encontró la base de datos '{DB_PATH}'. Ejecuta primero main.py.")
@@ -33,6 +34,7 @@ def visualizar_registros(show_all_detections=False, id_sort_filter=None):
             select_cols = []
             for col in [
                 "id",
+                "camara_id",  # puede no existir (DBs anteriores)
                 "placa_final AS placa",
                 "tipo_vehiculo",
                 "hora_entrada",
@@ -69,32 +71,38 @@ def visualizar_registros(show_all_detections=False, id_sort_filter=None):
         try:
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='detecciones_raw';")
             if not cursor.fetchone():
-                print("ℹNo existe tabla 'detecciones_raw'. Las lecturas OCR se manejan solo en memoria.")
+                print("ℹNo existe tabla 'detecciones_raw'. Se crea al ejecutar main.py (registro_ocr).")
                 return
 
+            cursor.execute("PRAGMA table_info(detecciones_raw);")
+            con_camara = "camara_id" in [c[1] for c in cursor.fetchall()]
+            cam_col = "camara_id, " if con_camara else ""
+
+            filtros, params = [], []
+            if camara_filter is not None and con_camara:
+                filtros.append("camara_id = ?")
+                params.append(str(camara_filter))
+                print(f"🔎 Filtrando por cámara: {camara_filter}")
             if id_sort_filter is not None:
-                query = f"""
-                    SELECT id, id_sort, placa_raw AS placa, score, frame_number, timestamp
-                    FROM detecciones_raw
-                    WHERE id_sort = {id_sort_filter}
-                    ORDER BY frame_number ASC
-                """
+                filtros.append("id_sort = ?")
+                params.append(id_sort_filter)
                 print(f"🔎 Filtrando por ID de vehículo: {id_sort_filter}\n")
+            where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+
+            if id_sort_filter is not None:
+                orden = "ORDER BY frame_number ASC"
             elif show_all_detections:
-                query = """
-                    SELECT id, id_sort, placa_raw AS placa, score, frame_number, timestamp
-                    FROM detecciones_raw
-                    ORDER BY id DESC
-                """
+                orden = "ORDER BY id DESC"
             else:
-                query = """
-                    SELECT id, id_sort, placa_raw AS placa, score, frame_number, timestamp
-                    FROM detecciones_raw
-                    ORDER BY id DESC
-                    LIMIT 50
-                """
+                orden = "ORDER BY id DESC LIMIT 50"
+            query = f"""
+                SELECT id, {cam_col}id_sort, placa_raw AS placa, score, frame_number, timestamp
+                FROM detecciones_raw
+                {where}
+                {orden}
+            """
 
-            df_raw = pd.read_sql_query(query, conn)
+            df_raw = pd.read_sql_query(query, conn, params=params)
 
             if df_raw.empty:
                 print("📭 No hay registros en la tabla 'detecciones_raw'.")
@@ -113,19 +121,20 @@ def visualizar_registros(show_all_detections=False, id_sort_filter=None):
                 print("\n" + "="*100)
                 print("ESTADÍSTICAS POR VEHÍCULO")
                 print("="*100)
-                stats_query = """
+                stats_query = f"""
                     SELECT
-                        id_sort,
+                        {cam_col}id_sort,
                         COUNT(*) AS total_detecciones,
                         AVG(score) AS score_promedio,
                         MAX(score) AS score_maximo,
                         MIN(frame_number) AS primer_frame,
                         MAX(frame_number) AS ultimo_frame
                     FROM detecciones_raw
-                    GROUP BY id_sort
-                    ORDER BY id_sort ASC
+                    {where}
+                    GROUP BY {cam_col}id_sort
+                    ORDER BY {cam_col}id_sort ASC
                 """
-                df_stats = pd.read_sql_query(stats_query, conn)
+                df_stats = pd.read_sql_query(stats_query, conn, params=params)
                 print(tabulate(df_stats, headers="keys", tablefmt="grid", showindex=False, floatfmt=".3f"))
 
         except Exception as e:
@@ -138,6 +147,7 @@ if __name__ == "__main__":
     )
     parser.add_argument("--all", action="store_true", help="Mostrar TODAS las detecciones OCR")
     parser.add_argument("--id", type=int, help="Filtrar por ID de vehículo específico (sort_id)")
+    parser.add_argument("--camara", help="Filtrar las detecciones OCR por cámara (camara_id)")
     args = parser.parse_args()
 
-    visualizar_registros(show_all_detections=args.all, id_sort_filter=args.id)
+    visualizar_registros(show_all_detections=args.all, id_sort_filter=args.id, camara_filter=args.camara)
@@ -21,11 +21,15 @@ SCALE_TEXT = 0.6
 def draw_detections(frame, results):
     """
     Dibuja rectángulos, texto y etiquetas de cada vehículo detectado.
+
+    Dibuja directamente sobre frame (sin copia ni mezcla del frame completo):
+    solo se modifican los píxeles de las cajas y etiquetas. Quien necesite el
+    frame original debe codificarlo o copiarlo antes.
     """
     if results is None or not isinstance(results, dict):
         return frame
 
-    overlay = frame.copy()
+    overlay = frame
 
     for track_id, data in results.items():
         x1 = y1 = x2 = y2 = None  # valores iniciales seguros
@@ -82,7 +86,6 @@ def draw_detections(frame, results):
                 cv2.LINE_AA
             )
 
-    frame = cv2.addWeighted(overlay, 0.9, frame, 0.1, 0)
     return frame
 
 